@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,6 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app_apiTP1_JTR.metrics.MetricsMiddleware',
+    'app_apiTP1_JTR.rate_limit.LoadSheddingMiddleware',
+    'app_apiTP1_JTR.db_routing.ReplicaStickinessMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,13 +76,55 @@ WSGI_APPLICATION = 'api_TP1_JTR.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLITE_TUNING=off revient au comportement SQLite par défaut (benchmarks avant/après)
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', 'on') != 'off'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Connexions persistantes (secondes, 0 = une connexion par requête, None = illimité)
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60 if SQLITE_TUNING else 0)),
+        'CONN_HEALTH_CHECKS': True,
+        # BEGIN IMMEDIATE : un écrivain attend le verrou (busy_timeout) au lieu d'échouer
+        # avec "database is locked" en voulant passer d'un verrou de lecture à un verrou d'écriture
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'} if SQLITE_TUNING else {},
     }
 }
 
+# PRAGMA appliqués à chaque nouvelle connexion SQLite (signals.configure_sqlite_connection)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',        # les lecteurs ne bloquent plus l'écrivain (et inversement)
+    'synchronous': 'NORMAL',      # fsync au checkpoint seulement : sûr en WAL, bien plus rapide
+    'busy_timeout': 5000,         # ms d'attente d'un verrou avant "database is locked"
+    'cache_size': -65536,         # 64 Mo de cache de pages par connexion
+    'mmap_size': 268435456,       # lecture de la base via mmap (256 Mo)
+    'temp_store': 'MEMORY',
+} if SQLITE_TUNING else {}
+
+# Réplicas de lecture : DB_REPLICAS=chemin1,chemin2 ajoute les alias replica_1, replica_2...
+# ouverts en lecture seule. Pour SQLite, ce sont des copies de la base principale
+# rafraîchies par `manage.py snapshot_replicas --interval N`.
+DATABASE_READ_REPLICAS = []
+for _index, _path in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    DATABASES[f'replica_{_index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{_path}?mode=ro',
+        # Pas de connexion persistante : chaque requête voit le dernier snapshot
+        'CONN_MAX_AGE': 0,
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_READ_REPLICAS.append(f'replica_{_index}')
+
+DATABASE_ROUTERS = ['app_apiTP1_JTR.db_routing.PrimaryReplicaRouter']
+# Après une écriture, les lectures du même client (clé API) restent sur la base principale
+# pendant ce délai, qui doit couvrir le retard des réplicas (intervalle des snapshots)
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 15))
+# Doit être un cache partagé entre les processus (voir CACHES['shared']) : sinon un client dont
+# l'écriture a été servie par un worker peut lire une réplica en retard depuis un autre
+REPLICA_STICKY_CACHE_ALIAS = 'shared'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -121,6 +167,105 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Pagination par curseur des listes de l'API
+API_PAGE_SIZE = 100
+API_MAX_PAGE_SIZE = 1000
+
+# Cache en mémoire des clés API (par processus, invalidé par le compteur partagé ApiKeyGeneration)
+API_KEY_CACHE_SIZE = 1024
+API_KEY_CACHE_TTL = 60  # secondes
+ROLE_PERMISSION_CACHE_TTL = 60  # secondes
+
+# Cache des réponses de lecture du catalogue, indexé par la version du catalogue.
+# 'locmem' : un cache par processus ; 'file' : partagé entre les workers d'une même machine.
+API_RESPONSE_CACHE_ALIAS = 'api_responses'
+API_RESPONSE_CACHE_TTL = 300  # secondes
+API_RESPONSE_CACHE_LOCK_TIMEOUT = 10  # secondes d'attente max pendant qu'un autre worker reconstruit
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api_responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-responses',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    # Petites entrées partagées par tous les workers de la machine (fenêtres read-your-writes,
+    # compteurs des limites de requêtes) ; add() et incr() y sont atomiques (verrou flock)
+    'shared': {
+        'BACKEND': 'app_apiTP1_JTR.file_cache.LockedFileBasedCache',
+        'LOCATION': os.environ.get('SHARED_CACHE_DIR', str(BASE_DIR / 'cache' / 'shared')),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+if os.environ.get('API_RESPONSE_CACHE_BACKEND') == 'file':
+    CACHES['api_responses'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('API_RESPONSE_CACHE_DIR', str(BASE_DIR / 'cache' / 'api_responses')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+# Import massif de produits (bulk_products/)
+BULK_INGEST_MAX_ROWS = 50000
+# Corps lu par blocs, hors DATA_UPLOAD_MAX_MEMORY_SIZE (2,5 Mo) : limite propre à l'import
+BULK_INGEST_MAX_BYTES = 64 * 1024 * 1024
+BULK_INGEST_BATCH_SIZE = 1000
+
+# price_analytics/ : nombre de classes de l'histogramme par défaut et maximum
+PRICE_ANALYTICS_BINS = 20
+PRICE_ANALYTICS_MAX_BINS = 1000
+
+# Imports CSV en arrière-plan (import_jobs/) : fichiers déposés et d'erreurs dans IMPORT_JOB_DIR,
+# exécutés par un pool de threads de chaque processus
+IMPORT_JOB_DIR = os.environ.get('IMPORT_JOB_DIR', BASE_DIR / 'cache' / 'imports')
+IMPORT_JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS', 2))
+IMPORT_JOB_BATCH_SIZE = 1000  # lignes par transaction (et par point de reprise)
+# Pause entre deux lots : sans elle, les écritures des requêtes attendent le verrou SQLite
+# jusqu'à busy_timeout (mesuré : 'database is locked' sans pause, < 0,2 s d'attente avec 0,05)
+IMPORT_JOB_BATCH_PAUSE = 0.05
+IMPORT_JOB_MAX_UPLOAD_BYTES = 512 * 1024 * 1024
+IMPORT_JOB_STALE_SECONDS = 60  # job 'running' sans avancement depuis ce délai : worker considéré arrêté
+
+# Journal des modifications (changes/) : taille des lots et rétention avant compaction
+CHANGES_PAGE_SIZE = 500
+CHANGES_MAX_PAGE_SIZE = 5000
+CHANGE_LOG_RETENTION_DAYS = 7
+
+# catalog_snapshot/ : catalogue précompressé sur disque, reconstruit en arrière-plan
+# CATALOG_SNAPSHOT_DEBOUNCE secondes après la dernière écriture (None = commande uniquement)
+CATALOG_SNAPSHOT_DIR = os.environ.get('CATALOG_SNAPSHOT_DIR', BASE_DIR / 'cache' / 'snapshots')
+CATALOG_SNAPSHOT_DEBOUNCE = 2
+CATALOG_SNAPSHOT_MAX_DELAY = 30  # secondes max entre la première écriture en attente et la reconstruction
+CATALOG_SNAPSHOT_GZIP_LEVEL = 9
+CATALOG_SNAPSHOT_BROTLI_QUALITY = 11
+CATALOG_SNAPSHOT_RETRY_AFTER = 5  # secondes (Retry-After du 503) tant que le premier snapshot se construit
+
+# batch/ : nombre maximal d'opérations par requête
+BATCH_MAX_OPERATIONS = 20
+
+# Métriques Prometheus : chaque worker recopie ses compteurs dans METRICS_DIR
+# (un fichier par processus) pour que /metrics agrège tous les processus
+METRICS_DIR = os.environ.get('METRICS_DIR', BASE_DIR / 'cache' / 'metrics')
+METRICS_FLUSH_INTERVAL = 5  # secondes entre deux écritures du fichier d'un processus
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Limites de requêtes par clé API : nom du rôle -> (requêtes, fenêtre en secondes).
+# 'default' s'applique aux rôles absents de la table (et aux profils sans rôle) ; None = illimité
+API_RATE_LIMITS = {
+    'default': (300, 60),
+    'User': (300, 60),
+    'Manager': (1200, 60),
+    'Admin': (6000, 60),
+}
+if os.environ.get('API_RATE_LIMITS') == 'off':  # benchmarks de charge
+    API_RATE_LIMITS = {}
+# Cache partagé entre workers avec add/incr atomiques : un cache par processus (LocMemCache)
+# est refusé au démarrage (check app_apiTP1_JTR.E001), chaque worker appliquerait sa propre limite
+API_RATE_LIMIT_CACHE_ALIAS = 'shared'
+# Requêtes simultanées par processus au-delà desquelles on répond 503 sans rien traiter
+API_MAX_CONCURRENT_REQUESTS = int(os.environ.get('API_MAX_CONCURRENT_REQUESTS', 64))
+
 INSTALLED_APPS = [ 'django.contrib.admin', 
                   'django.contrib.auth', 
                   'django.contrib.contenttypes', 
@@ -19,7 +19,10 @@ from django.urls import path
 from django.urls import include
 from django.conf import settings
 
+from app_apiTP1_JTR import views as api_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path("app_apiTP1_JTR/", include("app_apiTP1_JTR.urls"))
+    path("app_apiTP1_JTR/", include("app_apiTP1_JTR.urls")),
+    path("metrics", api_views.metrics, name="metrics"),
 ]
@@ -0,0 +1,144 @@
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .catalog_snapshot import snapshot_scheduler
+from .models import CatalogAggregate, Product
+
+
+class CatalogAggregates:
+    """
+    Maintien incrémental de count/sum/min/max (et des produits argmin/argmax)
+    dans la ligne unique CatalogAggregate. Chaque écriture est décrite par
+    les couples (id, prix) retirés et ajoutés ; une modification de prix est
+    un retrait suivi d'un ajout. Les extrêmes ne sont recalculés (via l'index
+    sur price) que lorsque le produit retiré était le min ou le max.
+
+    Toute écriture, même sans changement de prix, incrémente `version` :
+    c'est la version du catalogue utilisée pour les ETag. Chaque incrément
+    planifie aussi, après le commit, la reconstruction du snapshot précompressé.
+    """
+
+    @staticmethod
+    def get():
+        """Retourner les agrégats, en les construisant au premier appel"""
+        aggregate = CatalogAggregate.objects.select_related('max_product', 'min_product').filter(pk=1).first()
+        if aggregate is None:
+            aggregate = CatalogAggregates.rebuild()
+        return aggregate
+
+    @staticmethod
+    async def aget():
+        """Variante asynchrone de get()"""
+        aggregate = await CatalogAggregate.objects.select_related('max_product', 'min_product').filter(pk=1).afirst()
+        if aggregate is None:
+            aggregate = await sync_to_async(CatalogAggregates.rebuild)()
+        return aggregate
+
+    @staticmethod
+    def rebuild():
+        """Recalculer entièrement les agrégats depuis la table Product"""
+        with transaction.atomic():
+            totals = Product.objects.aggregate(count=Count('id'), price_sum=Sum('price'))
+            aggregate, _ = CatalogAggregate.objects.select_for_update().get_or_create(pk=1)
+            aggregate.version += 1
+            transaction.on_commit(snapshot_scheduler.schedule)
+            aggregate.product_count = totals['count']
+            aggregate.price_sum = totals['price_sum'] or 0
+            CatalogAggregates._refresh_extremes(aggregate, refresh_min=True, refresh_max=True)
+            aggregate.save()
+        return aggregate
+
+    @staticmethod
+    def apply(added=(), removed=()):
+        """
+        Appliquer une écriture aux agrégats, dans la transaction courante
+
+        Args:
+            added: Couples (product_id, price) apparus dans le catalogue
+            removed: Couples (product_id, price) disparus du catalogue
+            (tous deux vides : écriture sans effet sur les prix, seule la version change)
+        """
+        # Les prix peuvent arriver en float/str (ex: Product.objects.create(price=9.99))
+        added = [(product_id, Decimal(str(price))) for product_id, price in added]
+        removed = [(product_id, Decimal(str(price))) for product_id, price in removed]
+        if not added and not removed:
+            if CatalogAggregate.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now()):
+                transaction.on_commit(snapshot_scheduler.schedule)
+            else:
+                CatalogAggregates.rebuild()
+            return
+
+        with transaction.atomic():
+            aggregate = CatalogAggregate.objects.select_for_update().filter(pk=1).first()
+            if aggregate is None:
+                # Jamais construits : un recalcul complet voit déjà cette écriture
+                CatalogAggregates.rebuild()
+                return
+
+            # L'id de l'argmax est déjà à NULL si le produit vient d'être supprimé (SET_NULL)
+            removed_ids = {product_id for product_id, _ in removed}
+            refresh_max = bool(removed) and (aggregate.max_product_id is None or aggregate.max_product_id in removed_ids)
+            refresh_min = bool(removed) and (aggregate.min_product_id is None or aggregate.min_product_id in removed_ids)
+
+            aggregate.version += 1
+            transaction.on_commit(snapshot_scheduler.schedule)
+            aggregate.product_count += len(added) - len(removed)
+            aggregate.price_sum += sum(price for _, price in added) - sum(price for _, price in removed)
+
+            if not refresh_max:
+                for product_id, price in added:
+                    if aggregate.max_price is None or price > aggregate.max_price:
+                        aggregate.max_price, aggregate.max_product_id = price, product_id
+            if not refresh_min:
+                for product_id, price in added:
+                    if aggregate.min_price is None or price < aggregate.min_price:
+                        aggregate.min_price, aggregate.min_product_id = price, product_id
+
+            if refresh_max or refresh_min:
+                CatalogAggregates._refresh_extremes(aggregate, refresh_min=refresh_min, refresh_max=refresh_max)
+            aggregate.save()
+
+    @staticmethod
+    def _refresh_extremes(aggregate, refresh_min, refresh_max):
+        """Relire le min et/ou le max par l'index sur price (pas de scan complet)"""
+        if refresh_max:
+            row = Product.objects.order_by('-price', 'id').values_list('id', 'price').first()
+            aggregate.max_product_id, aggregate.max_price = row if row else (None, None)
+        if refresh_min:
+            row = Product.objects.order_by('price', 'id').values_list('id', 'price').first()
+            aggregate.min_product_id, aggregate.min_price = row if row else (None, None)
+
+    @staticmethod
+    def current_version():
+        """(version, updated_at) du catalogue en une lecture, sans charger les produits"""
+        row = CatalogAggregate.objects.filter(pk=1).values_list('version', 'updated_at').first()
+        if row is None:
+            aggregate = CatalogAggregates.rebuild()
+            row = (aggregate.version, aggregate.updated_at)
+        return row
+
+    @staticmethod
+    async def acurrent_version():
+        """Variante asynchrone de current_version()"""
+        row = await CatalogAggregate.objects.filter(pk=1).values_list('version', 'updated_at').afirst()
+        if row is None:
+            aggregate = await sync_to_async(CatalogAggregates.rebuild)()
+            row = (aggregate.version, aggregate.updated_at)
+        return row
+
+    @staticmethod
+    def as_dict(aggregate):
+        return {
+            'version': aggregate.version,
+            'count': aggregate.product_count,
+            'min_price': str(aggregate.min_price) if aggregate.min_price is not None else None,
+            'max_price': str(aggregate.max_price) if aggregate.max_price is not None else None,
+            'avg_price': str(aggregate.avg_price) if aggregate.avg_price is not None else None,
+            'min_product_id': aggregate.min_product_id,
+            'max_product_id': aggregate.max_product_id,
+            'updated_at': aggregate.updated_at.isoformat(),
+        }
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AppApitp1JtrConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_apiTP1_JTR'
+
+    def ready(self):
+        # Branche l'invalidation des caches sur les signaux des modèles
+        from . import signals  # noqa: F401
+        # Vérifications au démarrage (manage.py check, runserver...)
+        from . import checks  # noqa: F401
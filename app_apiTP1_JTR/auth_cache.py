@@ -0,0 +1,214 @@
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+
+# Génération lue par require_api_key pour la requête en cours : les vérifications de
+# permission de la même requête la réutilisent au lieu de la relire
+request_generation = ContextVar('auth_generation', default=None)
+
+
+class ApiKeyCache:
+    """
+    Cache en mémoire (par processus) clé API -> UserProfile résolu, avec
+    user et role déjà chargés. Borné en taille (LRU) et en durée (TTL).
+
+    Chaque entrée retient la génération (ApiKeyGeneration) lue avant le
+    chargement du profil ; toute lecture compare cette génération à celle
+    de la base, incrémentée à chaque modification d'un profil, utilisateur
+    ou rôle par n'importe quel processus (triggers SQLite, donc aussi par
+    QuerySet.update()). Une clé révoquée cesse ainsi de fonctionner
+    immédiatement partout, au prix d'une lecture par clé primaire par
+    requête. Les signaux de signals.py vident en plus les entrées locales.
+    Les clés invalides ne sont jamais mises en cache.
+    """
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # api_key -> (expires_at, generation, user_profile)
+        self._generation = 0  # Génération la plus récente vue par ce processus
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def current_generation():
+        """Génération partagée, lue sur la base principale (un réplica peut être en retard)"""
+        from .db_routing import use_primary
+        from .models import ApiKeyGeneration
+
+        with use_primary():
+            return ApiKeyGeneration.objects.filter(pk=1).values_list('generation', flat=True).first() or 0
+
+    @staticmethod
+    async def acurrent_generation():
+        """Variante asynchrone de current_generation()"""
+        from .db_routing import use_primary
+        from .models import ApiKeyGeneration
+
+        with use_primary():
+            return await ApiKeyGeneration.objects.filter(pk=1).values_list('generation', flat=True).afirst() or 0
+
+    @staticmethod
+    def bump_generation():
+        """Invalider les caches de tous les processus (moteurs sans triggers, voir signals.py)"""
+        from .models import ApiKeyGeneration
+
+        if not ApiKeyGeneration.objects.filter(pk=1).update(generation=F('generation') + 1):
+            ApiKeyGeneration.objects.get_or_create(pk=1, defaults={'generation': 1})
+
+    def get(self, api_key, generation):
+        """Retourner le profil en cache pour cette clé s'il a été chargé à cette génération, ou None"""
+        with self._lock:
+            if generation != self._generation:
+                # Un profil a changé quelque part : aucune entrée antérieure n'est sûre
+                self._entries.clear()
+                self._generation = generation
+            entry = self._entries.get(api_key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, entry_generation, user_profile = entry
+            if expires_at < time.monotonic() or entry_generation != generation:
+                del self._entries[api_key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(api_key)
+            self.hits += 1
+            return user_profile
+
+    def set(self, api_key, user_profile, generation):
+        """generation : celle lue avant de charger le profil (une révocation concurrente l'invalide)"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[api_key] = (time.monotonic() + self.ttl, generation, user_profile)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_profile(self, profile_id):
+        """Retirer toutes les entrées pointant vers ce profil (la clé a pu changer)"""
+        self._invalidate(lambda user_profile: user_profile.pk == profile_id)
+
+    def invalidate_user(self, user_id):
+        self._invalidate(lambda user_profile: user_profile.user_id == user_id)
+
+    def invalidate_role(self, role_id):
+        self._invalidate(lambda user_profile: user_profile.role_id == role_id)
+
+    def _invalidate(self, predicate):
+        with self._lock:
+            stale = [key for key, (_, _, user_profile) in self._entries.items() if predicate(user_profile)]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'generation': self._generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+
+api_key_cache = ApiKeyCache(
+    max_size=getattr(settings, 'API_KEY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'API_KEY_CACHE_TTL', 60),
+)
+
+
+class RolePermissionCache:
+    """
+    Codes de permission de chaque rôle, matérialisés en frozenset : une
+    vérification de permission devient un test d'inclusion sans requête.
+    Chargé en une seule requête et rechargé entièrement dès que la
+    génération partagée (ApiKeyGeneration, incrémentée aussi par les
+    changements de permissions : triggers de la migration 0010) diffère
+    de celle du chargement, quel que soit le processus qui a écrit, ou
+    après `ttl` secondes. Un chargement fait dans une transaction n'est
+    pas conservé : il pourrait contenir des écritures annulées ensuite.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._permissions = None  # role_id -> frozenset de codes
+        self._generation = None  # Génération lue avant le chargement
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, generation):
+        return (self._permissions is not None and self._generation == generation
+                and self._loaded_at + self.ttl >= time.monotonic())
+
+    def get(self, role_id, generation=None):
+        """
+        Retourner le frozenset des codes de permission du rôle
+
+        Args:
+            generation: Génération partagée déjà lue pour la requête (relue sinon)
+        """
+        if generation is None:
+            generation = request_generation.get()
+        if generation is None:
+            generation = ApiKeyCache.current_generation()
+        permissions = self._permissions
+        if not self._is_fresh(generation):
+            permissions = self.warm(generation)
+        return permissions.get(role_id, frozenset())
+
+    async def aget(self, role_id, generation=None):
+        """Variante asynchrone de get() : seul un (re)chargement passe par un thread"""
+        if generation is None:
+            generation = request_generation.get()
+        if generation is None:
+            generation = await ApiKeyCache.acurrent_generation()
+        permissions = self._permissions
+        if not self._is_fresh(generation):
+            permissions = await sync_to_async(self.warm)(generation)
+        return permissions.get(role_id, frozenset())
+
+    def warm(self, generation=None):
+        """(Re)charger les permissions de tous les rôles en une requête"""
+        from .db_routing import use_primary
+        from .models import Role
+
+        if generation is None:
+            generation = ApiKeyCache.current_generation()
+        codes_by_role = {}
+        with use_primary():
+            for role_id, code in Role.permissions.through.objects.values_list('role_id', 'permission__code'):
+                codes_by_role.setdefault(role_id, set()).add(code)
+        permissions = {role_id: frozenset(codes) for role_id, codes in codes_by_role.items()}
+        if not connection.in_atomic_block:
+            with self._lock:
+                self._permissions = permissions
+                self._generation = generation
+                self._loaded_at = time.monotonic()
+        return permissions
+
+    def clear(self):
+        with self._lock:
+            self._permissions = None
+
+
+role_permission_cache = RolePermissionCache(ttl=getattr(settings, 'ROLE_PERMISSION_CACHE_TTL', 60))
@@ -1,40 +1,121 @@
 from functools import wraps
+from asgiref.sync import iscoroutinefunction
 from django.http import JsonResponse
 from django.contrib.auth.models import User
 from .models import UserProfile
+from .auth_cache import api_key_cache, request_generation
+from .db_routing import use_primary
+from .rate_limit import RateLimiter
 import hashlib
 import secrets
 
+# Les deux décorateurs acceptent des vues synchrones ou asynchrones (async def) :
+# pour une vue asynchrone, l'authentification passe par l'ORM asynchrone, sans
+# aller-retour vers un thread.
+# Le profil d'une clé est toujours lu sur la base principale : un réplica en retard
+# accepterait encore une clé révoquée.
+# require_api_key applique aussi la limite de requêtes du rôle (rate_limit.py).
+
 def require_api_key(func):
+    if iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(request, *args, **kwargs):
+            api_key = request.headers.get('X-API-Key')
+            
+            if not api_key:
+                return JsonResponse({'error': 'API key required'}, status=401)
+            
+            generation = await api_key_cache.acurrent_generation()
+            user_profile = api_key_cache.get(api_key, generation)
+            if user_profile is None:
+                try:
+                    with use_primary():
+                        user_profile = await UserProfile.objects.select_related('user', 'role').aget(
+                            api_key=api_key, is_api_active=True
+                        )
+                except UserProfile.DoesNotExist:
+                    return JsonResponse({'error': 'Invalid API key'}, status=401)
+                api_key_cache.set(api_key, user_profile, generation)
+            
+            request.user_profile = user_profile
+            request.user = user_profile.user
+            
+            rate_limit = await RateLimiter.acheck(user_profile)
+            if rate_limit is not None and not rate_limit.allowed:
+                return RateLimiter.too_many_requests(rate_limit)
+            
+            token = request_generation.set(generation)
+            try:
+                return RateLimiter.add_headers(await func(request, *args, **kwargs), rate_limit)
+            finally:
+                request_generation.reset(token)
+        return async_wrapper
+
     @wraps(func)
     def wrapper(request, *args, **kwargs):
+        if getattr(request, 'is_batch_operation', False):
+            # Opération de /batch : authentifiée et comptée (une unité par opération) par la requête parente
+            return func(request, *args, **kwargs)
+
         api_key = request.headers.get('X-API-Key')
         
         if not api_key:
             return JsonResponse({'error': 'API key required'}, status=401)
         
-        try:
-            user_profile = UserProfile.objects.get(api_key=api_key, is_api_active=True)
-            request.user_profile = user_profile
-            request.user = user_profile.user
-        except UserProfile.DoesNotExist:
-            return JsonResponse({'error': 'Invalid API key'}, status=401)
+        generation = api_key_cache.current_generation()
+        user_profile = api_key_cache.get(api_key, generation)
+        if user_profile is None:
+            try:
+                with use_primary():
+                    user_profile = UserProfile.objects.select_related('user', 'role').get(
+                        api_key=api_key, is_api_active=True
+                    )
+            except UserProfile.DoesNotExist:
+                return JsonResponse({'error': 'Invalid API key'}, status=401)
+            api_key_cache.set(api_key, user_profile, generation)
         
-        return func(request, *args, **kwargs)
+        request.user_profile = user_profile
+        request.user = user_profile.user
+        
+        rate_limit = RateLimiter.check(user_profile)
+        if rate_limit is not None and not rate_limit.allowed:
+            return RateLimiter.too_many_requests(rate_limit)
+        
+        # Génération réutilisée par les vérifications de permission de la requête (RolePermissionCache)
+        token = request_generation.set(generation)
+        try:
+            return RateLimiter.add_headers(func(request, *args, **kwargs), rate_limit)
+        finally:
+            request_generation.reset(token)
     return wrapper
 
-def require_permission(permission_code):
+def require_permission(*permission_codes):
+    def permission_denied():
+        return JsonResponse({
+            'error': f'Permission denied. Required: {", ".join(permission_codes)}'
+        }, status=403)
+
     def decorator(func):
+        if iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not hasattr(request, 'user_profile'):
+                    return JsonResponse({'error': 'Authentication required'}, status=401)
+                
+                if not await request.user_profile.ahas_permission(*permission_codes):
+                    return permission_denied()
+                
+                return await func(request, *args, **kwargs)
+            return async_wrapper
+
         @wraps(func)
         def wrapper(request, *args, **kwargs):
             if not hasattr(request, 'user_profile'):
                 return JsonResponse({'error': 'Authentication required'}, status=401)
             
-            if not request.user_profile.has_permission(permission_code):
-                return JsonResponse({
-                    'error': f'Permission denied. Required: {permission_code}'
-                }, status=403)
+            if not request.user_profile.has_permission(*permission_codes):
+                return permission_denied()
             
             return func(request, *args, **kwargs)
         return wrapper
-    return decorator
\ No newline at end of file
+    return decorator
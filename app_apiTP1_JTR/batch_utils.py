@@ -0,0 +1,153 @@
+import json
+from contextlib import nullcontext
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+from .serializers import dumps
+
+BATCH_METHODS = {'GET', 'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class BatchError(ValueError):
+    """Opération refusée avant exécution (réponse 400 pour cette opération)"""
+
+
+class BatchExecutor:
+    """
+    Exécuter plusieurs appels d'API dans une seule requête HTTP : l'authentification
+    est faite une fois par la requête parente, qui compte une requête par opération
+    dans la limite du rôle (vue batch) ; chaque opération passe ensuite par la vue
+    normale, require_permission compris, dans le même thread et donc sur la même
+    connexion à la base.
+    """
+
+    @staticmethod
+    def parse_operations(data):
+        """
+        Valider le corps {"operations": [...], "atomic": bool}
+
+        Returns:
+            tuple: (liste d'opérations, atomic)
+
+        Raises:
+            ValueError: Si le corps est invalide
+        """
+        if not isinstance(data, dict) or not isinstance(data.get('operations'), list):
+            raise ValueError('Expected {"operations": [...]}')
+        operations = data['operations']
+        max_operations = getattr(settings, 'BATCH_MAX_OPERATIONS', 20)
+        if not operations:
+            raise ValueError('At least one operation is required')
+        if len(operations) > max_operations:
+            raise ValueError(f'Maximum {max_operations} operations allowed per batch')
+        for index, operation in enumerate(operations):
+            if not isinstance(operation, dict) or not isinstance(operation.get('path'), str):
+                raise ValueError(f'Operation {index}: an object with a "path" is required')
+        return operations, bool(data.get('atomic', False))
+
+    @staticmethod
+    def resolve_operation(operation):
+        """(vue, args, kwargs, méthode, chemin, query string) d'une opération"""
+        method = str(operation.get('method', 'GET')).upper()
+        if method not in BATCH_METHODS:
+            raise BatchError(f'Unsupported method: {method}')
+        parts = urlsplit(operation['path'])
+        try:
+            match = resolve(parts.path)
+        except Resolver404:
+            raise BatchError(f'Unknown path: {parts.path}')
+        if not match.func.__module__.startswith('app_apiTP1_JTR.'):
+            raise BatchError(f'Path not available in batches: {parts.path}')
+        if match.url_name == 'batch':
+            raise BatchError('Batches cannot be nested')
+        if iscoroutinefunction(match.func):
+            raise BatchError('Async endpoints are not available in batches')
+        return match, method, parts.path, parts.query
+
+    @staticmethod
+    def build_subrequest(parent, operation, match, method, path, query, atomic=False):
+        """Requête interne héritant de l'utilisateur authentifié de la requête parente"""
+        body = operation.get('body')
+        content = b'' if body is None else (body.encode() if isinstance(body, str) else dumps(body))
+
+        request = HttpRequest()
+        request.method = method
+        request.path = request.path_info = path
+        # Pas d'en-têtes conditionnels ni de corps de la requête parente
+        request.META = {key: value for key, value in parent.META.items()
+                        if not key.startswith('HTTP_IF_') and key not in ('CONTENT_TYPE', 'CONTENT_LENGTH')}
+        request.META.update({
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(content)),
+        })
+        request.GET = QueryDict(query)
+        # Renseignés par WSGIRequest à partir de CONTENT_TYPE, pas par HttpRequest
+        request.content_type, request.content_params = 'application/json', {}
+        request._body = content
+        request._stream = BytesIO(content)  # request.read() (bulk_products/)
+        request.resolver_match = match
+        request.user = parent.user
+        request.user_profile = parent.user_profile
+        # Lu par require_api_key : déjà authentifiée par la requête parente
+        request.is_batch_operation = True
+        # Lu par le cache de réponses et les ETag : rien de ce qui est lu ici n'est encore validé
+        request.in_atomic_batch = atomic
+        return request
+
+    @staticmethod
+    def run_operation(parent, operation, atomic=False):
+        """Exécuter une opération ; retourne (statut, corps JSON encodé)"""
+        try:
+            match, method, path, query = BatchExecutor.resolve_operation(operation)
+        except BatchError as e:
+            return 400, dumps({'error': str(e)})
+
+        request = BatchExecutor.build_subrequest(parent, operation, match, method, path, query, atomic)
+        try:
+            response = match.func(request, *match.args, **match.kwargs)
+        except Exception as e:
+            return 500, dumps({'error': str(e)})
+        if response.streaming:
+            response.close()
+            return 400, dumps({'error': 'Streaming endpoints are not available in batches'})
+        if response.get('Content-Type', '').startswith('application/json'):
+            return response.status_code, response.content
+        return response.status_code, dumps(response.content.decode(response.charset or 'utf-8'))
+
+    @staticmethod
+    def execute(parent, operations, atomic=False):
+        """
+        Exécuter les opérations dans l'ordre. En mode atomic, elles partagent une transaction
+        annulée si l'une d'elles échoue (statut >= 400) ; les suivantes ne sont pas exécutées.
+
+        Returns:
+            bytes: Corps JSON {"results": [{"id", "status", "body"}...], "committed": bool}
+        """
+        results = []
+        committed = True
+        with transaction.atomic() if atomic else nullcontext():
+            for index, operation in enumerate(operations):
+                status, body = BatchExecutor.run_operation(parent, operation, atomic)
+                results.append((operation.get('id', index), status, body))
+                if atomic and status >= 400:
+                    transaction.set_rollback(True)
+                    committed = False
+                    break
+
+        # Les corps des vues sont déjà du JSON : les insérer tels quels, sans les redécoder
+        parts = [
+            b'{"id":' + dumps(operation_id) + b',"status":' + str(status).encode() + b',"body":' + body + b'}'
+            for operation_id, status, body in results
+        ]
+        skipped = len(operations) - len(results)
+        return (b'{"results":[' + b','.join(parts) + b'],"committed":' + json.dumps(committed).encode()
+                + b',"skipped":' + str(skipped).encode() + b'}')
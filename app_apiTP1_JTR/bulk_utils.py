@@ -0,0 +1,318 @@
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .aggregates import CatalogAggregates
+from .change_log import LOGGED_FIELDS, ProductChangeLog
+from .models import Product
+
+NAME_MAX_LENGTH = Product._meta.get_field('name').max_length
+PRICE_FIELD = Product._meta.get_field('price')
+PRICE_MAX = Decimal(10) ** (PRICE_FIELD.max_digits - PRICE_FIELD.decimal_places)
+PRICE_QUANTUM = Decimal(1).scaleb(-PRICE_FIELD.decimal_places)
+
+
+def clean_name(name):
+    if not name or not isinstance(name, str) or len(name) > NAME_MAX_LENGTH:
+        raise ValueError(f'Name must be a non-empty string of at most {NAME_MAX_LENGTH} characters')
+    return name
+
+
+def clean_price(price):
+    """Convertir un prix en Decimal compatible avec Product.price"""
+    try:
+        value = Decimal(str(price))
+    except InvalidOperation:
+        raise ValueError(f'Invalid price: {price}')
+    if not value.is_finite() or value <= 0 or value >= PRICE_MAX or value != value.quantize(PRICE_QUANTUM):
+        raise ValueError(f'Invalid price: {price}')
+    return value
+
+
+def clean_description(description):
+    if description is not None and not isinstance(description, str):
+        raise ValueError('Description must be a string')
+    return description
+
+
+class BodyTooLarge(ValueError):
+    """Corps de requête plus grand que settings.BULK_INGEST_MAX_BYTES"""
+
+
+class ProductBulkIngest:
+    """
+    Import massif de produits : décodage du corps (tableau JSON ou NDJSON),
+    validation de toutes les lignes en une passe, puis insertion par lots
+    (bulk_create) dans une seule transaction.
+    """
+
+    @staticmethod
+    def read_body(request, max_bytes=None, chunk_size=64 * 1024):
+        """
+        Lire le corps de la requête par blocs
+
+        request.body est plafonné par DATA_UPLOAD_MAX_MEMORY_SIZE (2,5 Mo par
+        défaut, soit environ 25 000 lignes), bien en dessous de
+        BULK_INGEST_MAX_ROWS : l'import applique sa propre limite en octets.
+
+        Raises:
+            BodyTooLarge: Si le corps dépasse max_bytes (défaut: settings.BULK_INGEST_MAX_BYTES)
+        """
+        max_bytes = max_bytes or getattr(settings, 'BULK_INGEST_MAX_BYTES', 64 * 1024 * 1024)
+        error = f'Request body larger than {max_bytes} bytes'
+        content_length = request.META.get('CONTENT_LENGTH') or ''
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            raise BodyTooLarge(error)
+
+        chunks = []
+        size = 0
+        while chunk := request.read(chunk_size):
+            size += len(chunk)
+            if size > max_bytes:
+                raise BodyTooLarge(error)
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    @staticmethod
+    def parse_body(body, content_type=''):
+        """
+        Décoder le corps de la requête en liste de lignes
+
+        Returns:
+            tuple: (lignes, erreurs de décodage) ; une ligne NDJSON illisible
+            est rejetée seule sans invalider le reste
+
+        Raises:
+            ValueError: Si le corps n'est ni un tableau JSON ni du NDJSON
+        """
+        text = body.decode('utf-8') if isinstance(body, bytes) else body
+        if 'ndjson' not in content_type and text.lstrip().startswith('['):
+            rows = json.loads(text)
+            return rows, []
+
+        rows = []
+        errors = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                rows.append(None)
+                errors.append({'row': len(rows), 'error': 'Invalid JSON'})
+        if not rows:
+            raise ValueError('Expected a JSON array or NDJSON body')
+        return rows, errors
+
+    @staticmethod
+    def validate_rows(rows):
+        """
+        Valider toutes les lignes en une passe
+
+        Returns:
+            tuple: (instances Product valides, erreurs [{'row': n, 'error': ...}])
+        """
+        products = []
+        errors = []
+        for row_number, row in enumerate(rows, start=1):
+            if row is None:
+                continue  # Déjà signalée par parse_body
+            if not isinstance(row, dict):
+                errors.append({'row': row_number, 'error': 'Row must be a JSON object'})
+                continue
+
+            if not row.get('name') or row.get('price') in (None, ''):
+                errors.append({'row': row_number, 'error': 'Name and price are required'})
+                continue
+            try:
+                name = clean_name(row['name'])
+                price = clean_price(row['price'])
+                description = clean_description(row.get('description', ''))
+            except ValueError as e:
+                errors.append({'row': row_number, 'error': str(e)})
+                continue
+
+            products.append(Product(name=name, price=price, description=description))
+        return products, errors
+
+    @staticmethod
+    def ingest(rows, batch_size=None):
+        """
+        Valider puis insérer les lignes valides
+
+        Returns:
+            dict: Résumé {'received', 'created', 'rejected', 'errors'}
+        """
+        batch_size = batch_size or getattr(settings, 'BULK_INGEST_BATCH_SIZE', 1000)
+        products, errors = ProductBulkIngest.validate_rows(rows)
+        with transaction.atomic():
+            Product.objects.bulk_create(products, batch_size=batch_size)
+            # bulk_create n'émet pas post_save : agrégats et journal mis à jour ici
+            if products:
+                CatalogAggregates.apply(added=[(product.pk, product.price) for product in products])
+                ProductChangeLog.record_instances('create', products, LOGGED_FIELDS)
+        return {
+            'received': len(rows),
+            'created': len(products),
+            'rejected': len(rows) - len(products),
+            'errors': errors,
+        }
+
+
+class ProductBulkUpdate:
+    """
+    Mise à jour par lots : toutes les cibles sont chargées en un in_bulk,
+    puis écrites avec bulk_update en ne touchant que les champs modifiés.
+    Les mises à jour ensemblistes (ex: +5% sur les prix < X) passent par
+    un UPDATE unique avec des expressions F.
+    """
+
+    UPDATABLE_FIELDS = {
+        'name': clean_name,
+        'price': clean_price,
+        'description': clean_description,
+    }
+    FILTERS = {
+        'ids': 'id__in',
+        'price_lt': 'price__lt',
+        'price_lte': 'price__lte',
+        'price_gt': 'price__gt',
+        'price_gte': 'price__gte',
+    }
+
+    @staticmethod
+    def apply_entries(entries, batch_size=None):
+        """
+        Appliquer une liste de {"id": ..., <champ>: <valeur>, ...}
+
+        Returns:
+            dict: Résumé {'received', 'updated', 'unchanged', 'missing_ids', 'errors'}
+        """
+        batch_size = batch_size or getattr(settings, 'BULK_INGEST_BATCH_SIZE', 1000)
+        errors = []
+        changes = {}
+        for row_number, entry in enumerate(entries, start=1):
+            if not isinstance(entry, dict) or not isinstance(entry.get('id'), int):
+                errors.append({'row': row_number, 'error': 'Each entry must be an object with an integer id'})
+                continue
+            unknown = set(entry) - set(ProductBulkUpdate.UPDATABLE_FIELDS) - {'id'}
+            if unknown:
+                errors.append({'row': row_number, 'error': f'Unknown fields: {", ".join(sorted(unknown))}'})
+                continue
+            try:
+                cleaned = {
+                    field: ProductBulkUpdate.UPDATABLE_FIELDS[field](value)
+                    for field, value in entry.items() if field != 'id'
+                }
+            except ValueError as e:
+                errors.append({'row': row_number, 'error': str(e)})
+                continue
+            # Plusieurs entrées pour le même id : la dernière l'emporte champ par champ
+            changes.setdefault(entry['id'], {}).update(cleaned)
+
+        now = timezone.now()
+        updated = 0
+        with transaction.atomic():
+            products = Product.objects.in_bulk(list(changes))
+            missing_ids = sorted(set(changes) - set(products))
+
+            # Regrouper par ensemble de champs réellement modifiés
+            groups = {}
+            old_prices = []
+            new_prices = []
+            for product_id, product in products.items():
+                changed_fields = []
+                for field, value in changes[product_id].items():
+                    if getattr(product, field) != value:
+                        if field == 'price':
+                            old_prices.append((product_id, product.price))
+                            new_prices.append((product_id, value))
+                        setattr(product, field, value)
+                        changed_fields.append(field)
+                if changed_fields:
+                    product.updated_at = now
+                    groups.setdefault(tuple(sorted(changed_fields)), []).append(product)
+
+            for fields, group in groups.items():
+                updated += Product.objects.bulk_update(group, [*fields, 'updated_at'], batch_size=batch_size)
+                ProductChangeLog.record_instances('update', group, [*fields, 'updated_at'])
+            if updated:
+                CatalogAggregates.apply(added=new_prices, removed=old_prices)
+
+        return {
+            'received': len(entries),
+            'updated': updated,
+            'unchanged': len(products) - updated,
+            'missing_ids': missing_ids,
+            'errors': errors,
+        }
+
+    @staticmethod
+    def apply_price_change(filters, percent=None, delta=None):
+        """
+        Modifier les prix de tous les produits filtrés en un seul UPDATE
+
+        Args:
+            filters: Dictionnaire de filtres autorisés (voir FILTERS)
+            percent: Variation en pourcentage (ex: 5 pour +5%)
+            delta: Variation absolue du prix
+
+        Returns:
+            int: Nombre de produits modifiés
+
+        Raises:
+            ValueError: Si les filtres ou la variation sont invalides, ou si un prix
+                résultant serait nul, négatif ou au-delà du maximum de Product.price
+        """
+        if (percent is None) == (delta is None):
+            raise ValueError('Provide exactly one of percent or delta')
+        unknown = set(filters) - set(ProductBulkUpdate.FILTERS)
+        if unknown:
+            raise ValueError(f'Unknown filters: {", ".join(sorted(unknown))}')
+        if not filters:
+            raise ValueError('At least one filter is required')
+
+        lookups = {}
+        for name, value in filters.items():
+            if name == 'ids':
+                if not isinstance(value, list) or not all(isinstance(i, int) for i in value):
+                    raise ValueError('ids must be a list of integers')
+                lookups[ProductBulkUpdate.FILTERS[name]] = value
+            else:
+                lookups[ProductBulkUpdate.FILTERS[name]] = clean_price(value)
+
+        try:
+            change = Decimal(str(percent if percent is not None else delta))
+        except InvalidOperation:
+            raise ValueError('Invalid price change')
+        if not change.is_finite():
+            raise ValueError('Invalid price change')
+        if percent is not None:
+            new_price = Round(F('price') * (1 + change / 100), PRICE_FIELD.decimal_places)
+        else:
+            new_price = F('price') + change
+
+        with transaction.atomic():
+            # Mêmes bornes que clean_price, vérifiées sur les prix résultants avant l'UPDATE
+            # (la transaction tient le verrou d'écriture : les cibles ne bougent pas entre les deux)
+            bounds = Product.objects.filter(**lookups).aggregate(low=Min(new_price), high=Max(new_price))
+            if bounds['low'] is not None and Decimal(str(bounds['low'])) <= 0:
+                raise ValueError(f'Price change would make a price zero or negative (lowest: {bounds["low"]})')
+            if bounds['high'] is not None and Decimal(str(bounds['high'])) >= PRICE_MAX:
+                raise ValueError(f'Price change would make a price exceed the maximum of {PRICE_MAX - PRICE_QUANTUM}')
+
+            # Les filtres portent sur le prix : relever les cibles avant de le modifier
+            target_ids = list(Product.objects.filter(**lookups).values_list('id', flat=True))
+            updated = Product.objects.filter(**lookups).update(price=new_price, updated_at=timezone.now())
+            if updated:
+                CatalogAggregates.rebuild()
+                for offset in range(0, len(target_ids), 500):
+                    ProductChangeLog.record_rows('update', Product.objects.filter(
+                        id__in=target_ids[offset:offset + 500]
+                    ).values('id', 'price', 'updated_at'))
+        return updated
@@ -0,0 +1,350 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse
+from django.utils import timezone
+from django.utils.http import parse_etags
+
+from .db_routing import use_primary
+from .file_cache import file_lock
+from .models import CatalogAggregate, Product
+from .serializers import PRODUCT_FIELDS, dumps, product_serializer
+
+try:
+    import brotli
+except ImportError:  # brotli est optionnel : seuls gzip et identity sont alors produits
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.json'
+# Verrou flock sérialisant les reconstructions de tous les threads et processus
+LOCK_NAME = '.build.lock'
+ROWS_PER_CHUNK = 2000
+# Ordre de préférence à égalité de qvalue dans Accept-Encoding
+ENCODING_PREFERENCE = ('br', 'gzip', 'identity')
+SUFFIXES = {'br': '.br', 'gzip': '.gz', 'identity': ''}
+
+
+class _IdentityWriter:
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+class _BrotliWriter:
+    def __init__(self, file, quality):
+        self.file = file
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def write(self, data):
+        self.file.write(self.compressor.process(data))
+
+    def close(self):
+        self.file.write(self.compressor.finish())
+        self.file.close()
+
+
+class _GzipWriter:
+    def __init__(self, file, level):
+        self.file = file
+        # mtime=0 : mêmes octets pour un même contenu, d'une reconstruction à l'autre
+        self.gzip = gzip.GzipFile(fileobj=file, mode='wb', compresslevel=level, mtime=0)
+
+    def write(self, data):
+        self.gzip.write(data)
+
+    def close(self):
+        self.gzip.close()
+        self.file.close()
+
+
+class CatalogSnapshot:
+    """
+    Catalogue complet rendu une fois en JSON puis stocké précompressé
+    (gzip, brotli si le module est installé, et non compressé) dans
+    CATALOG_SNAPSHOT_DIR. Les fichiers d'une génération portent la version
+    du catalogue et l'empreinte du contenu ; manifest.json (remplacé en
+    dernier, par renommage atomique) désigne la génération courante et
+    n'est jamais remplacé par une version plus ancienne.
+    Les requêtes reçoivent le fichier correspondant à leur Accept-Encoding
+    via FileResponse, sans compression à la volée.
+    """
+
+    @staticmethod
+    def snapshot_dir():
+        directory = getattr(settings, 'CATALOG_SNAPSHOT_DIR', None)
+        return Path(directory or settings.BASE_DIR / 'cache' / 'snapshots')
+
+    @staticmethod
+    def encodings():
+        return ('br', 'gzip', 'identity') if brotli is not None else ('gzip', 'identity')
+
+    @staticmethod
+    def current_version():
+        return CatalogAggregate.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @staticmethod
+    def manifest(directory=None):
+        """Manifeste de la génération courante, ou None si aucun snapshot n'a été construit"""
+        try:
+            with open((directory or CatalogSnapshot.snapshot_dir()) / MANIFEST_NAME, 'rb') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def generation_version(name):
+        """Version du catalogue d'un fichier catalog-<version>-<empreinte>.json[.gz|.br]"""
+        return int(name.split('-')[1])
+
+    @staticmethod
+    def build(directory=None, force=False):
+        """
+        Rendre le catalogue et écrire une nouvelle génération de fichiers
+
+        La version est lue avant les produits, qui sont lus par une seule
+        requête (instantané cohérent) : le contenu est au moins aussi récent
+        que la version annoncée, et toute écriture ultérieure déclenche une
+        nouvelle reconstruction. Les reconstructions (scheduler de chaque
+        worker, commande) sont sérialisées par un verrou sur le répertoire.
+
+        Returns:
+            dict: Le manifeste de la génération écrite (ou déjà à jour)
+        """
+        directory = directory or CatalogSnapshot.snapshot_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        with file_lock(directory / LOCK_NAME):
+            return CatalogSnapshot._build(directory, force)
+
+    @staticmethod
+    def _build(directory, force):
+        version = CatalogSnapshot.current_version()
+        previous = CatalogSnapshot.manifest(directory)
+        if previous is not None and previous['version'] >= version and not force:
+            return previous
+
+        tmp_prefix = f'.catalog-{version}-{os.getpid()}-{threading.get_ident()}'
+        writers = {}
+        for encoding in CatalogSnapshot.encodings():
+            file = open(directory / f'{tmp_prefix}.json{SUFFIXES[encoding]}.tmp', 'wb')
+            if encoding == 'br':
+                writers[encoding] = _BrotliWriter(file, getattr(settings, 'CATALOG_SNAPSHOT_BROTLI_QUALITY', 11))
+            elif encoding == 'gzip':
+                writers[encoding] = _GzipWriter(file, getattr(settings, 'CATALOG_SNAPSHOT_GZIP_LEVEL', 9))
+            else:
+                writers[encoding] = _IdentityWriter(file)
+
+        digest = hashlib.sha256()
+        count = 0
+        try:
+            def write(data):
+                digest.update(data)
+                for writer in writers.values():
+                    writer.write(data)
+
+            serializer = product_serializer(PRODUCT_FIELDS)
+            write(b'{"catalog_version":%d,"products":[' % version)
+            chunk = []
+            rows = serializer.values_list(Product.objects.order_by('id')).iterator(chunk_size=ROWS_PER_CHUNK)
+            for values in rows:
+                chunk.append(serializer.row(values))
+                if len(chunk) == ROWS_PER_CHUNK:
+                    # dumps() d'une liste puis retrait des crochets : un seul appel par bloc
+                    write((b',' if count else b'') + dumps(chunk)[1:-1])
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                write((b',' if count else b'') + dumps(chunk)[1:-1])
+                count += len(chunk)
+            write(b']}')
+        finally:
+            for writer in writers.values():
+                writer.close()
+
+        generation = f'catalog-{version}-{digest.hexdigest()[:16]}'
+        current = CatalogSnapshot.manifest(directory)
+        if current is not None and current['version'] > version:
+            # Un constructeur hors verrou (autre machine sur un répertoire partagé) a publié plus récent
+            for writer in writers:
+                (directory / f'{tmp_prefix}.json{SUFFIXES[writer]}.tmp').unlink(missing_ok=True)
+            return current
+
+        files = {}
+        for encoding in writers:
+            name = f'{generation}.json{SUFFIXES[encoding]}'
+            os.replace(directory / f'{tmp_prefix}.json{SUFFIXES[encoding]}.tmp', directory / name)
+            files[encoding] = {'name': name, 'size': (directory / name).stat().st_size}
+
+        manifest = {
+            'version': version,
+            'generation': generation,
+            'product_count': count,
+            'built_at': timezone.now().isoformat(),
+            'files': files,
+        }
+        tmp_manifest = directory / f'{tmp_prefix}.manifest.tmp'
+        tmp_manifest.write_bytes(json.dumps(manifest).encode())
+        os.replace(tmp_manifest, directory / MANIFEST_NAME)
+
+        # Seules les générations plus anciennes que celle publiée sont supprimées (une réponse en
+        # cours garde son descripteur ouvert) ; une génération plus récente reste en place
+        for path in directory.glob('catalog-*.json*'):
+            if CatalogSnapshot.generation_version(path.name) < version:
+                path.unlink(missing_ok=True)
+        return manifest
+
+    @staticmethod
+    def negotiate(accept_encoding, available):
+        """
+        Choisir un encodage disponible selon Accept-Encoding (qvalues comprises)
+
+        Returns:
+            str: 'br', 'gzip' ou 'identity' ; None si même identity est refusé
+        """
+        qvalues = {}
+        for part in (accept_encoding or '').split(','):
+            coding, _, params = part.strip().partition(';')
+            coding = coding.strip().lower()
+            if not coding:
+                continue
+            qvalue = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    qvalue = float(params[2:])
+                except ValueError:
+                    qvalue = 0.0
+            qvalues[coding] = qvalue
+
+        def quality(encoding):
+            if encoding in qvalues:
+                return qvalues[encoding]
+            if encoding == 'identity' and '*' not in qvalues:
+                # identity reste acceptable sauf refus explicite (identity;q=0 ou *;q=0), en dernier recours
+                return 0.001
+            return qvalues.get('*', 0.0)
+
+        candidates = [encoding for encoding in ENCODING_PREFERENCE if encoding in available and quality(encoding) > 0]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda encoding: (quality(encoding), -ENCODING_PREFERENCE.index(encoding)))
+
+    @staticmethod
+    def etag(manifest, encoding):
+        # Un ETag fort par représentation : les octets diffèrent d'un encodage à l'autre
+        suffix = '' if encoding == 'identity' else f'-{encoding}'
+        return f'"{manifest["generation"]}{suffix}"'
+
+    @staticmethod
+    def serve(request, retry=True):
+        """
+        Réponse pour le snapshot courant : 304 si If-None-Match correspond,
+        sinon FileResponse (sendfile via wsgi.file_wrapper quand le serveur le
+        fournit). Sans snapshot, la construction est planifiée tout de suite et
+        la requête reçoit 503 + Retry-After plutôt que d'attendre le rendu du
+        catalogue complet ; s'il est en retard sur le catalogue, une
+        reconstruction est planifiée et le snapshot précédent est servi en attendant.
+        """
+        manifest = CatalogSnapshot.manifest()
+        if manifest is None:
+            snapshot_scheduler.schedule(delay=0)
+            response = JsonResponse({'error': 'Catalog snapshot is being built, retry later'}, status=503)
+            response.headers['Retry-After'] = str(getattr(settings, 'CATALOG_SNAPSHOT_RETRY_AFTER', 5))
+            return response
+        if manifest['version'] < CatalogSnapshot.current_version():
+            snapshot_scheduler.schedule()
+
+        encoding = CatalogSnapshot.negotiate(request.META.get('HTTP_ACCEPT_ENCODING'), manifest['files'])
+        if encoding is None:
+            return None
+        etag = CatalogSnapshot.etag(manifest, encoding)
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            try:
+                file = open(CatalogSnapshot.snapshot_dir() / manifest['files'][encoding]['name'], 'rb')
+            except FileNotFoundError:
+                if not retry:
+                    raise
+                # Génération remplacée entre la lecture du manifeste et l'ouverture
+                return CatalogSnapshot.serve(request, retry=False)
+            response = FileResponse(file, content_type='application/json', filename='catalog.json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+            response.headers['X-Catalog-Version'] = str(manifest['version'])
+        response.headers['ETag'] = etag
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+class SnapshotScheduler:
+    """
+    Reconstruction différée du snapshot dans un thread d'arrière-plan unique :
+    chaque écriture repousse l'échéance de CATALOG_SNAPSHOT_DEBOUNCE secondes,
+    sans dépasser CATALOG_SNAPSHOT_MAX_DELAY depuis la première écriture en
+    attente (un flux continu d'écritures reconstruit quand même). Les
+    écritures survenues pendant une reconstruction en déclenchent une autre.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._thread = None
+        self._deadline = None
+        self._first_request = None
+
+    def schedule(self, delay=None):
+        """
+        Args:
+            delay: Secondes avant la reconstruction (défaut : CATALOG_SNAPSHOT_DEBOUNCE) ;
+                   0 quand aucun snapshot n'existe encore
+        """
+        debounce = getattr(settings, 'CATALOG_SNAPSHOT_DEBOUNCE', 2)
+        if debounce is None:  # désactivé : commande build_catalog_snapshot uniquement
+            return
+        max_delay = getattr(settings, 'CATALOG_SNAPSHOT_MAX_DELAY', 30)
+        delay = debounce if delay is None else delay
+        with self._condition:
+            now = time.monotonic()
+            if self._first_request is None:
+                self._first_request = now
+            self._deadline = min(now + delay, self._first_request + max_delay)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='catalog-snapshot', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._deadline is None:
+                    self._condition.wait()
+                while (remaining := self._deadline - time.monotonic()) > 0:
+                    self._condition.wait(remaining)
+                self._deadline = self._first_request = None
+            try:
+                # Version et produits lus sur la base principale : un réplica en retard
+                # publierait un snapshot déjà périmé
+                with use_primary():
+                    CatalogSnapshot.build()
+            except Exception:
+                logger.exception('Catalog snapshot rebuild failed')
+            finally:
+                connections.close_all()
+
+
+snapshot_scheduler = SnapshotScheduler()
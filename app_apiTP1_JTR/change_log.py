@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import ProductChange
+
+# Champs recopiés dans le journal ; updated_at accompagne toute modification
+LOGGED_FIELDS = ('name', 'price', 'description', 'created_at', 'updated_at')
+TRACKED_FIELDS = ('name', 'price', 'description')
+
+
+class ChangeLogCompacted(Exception):
+    """La séquence demandée est antérieure à la partie conservée du journal"""
+
+    def __init__(self, horizon):
+        super().__init__(f'Change log compacted through seq {horizon}, bootstrap from a snapshot')
+        self.horizon = horizon
+
+
+class ProductChangeLog:
+    """
+    Journal des modifications de Product : une entrée par création, modification
+    ou suppression, écrite dans la transaction de l'écriture elle-même.
+
+    Un client se synchronise en lisant changes?since=<dernière seq appliquée> ;
+    un nouveau client (ou un client plus ancien que l'horizon de compaction) part
+    d'un snapshot (changes/snapshot/) puis lit la suite depuis la seq du snapshot.
+    """
+
+    @staticmethod
+    def remember_values(instance):
+        """Valeurs chargées (post_init), pour n'enregistrer que les champs modifiés"""
+        instance._logged_values = {field: instance.__dict__[field]
+                                   for field in TRACKED_FIELDS if field in instance.__dict__}
+
+    @staticmethod
+    def record_save(instance, created):
+        if created:
+            ProductChangeLog.record_instances('create', [instance], LOGGED_FIELDS)
+        else:
+            loaded = getattr(instance, '_logged_values', {})
+            changed = [field for field in TRACKED_FIELDS
+                       if field not in loaded or loaded[field] != getattr(instance, field)]
+            if changed:
+                ProductChangeLog.record_instances('update', [instance], [*changed, 'updated_at'])
+        ProductChangeLog.remember_values(instance)
+
+    @staticmethod
+    def record_delete(instance):
+        ProductChange.objects.create(product_id=instance.pk, op='delete', fields={})
+
+    @staticmethod
+    def record_instances(op, products, fields):
+        """Une entrée par produit avec les valeurs actuelles de `fields`"""
+        ProductChange.objects.bulk_create([
+            ProductChange(product_id=product.pk, op=op,
+                          fields={field: getattr(product, field) for field in fields})
+            for product in products
+        ])
+
+    @staticmethod
+    def record_rows(op, rows):
+        """Comme record_instances, depuis des dictionnaires issus de values() (avec 'id')"""
+        ProductChange.objects.bulk_create([
+            ProductChange(product_id=row['id'], op=op,
+                          fields={field: value for field, value in row.items() if field != 'id'})
+            for row in rows
+        ])
+
+    @staticmethod
+    def horizon():
+        """Dernière seq effacée par la compaction (0 si rien n'a été compacté)"""
+        first = ProductChange.objects.aggregate(first=Min('seq'))['first']
+        return first - 1 if first else 0
+
+    @staticmethod
+    def current_seq():
+        return ProductChange.objects.aggregate(last=Max('seq'))['last'] or 0
+
+    @staticmethod
+    def read(since, limit=None):
+        """
+        Entrées de seq > since, dans l'ordre, au plus `limit`
+
+        Raises:
+            ChangeLogCompacted: Si des entrées postérieures à `since` ont été compactées
+        """
+        limit = min(limit or getattr(settings, 'CHANGES_PAGE_SIZE', 500),
+                    getattr(settings, 'CHANGES_MAX_PAGE_SIZE', 5000))
+        horizon = ProductChangeLog.horizon()
+        if since < horizon:
+            raise ChangeLogCompacted(horizon)
+
+        rows = list(ProductChange.objects.filter(seq__gt=since).order_by('seq')
+                    .values('seq', 'product_id', 'op', 'fields', 'created_at')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            'changes': rows,
+            'next_since': rows[-1]['seq'] if rows else since,
+            'has_more': has_more,
+        }
+
+    @staticmethod
+    def compact(retention=None):
+        """
+        Supprimer les entrées plus anciennes que la rétention (CHANGE_LOG_RETENTION_DAYS).
+        La dernière entrée est toujours conservée : l'horizon (première seq - 1) reste
+        ainsi connu même quand le journal a été entièrement compacté.
+
+        Returns:
+            int: Nombre d'entrées supprimées
+        """
+        if retention is None:
+            retention = timedelta(days=getattr(settings, 'CHANGE_LOG_RETENTION_DAYS', 7))
+        last = ProductChangeLog.current_seq()
+        deleted, _ = ProductChange.objects.filter(
+            created_at__lt=timezone.now() - retention, seq__lt=last
+        ).delete()
+        return deleted
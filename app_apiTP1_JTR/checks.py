@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+# Backends dont chaque processus a sa propre copie des données
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_rate_limit_cache(app_configs, **kwargs):
+    """
+    Les compteurs des limites de requêtes doivent être partagés entre workers : avec un cache
+    par processus, chaque worker applique sa propre limite et N workers laissent passer N fois plus
+    """
+    if not getattr(settings, 'API_RATE_LIMITS', {}):
+        return []
+    alias = getattr(settings, 'API_RATE_LIMIT_CACHE_ALIAS', 'shared')
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHE_BACKENDS:
+        return []
+    return [Error(
+        f"API_RATE_LIMIT_CACHE_ALIAS '{alias}' uses {backend.rsplit('.', 1)[-1]}, which is not shared "
+        "between worker processes: each worker would enforce its own rate limit.",
+        hint="Point it at a shared cache with atomic add/incr ('shared', Redis, Memcached), or add "
+             "'app_apiTP1_JTR.E001' to SILENCED_SYSTEM_CHECKS for a single-process deployment.",
+        id='app_apiTP1_JTR.E001',
+    )]
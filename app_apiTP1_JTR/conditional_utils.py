@@ -0,0 +1,60 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.views.decorators.http import condition
+
+from .aggregates import CatalogAggregates
+
+
+def get_catalog_version(request):
+    """(version, updated_at) du catalogue, lus une seule fois par requête (ETag, clé du cache de réponses)"""
+    if not hasattr(request, '_catalog_version'):
+        request._catalog_version = CatalogAggregates.current_version()
+    return request._catalog_version
+
+
+def in_atomic_batch(request):
+    """
+    Vrai pour une opération d'un lot /batch atomique : la version du catalogue qu'elle lit
+    peut encore être annulée, puis réattribuée par une autre écriture à un contenu différent
+    """
+    return getattr(request, 'in_atomic_batch', False)
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    ETag d'une lecture du catalogue : version du catalogue + URL complète
+    (filtres, curseur...) + utilisateur, puisque la réponse contient accessed_by
+    """
+    version, _ = get_catalog_version(request)
+    username = getattr(request.user, 'username', '')
+    digest = hashlib.sha1(f'{request.get_full_path()}|{username}'.encode()).hexdigest()[:16]
+    return f'catalog-{version}-{digest}'
+
+
+def catalog_condition(view):
+    """
+    Répondre 304 si le catalogue n'a pas changé, avant toute lecture des produits.
+    ETag seulement : Last-Modified n'a qu'une précision d'une seconde, et un client
+    n'envoyant que If-Modified-Since recevrait un 304 après une écriture dans la
+    même seconde ; la version du catalogue, elle, change à chaque écriture.
+    À placer sous require_api_key/require_permission : un 304 n'est renvoyé
+    qu'après authentification. Pour une vue asynchrone, la version est lue
+    par l'ORM asynchrone avant que condition() appelle les fonctions ETag.
+    """
+    conditional_view = condition(etag_func=catalog_etag)(view)
+    if not iscoroutinefunction(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if in_atomic_batch(request):
+                return view(request, *args, **kwargs)
+            return conditional_view(request, *args, **kwargs)
+        return wrapper
+
+    @wraps(view)
+    async def async_wrapper(request, *args, **kwargs):
+        if not hasattr(request, '_catalog_version'):
+            request._catalog_version = await CatalogAggregates.acurrent_version()
+        return await conditional_view(request, *args, **kwargs)
+    return async_wrapper
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import random
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+# Vrai quand les lectures du contexte courant doivent aller sur la base principale
+_use_primary = ContextVar('use_primary', default=False)
+# Vrai dès qu'une écriture a été routée dans le contexte courant
+_has_written = ContextVar('has_written', default=False)
+# Réplica de toutes les lectures du contexte courant (une requête) : les réplicas sont copiés
+# l'un après l'autre, en lire plusieurs mélangerait des instantanés d'âges différents
+_replica = ContextVar('replica', default=None)
+
+
+def read_replicas():
+    return getattr(settings, 'DATABASE_READ_REPLICAS', [])
+
+
+@contextmanager
+def use_primary():
+    """Forcer les lectures sur la base principale (ex. lecture juste après une écriture)"""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Écritures sur 'default', lectures réparties sur settings.DATABASE_READ_REPLICAS,
+    un seul réplica par requête (tiré par ReplicaStickinessMiddleware, ou à la première
+    lecture d'un contexte hors requête). Sans réplica configuré, tout reste sur 'default'.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = read_replicas()
+        if not replicas or _use_primary.get():
+            return 'default'
+        replica = _replica.get()
+        if replica not in replicas:
+            replica = random.choice(replicas)
+            _replica.set(replica)
+        return replica
+
+    def db_for_write(self, model, **hints):
+        # Une écriture rend les lectures suivantes du même contexte collantes à la base principale
+        _has_written.set(True)
+        _use_primary.set(True)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Les réplicas sont des copies de la base principale : mêmes objets
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaStickiness:
+    """Fenêtre read-your-writes par client, partagée entre workers via le cache"""
+
+    @staticmethod
+    def client_key(request):
+        api_key = request.headers.get('X-API-Key')
+        if not api_key:
+            return None
+        return 'replica-sticky:' + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+
+    @staticmethod
+    def get_cache():
+        return caches[getattr(settings, 'REPLICA_STICKY_CACHE_ALIAS', 'shared')]
+
+    @staticmethod
+    def is_sticky(request):
+        key = ReplicaStickiness.client_key(request)
+        return key is not None and ReplicaStickiness.get_cache().get(key) is not None
+
+    @staticmethod
+    def mark(request):
+        key = ReplicaStickiness.client_key(request)
+        if key is not None:
+            ReplicaStickiness.get_cache().set(key, 1, getattr(settings, 'REPLICA_STICKY_SECONDS', 15))
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Router les lectures d'une requête sur la base principale si la méthode écrit ou si le même
+    client a écrit récemment ; après une écriture, ouvrir la fenêtre de ce client.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not read_replicas():
+            return self.get_response(request)
+        tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.finish(request, tokens)
+        return response
+
+    async def __acall__(self, request):
+        if not read_replicas():
+            return await self.get_response(request)
+        tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.finish(request, tokens)
+        return response
+
+    @staticmethod
+    def start(request):
+        # Repartir d'un contexte propre : un thread de worker sert plusieurs requêtes
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or ReplicaStickiness.is_sticky(request)
+        return _use_primary.set(pinned), _has_written.set(False), _replica.set(random.choice(read_replicas()))
+
+    @staticmethod
+    def finish(request, tokens):
+        if _has_written.get() or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            ReplicaStickiness.mark(request)
+        _use_primary.reset(tokens[0])
+        _has_written.reset(tokens[1])
+        _replica.reset(tokens[2])
+
+
+class ReplicaSnapshot:
+    """Copies SQLite de la base principale servant de réplicas de lecture locaux"""
+
+    @staticmethod
+    def replica_path(alias):
+        """Chemin du fichier d'un alias réplica ('file:/chemin?mode=ro' -> '/chemin')"""
+        name = str(connections[alias].settings_dict['NAME'])
+        if name.startswith('file:'):
+            name = name[len('file:'):].split('?', 1)[0]
+        return name
+
+    @staticmethod
+    def copy(target_path, source_alias='default'):
+        """
+        Copier la base via l'API de sauvegarde SQLite (cohérente même pendant des écritures),
+        puis remplacer le fichier cible d'un coup : un lecteur voit l'ancien ou le nouveau snapshot.
+        """
+        source = connections[source_alias]
+        if source.in_atomic_block:
+            # La sauvegarde attendrait indéfiniment la fin de notre propre transaction
+            raise RuntimeError('Replica snapshots must be taken outside a transaction')
+        source.ensure_connection()
+        temporary = f'{target_path}.tmp'
+        destination = sqlite3.connect(temporary)
+        try:
+            source.connection.backup(destination)
+            # Un fichier en WAL ne s'ouvre pas en lecture seule sans pouvoir créer son -shm
+            destination.execute('PRAGMA journal_mode = DELETE')
+        finally:
+            destination.close()
+        os.replace(temporary, target_path)
+
+    @staticmethod
+    def refresh_all():
+        """Rafraîchir tous les réplicas configurés ; retourne les chemins copiés"""
+        paths = [ReplicaSnapshot.replica_path(alias) for alias in read_replicas()]
+        for path in paths:
+            ReplicaSnapshot.copy(path)
+        return paths
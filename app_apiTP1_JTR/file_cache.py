@@ -0,0 +1,47 @@
+import fcntl
+import os
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+# Fichiers de verrou par répertoire de cache : les clés y sont réparties selon leur empreinte
+LOCK_STRIPES = 64
+
+
+@contextmanager
+def file_lock(path):
+    """Verrou exclusif entre processus (flock) sur le fichier path, créé au besoin"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class LockedFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache dont add() et incr() sont atomiques entre les processus de la machine :
+    la lecture et l'écriture de la clé se font sous verrou flock. Les fichiers de verrou
+    (lock-N) ne sont ni comptés ni supprimés par clear() et le nettoyage, qui ne voient
+    que les fichiers .djcache.
+    """
+
+    def _lock(self, key, version=None):
+        digest = os.path.basename(self._key_to_file(key, version))
+        return file_lock(os.path.join(self._dir, f'lock-{int(digest[:8], 16) % LOCK_STRIPES}'))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._lock(key, version):
+            return super().add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._lock(key, version):
+            return super().incr(key, delta, version)
+
+    async def aincr(self, key, delta=1, version=None):
+        # BaseCache.aincr enchaîne aget/aset sans passer par incr : pas de verrou
+        return await sync_to_async(self.incr, thread_sensitive=True)(key, delta, version)
@@ -0,0 +1,115 @@
+from decimal import Decimal, InvalidOperation
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+# ?ordering=<clé> -> tri keyset (le dernier champ, id, rend l'ordre total)
+PRODUCT_ORDERINGS = {
+    'id': ('id',),
+    '-id': ('-id',),
+    'price': ('price', 'id'),
+    '-price': ('-price', '-id'),
+    'created_at': ('created_at', 'id'),
+    '-created_at': ('-created_at', '-id'),
+    'updated_at': ('updated_at', 'id'),
+    '-updated_at': ('-updated_at', '-id'),
+}
+
+# Paramètre de filtre -> colonne indexée qu'il restreint
+FILTER_COLUMNS = {
+    'price_min': 'price',
+    'price_max': 'price',
+    'updated_since': 'updated_at',
+    'created_between': 'created_at',
+}
+
+
+class ProductFilterHelper:
+    """
+    Filtres et tris autorisés sur la liste des produits. Chaque filtre et
+    chaque tri porte sur une colonne indexée (voir Product.Meta.indexes).
+    Quand un filtre est présent, le tri doit porter sur une colonne filtrée :
+    la plage et l'ordre sont alors servis par le même index.
+    """
+
+    @staticmethod
+    def filter_queryset(queryset, params):
+        """
+        Appliquer les filtres de la query string
+
+        Args:
+            queryset: Queryset de produits
+            params: request.GET (price_min, price_max, updated_since, created_between)
+
+        Returns:
+            Le queryset filtré
+
+        Raises:
+            ValueError: Si une valeur est invalide
+        """
+        if params.get('price_min'):
+            queryset = queryset.filter(price__gte=ProductFilterHelper.parse_decimal('price_min', params['price_min']))
+        if params.get('price_max'):
+            queryset = queryset.filter(price__lte=ProductFilterHelper.parse_decimal('price_max', params['price_max']))
+        if params.get('updated_since'):
+            queryset = queryset.filter(
+                updated_at__gte=ProductFilterHelper.parse_timestamp('updated_since', params['updated_since'])
+            )
+        if params.get('created_between'):
+            start, separator, end = params['created_between'].partition(',')
+            if not separator:
+                raise ValueError('created_between must be "<start>,<end>"')
+            if start:
+                queryset = queryset.filter(created_at__gte=ProductFilterHelper.parse_timestamp('created_between', start))
+            if end:
+                queryset = queryset.filter(created_at__lte=ProductFilterHelper.parse_timestamp('created_between', end))
+        return queryset
+
+    @staticmethod
+    def get_ordering(params):
+        """
+        Choisir le tri keyset : ?ordering si fourni, sinon la colonne du premier
+        filtre présent, sinon l'id
+
+        Raises:
+            ValueError: Si le tri n'est pas autorisé, seul ou avec ces filtres
+        """
+        filtered_columns = []
+        for name, column in FILTER_COLUMNS.items():
+            if params.get(name) and column not in filtered_columns:
+                filtered_columns.append(column)
+
+        key = params.get('ordering') or (filtered_columns[0] if filtered_columns else 'id')
+        if key not in PRODUCT_ORDERINGS:
+            raise ValueError(f'Invalid ordering. Allowed: {", ".join(PRODUCT_ORDERINGS)}')
+        if filtered_columns and key.lstrip('-') not in filtered_columns:
+            allowed = ', '.join(f'{column}, -{column}' for column in filtered_columns)
+            raise ValueError(f'With these filters, ordering must be one of: {allowed}')
+        return PRODUCT_ORDERINGS[key]
+
+    @staticmethod
+    def parse_decimal(name, value):
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            raise ValueError(f'{name} must be a number')
+        if not number.is_finite():
+            raise ValueError(f'{name} must be a number')
+        return number
+
+    @staticmethod
+    def parse_timestamp(name, value):
+        """Accepter une date ISO 8601 avec ou sans heure (naïve = fuseau du projet)"""
+        try:
+            parsed = parse_datetime(value)
+            if parsed is None:
+                date = parse_date(value)
+                if date is not None:
+                    parsed = timezone.datetime(date.year, date.month, date.day)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValueError(f'{name} must be an ISO 8601 date or datetime')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
@@ -0,0 +1,385 @@
+import csv
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .bulk_utils import ProductBulkIngest, ProductBulkUpdate
+from .db_routing import use_primary
+from .models import ImportJob
+
+FINISHED_STATUSES = ('succeeded', 'failed', 'cancelled')
+
+
+class ImportJobLost(Exception):
+    """Le job a été repris par un autre worker (redémarrage) : ce worker s'arrête sans rien valider"""
+
+
+class ImportJobRunner:
+    """
+    Imports CSV en arrière-plan, sans broker : le fichier est stocké dans
+    IMPORT_JOB_DIR et le job exécuté par un pool de threads du processus
+    (IMPORT_JOB_WORKERS). Le CSV est lu en flux, par lots de
+    IMPORT_JOB_BATCH_SIZE lignes ; chaque lot (écritures + compteurs +
+    position dans le fichier) est validé dans une seule transaction.
+    Annuler s'arrête au lot suivant, redémarrer reprend au dernier lot
+    validé : aucune ligne n'est importée deux fois.
+
+    Lignes avec id : mise à jour du produit (cellules vides = champ
+    inchangé, id inconnu = ligne rejetée). Sans id : création. Les lignes
+    rejetées sont recopiées, avec leur numéro d'enregistrement et l'erreur,
+    dans un fichier CSV d'erreurs.
+    """
+
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    # --- Fichiers ---
+
+    @staticmethod
+    def job_dir():
+        directory = getattr(settings, 'IMPORT_JOB_DIR', None)
+        return Path(directory or settings.BASE_DIR / 'cache' / 'imports')
+
+    @staticmethod
+    def source_path(job):
+        return ImportJobRunner.job_dir() / f'{job.pk}.csv'
+
+    @staticmethod
+    def error_path(job):
+        return ImportJobRunner.job_dir() / f'{job.pk}.errors.csv'
+
+    @staticmethod
+    def create_job(chunks, source_name='', user=None):
+        """
+        Écrire le fichier reçu (itérable de blocs d'octets) sur disque puis créer le job
+
+        Raises:
+            ValueError: Fichier trop volumineux, vide ou en-tête CSV invalide
+        """
+        directory = ImportJobRunner.job_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        max_bytes = getattr(settings, 'IMPORT_JOB_MAX_UPLOAD_BYTES', 512 * 1024 * 1024)
+        tmp_path = directory / f'.upload-{os.getpid()}-{threading.get_ident()}.tmp'
+        total = 0
+        try:
+            with open(tmp_path, 'wb') as file:
+                for chunk in chunks:
+                    total += len(chunk)
+                    if total > max_bytes:
+                        raise ValueError(f'File too large (maximum {max_bytes} bytes)')
+                    file.write(chunk)
+            with open(tmp_path, 'rb') as file:
+                ImportJobRunner.read_header(file)
+
+            job = ImportJob.objects.create(source_name=source_name[:255], created_by=user, total_bytes=total)
+            os.replace(tmp_path, ImportJobRunner.source_path(job))
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        transaction.on_commit(lambda: ImportJobRunner.submit(job.pk))
+        return job
+
+    @staticmethod
+    def read_header(file):
+        """
+        Lire la ligne d'en-tête (fichier binaire positionné au début)
+
+        Returns:
+            tuple: (colonnes, taille en octets de l'en-tête)
+
+        Raises:
+            ValueError: Si l'en-tête est vide, illisible ou sans les colonnes requises
+        """
+        line = file.readline()
+        try:
+            text = line.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise ValueError('CSV file must be UTF-8 encoded')
+        columns = [column.strip().lower() for column in next(csv.reader([text]), [])]
+        if 'id' not in columns and not {'name', 'price'}.issubset(columns):
+            raise ValueError('CSV header must contain an id column or both name and price columns')
+        return columns, len(line)
+
+    @staticmethod
+    def iter_records(file, columns):
+        """
+        Lire les enregistrements CSV à partir de la position courante du fichier
+
+        Yields:
+            tuple: (dict colonne -> valeur, position en octets après l'enregistrement)
+        """
+        position = file.tell()
+
+        def lines():
+            # csv.reader ne lit pas en avance : la position suit l'enregistrement rendu
+            nonlocal position
+            for line in file:
+                position += len(line)
+                yield line.decode('utf-8', errors='replace')
+
+        for values in csv.reader(lines()):
+            if not any(value.strip() for value in values):
+                continue
+            yield dict(zip(columns, values)), position
+
+    # --- Exécution ---
+
+    @staticmethod
+    def submit(job_id):
+        """Confier le job au pool de threads du processus"""
+        with ImportJobRunner._executor_lock:
+            if ImportJobRunner._executor is None:
+                ImportJobRunner._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMPORT_JOB_WORKERS', 2), thread_name_prefix='import-job'
+                )
+            executor = ImportJobRunner._executor
+        executor.submit(ImportJobRunner._run_in_thread, job_id)
+
+    @staticmethod
+    def _run_in_thread(job_id):
+        try:
+            ImportJobRunner.run(job_id)
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def claim(job_id):
+        """Passer un job 'queued' à 'running' ; None s'il a déjà été pris ou annulé"""
+        now = timezone.now()
+        job = ImportJob.objects.filter(pk=job_id, status='queued').first()
+        if job is None:
+            return None
+        claimed = ImportJob.objects.filter(pk=job_id, status='queued', attempt=job.attempt).update(
+            status='running', attempt=F('attempt') + 1, run_started_at=now, heartbeat_at=now,
+            run_start_rows=F('rows_processed'), run_start_offset=F('byte_offset'), error=''
+        )
+        if not claimed:
+            return None
+        job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def run(job_id):
+        """
+        Exécuter (ou reprendre) un job jusqu'à la fin du fichier ou une annulation
+
+        Returns:
+            str: Statut final ('succeeded', 'failed', 'cancelled'), None si le job n'était pas à prendre
+        """
+        # Les threads du pool n'héritent pas du contexte de la requête : sans use_primary(), le job
+        # tout juste créé serait cherché sur un réplica en retard et resterait 'queued'
+        with use_primary():
+            return ImportJobRunner._run(job_id)
+
+    @staticmethod
+    def _run(job_id):
+        job = ImportJobRunner.claim(job_id)
+        if job is None:
+            return None
+        batch_size = getattr(settings, 'IMPORT_JOB_BATCH_SIZE', 1000)
+        pause = getattr(settings, 'IMPORT_JOB_BATCH_PAUSE', 0.05)
+
+        try:
+            with open(ImportJobRunner.source_path(job), 'rb') as source, \
+                    open(ImportJobRunner.error_path(job), 'ab') as errors:
+                # Reprise : oublier les erreurs écrites par un lot non validé
+                errors.truncate(job.error_bytes)
+                errors.seek(job.error_bytes)
+                columns, header_size = ImportJobRunner.read_header(source)
+                if job.error_bytes == 0:
+                    ImportJobRunner._write_errors(errors, [['row', 'error', *columns]])
+                source.seek(max(job.byte_offset, header_size))
+                row_number = job.rows_processed + 1
+
+                batch = []
+                for record, position in ImportJobRunner.iter_records(source, columns):
+                    batch.append((row_number, record))
+                    row_number += 1
+                    if len(batch) == batch_size:
+                        if not ImportJobRunner._commit_batch(job, batch, position, columns, errors):
+                            return ImportJobRunner._finish(job, 'cancelled')
+                        batch = []
+                        # SQLite n'a qu'un écrivain : laisser aux requêtes le temps de prendre le verrou
+                        time.sleep(pause)
+                if batch and not ImportJobRunner._commit_batch(job, batch, job.total_bytes, columns, errors):
+                    return ImportJobRunner._finish(job, 'cancelled')
+        except ImportJobLost:
+            return None
+        except Exception as e:
+            return ImportJobRunner._finish(job, 'failed', error=str(e))
+        return ImportJobRunner._finish(job, 'succeeded', byte_offset=job.total_bytes)
+
+    @staticmethod
+    def _commit_batch(job, batch, position, columns, errors):
+        """
+        Appliquer un lot et enregistrer la nouvelle position dans la même transaction
+
+        Returns:
+            bool: False si une annulation a été demandée (lot non appliqué)
+        """
+        if ImportJob.objects.filter(pk=job.pk, cancel_requested=True).exists():
+            return False
+
+        creates, create_lines, updates, update_lines, rejected = [], [], [], [], []
+        for row_number, record in batch:
+            raw_id = (record.get('id') or '').strip()
+            if not raw_id:
+                creates.append({field: record[field] for field in ('name', 'price', 'description') if field in record})
+                create_lines.append((row_number, record))
+                continue
+            try:
+                entry = {'id': int(raw_id)}
+            except ValueError:
+                rejected.append((row_number, record, f'Invalid id: {raw_id}'))
+                continue
+            # Cellule vide ou colonne absente : champ laissé tel quel
+            entry.update({field: record[field] for field in ('name', 'price', 'description') if record.get(field)})
+            updates.append(entry)
+            update_lines.append((row_number, record))
+
+        with transaction.atomic():
+            created = updated = 0
+            if creates:
+                summary = ProductBulkIngest.ingest(creates)
+                created = summary['created']
+                rejected += [(*create_lines[error['row'] - 1], error['error']) for error in summary['errors']]
+            if updates:
+                summary = ProductBulkUpdate.apply_entries(updates)
+                updated = summary['updated']
+                rejected += [(*update_lines[error['row'] - 1], error['error']) for error in summary['errors']]
+                missing = set(summary['missing_ids'])
+                rejected += [
+                    (*update_lines[index], 'Product not found')
+                    for index, entry in enumerate(updates) if entry['id'] in missing
+                ]
+
+            if rejected:
+                rejected.sort(key=lambda item: item[0])
+                ImportJobRunner._write_errors(errors, [
+                    [row_number, error, *(record.get(column, '') for column in columns)]
+                    for row_number, record, error in rejected
+                ])
+
+            # Le filtre sur attempt évince un worker dont le job a été redémarré entre-temps
+            if not ImportJob.objects.filter(pk=job.pk, attempt=job.attempt, status='running').update(
+                byte_offset=position,
+                error_bytes=errors.tell(),
+                rows_processed=F('rows_processed') + len(batch),
+                rows_created=F('rows_created') + created,
+                rows_updated=F('rows_updated') + updated,
+                rows_rejected=F('rows_rejected') + len(rejected),
+                heartbeat_at=timezone.now(),
+            ):
+                raise ImportJobLost(job.pk)
+        return True
+
+    @staticmethod
+    def iter_errors(job, chunk_size=64 * 1024):
+        """Contenu du fichier d'erreurs jusqu'au dernier lot validé (un lot en cours peut avoir écrit au-delà)"""
+        remaining = job.error_bytes
+        with open(ImportJobRunner.error_path(job), 'rb') as file:
+            while remaining > 0:
+                chunk = file.read(min(chunk_size, remaining))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+    @staticmethod
+    def _write_errors(errors, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        errors.write(buffer.getvalue().encode())
+        errors.flush()
+
+    @staticmethod
+    def _finish(job, status, error='', **fields):
+        ImportJob.objects.filter(pk=job.pk, attempt=job.attempt, status='running').update(
+            status=status, error=error, finished_at=timezone.now(), heartbeat_at=timezone.now(), **fields
+        )
+        return status
+
+    # --- Pilotage ---
+
+    @staticmethod
+    def cancel(job):
+        """
+        Demander l'arrêt : un job en attente (ou dont le worker a disparu) est
+        annulé aussitôt, un job en cours s'arrête avant son prochain lot (les
+        lots déjà validés restent appliqués)
+
+        Returns:
+            bool: False si le job est déjà terminé
+        """
+        if ImportJob.objects.filter(ImportJobRunner._idle(), pk=job.pk).update(
+            status='cancelled', cancel_requested=True, finished_at=timezone.now()
+        ):
+            return True
+        return bool(ImportJob.objects.filter(pk=job.pk, status='running').update(cancel_requested=True))
+
+    @staticmethod
+    def restart(job):
+        """
+        Remettre en file un job échoué, annulé, ou en cours sans signe de vie
+        depuis IMPORT_JOB_STALE_SECONDS (worker arrêté) ; il reprend au dernier lot validé
+
+        Returns:
+            bool: False si le job ne peut pas être redémarré
+        """
+        restartable = Q(status__in=('failed', 'cancelled')) | (ImportJobRunner._idle() & ~Q(status='queued'))
+        if not ImportJob.objects.filter(restartable, pk=job.pk).update(
+            status='queued', cancel_requested=False, finished_at=None, error=''
+        ):
+            return False
+        transaction.on_commit(lambda: ImportJobRunner.submit(job.pk))
+        return True
+
+    @staticmethod
+    def _idle():
+        """Jobs sans worker actif : en attente, ou 'running' sans signe de vie depuis IMPORT_JOB_STALE_SECONDS"""
+        stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_JOB_STALE_SECONDS', 60))
+        return Q(status='queued') | Q(status='running', heartbeat_at__lt=stale_before)
+
+    @staticmethod
+    def as_dict(job):
+        """Statut du job, avec débit et temps restant estimés sur l'exécution en cours"""
+        elapsed = None
+        rows_per_second = None
+        eta_seconds = None
+        if job.run_started_at is not None:
+            end = job.finished_at if job.status in FINISHED_STATUSES and job.finished_at else timezone.now()
+            elapsed = max((end - job.run_started_at).total_seconds(), 0.0)
+        if elapsed:
+            rows_per_second = round((job.rows_processed - job.run_start_rows) / elapsed, 1)
+            bytes_per_second = (job.byte_offset - job.run_start_offset) / elapsed
+            if job.status == 'running' and bytes_per_second > 0:
+                eta_seconds = round((job.total_bytes - job.byte_offset) / bytes_per_second, 1)
+
+        return {
+            'id': job.pk,
+            'status': job.status,
+            'source_name': job.source_name,
+            'rows_processed': job.rows_processed,
+            'rows_created': job.rows_created,
+            'rows_updated': job.rows_updated,
+            'rows_rejected': job.rows_rejected,
+            'bytes_processed': job.byte_offset,
+            'total_bytes': job.total_bytes,
+            'percent': round(100 * job.byte_offset / job.total_bytes, 1) if job.total_bytes else 100.0,
+            'rows_per_second': rows_per_second,
+            'eta_seconds': eta_seconds,
+            'cancel_requested': job.cancel_requested,
+            'error': job.error or None,
+            'created_at': job.created_at,
+            'run_started_at': job.run_started_at,
+            'finished_at': job.finished_at,
+        }
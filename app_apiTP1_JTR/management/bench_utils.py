@@ -0,0 +1,349 @@
+import http.client
+import json
+import importlib.util
+import os
+import random
+import resource
+import secrets
+import socket
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+
+from app_apiTP1_JTR.aggregates import CatalogAggregates
+from app_apiTP1_JTR.models import Product
+
+WORDS = [
+    'wireless', 'premium', 'compact', 'gaming', 'laptop', 'phone', 'tablet', 'camera', 'speaker',
+    'headphones', 'monitor', 'keyboard', 'mouse', 'charger', 'smartwatch', 'console', 'drone',
+    'router', 'printer', 'vacuum', 'coffee', 'blender', 'lamp', 'backpack', 'bicycle', 'organic',
+    'steel', 'leather', 'carbon', 'solar', 'portable', 'pro', 'ultra', 'mini', 'max', 'lite',
+]
+
+
+def current_rss_mb():
+    """RSS courant du processus en Mo (pic RSS si /proc n'est pas disponible)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# Date de création du produit synthétique 0 ; les suivants sont espacés de SYNTHETIC_SPACING
+SYNTHETIC_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+SYNTHETIC_SPACING = timedelta(seconds=30)
+SYNTHETIC_SUFFIX = 'synthetic product for benchmarks'
+
+
+def synthetic_values(index):
+    """(name, price, description) déterministes : le même index donne toujours le même produit"""
+    count = len(WORDS)
+    first, second, third = WORDS[index * 7 % count], WORDS[index * 11 % count], WORDS[index * 13 % count]
+    return (
+        f"{first.title()} {second} {index}",
+        f"{(index * 7919) % 500_000 / 100 + 1:.2f}",
+        f"{first} {second} {third} {SYNTHETIC_SUFFIX}",
+    )
+
+
+def count_synthetic_products():
+    """
+    Nombre de produits synthétiques déjà insérés, c'est-à-dire l'index du prochain : les autres
+    produits (démonstration, API) ne décalent pas la numérotation
+    """
+    return Product.objects.filter(description__endswith=SYNTHETIC_SUFFIX).count()
+
+
+def insert_synthetic_products(start, stop, batch_size=50_000, on_batch=None):
+    """
+    Insérer les produits synthétiques d'index [start, stop) par lots, un lot par transaction
+
+    bulk_create prépare chaque champ de chaque ligne en Python (~20k lignes/s) : les lignes sont
+    ici déjà au format de la base et passées à un INSERT préparé via executemany. On passe par le
+    curseur DB-API sous-jacent pour que DEBUG ne conserve pas chaque lot dans connection.queries.
+
+    Args:
+        on_batch: Fonction (lignes insérées jusqu'ici) appelée après chaque lot
+    """
+    table = Product._meta.db_table
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in ('name', 'price', 'description', 'created_at', 'updated_at'))
+    sql = f'INSERT INTO {quote(table)} ({columns}) VALUES (%s, %s, %s, %s, %s)'
+
+    # SQLite et MySQL stockent les dates en texte UTC naïf : le formater directement évite
+    # adapt_datetimefield_value (conversion de fuseau à chaque ligne), le poste le plus coûteux
+    adapt = connection.ops.adapt_datetimefield_value
+    naive_epoch = SYNTHETIC_EPOCH.replace(tzinfo=None)
+    if adapt(SYNTHETIC_EPOCH) == str(naive_epoch):
+        epoch, adapt = naive_epoch, str
+    else:
+        epoch = SYNTHETIC_EPOCH
+
+    def rows(first, last):
+        for index in range(first, last):
+            timestamp = adapt(epoch + index * SYNTHETIC_SPACING)
+            yield (*synthetic_values(index), timestamp, timestamp)
+
+    for offset in range(start, stop, batch_size):
+        end = min(offset + batch_size, stop)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.cursor.executemany(sql, rows(offset, end))
+        if on_batch:
+            on_batch(end - start)
+    return stop - start
+
+
+def seed_products(rows, stdout=None, batch_size=50_000):
+    """Compléter la table avec des produits synthétiques jusqu'à `rows` lignes"""
+    existing = Product.objects.count()
+    missing = rows - existing
+    if missing <= 0:
+        return 0
+    if stdout:
+        stdout.write(f"Insertion de {missing} produits synthétiques...")
+    start = time.perf_counter()
+    insert_synthetic_products(existing, rows, batch_size=batch_size)
+    CatalogAggregates.rebuild()
+    if stdout:
+        elapsed = time.perf_counter() - start
+        stdout.write(f"  {missing} produits en {elapsed:.1f}s ({missing / elapsed:,.0f} lignes/s)")
+    return missing
+
+
+# --- Serveurs locaux et clients HTTP concurrents pour les benchmarks de charge ---
+
+WSGI_BOOTSTRAP = """
+import sys
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+from api_TP1_JTR.wsgi import application
+make_server('127.0.0.1', int(sys.argv[1]), application,
+            server_class=ThreadingWSGIServer, handler_class=QuietHandler).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(kind, port=None, timeout=30, env=None):
+    """
+    Lancer l'application dans un sous-processus et attendre qu'elle écoute
+
+    Args:
+        kind: 'wsgi' (api_TP1_JTR/wsgi.py derrière un serveur wsgiref multi-thread)
+              ou 'asgi' (api_TP1_JTR/asgi.py derrière uvicorn, s'il est installé)
+        env: Variables d'environnement à ajouter pour le serveur (ex. SQLITE_TUNING) ;
+             les limites de requêtes par clé sont désactivées par défaut
+
+    Returns:
+        tuple: (subprocess.Popen, URL de base)
+    """
+    port = port or free_port()
+    if kind == 'wsgi':
+        command = [sys.executable, '-c', WSGI_BOOTSTRAP, str(port)]
+    elif kind == 'asgi':
+        if importlib.util.find_spec('uvicorn') is None:
+            raise CommandError("uvicorn n'est pas installé (pip install uvicorn)")
+        command = [sys.executable, '-m', 'uvicorn', 'api_TP1_JTR.asgi:application',
+                   '--port', str(port), '--log-level', 'warning', '--no-access-log']
+    else:
+        raise CommandError(f'Serveur inconnu : {kind}')
+
+    env = {**os.environ, 'API_RATE_LIMITS': 'off', **(env or {})}
+    process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f'Le serveur {kind} s\'est arrêté au démarrage')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return process, f'http://127.0.0.1:{port}'
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise CommandError(f'Le serveur {kind} ne répond pas après {timeout}s')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def ensure_bench_api_key(role_name='Admin'):
+    """Clé API d'un utilisateur 'bench' (créé au besoin avec le rôle demandé)"""
+    from django.contrib.auth.models import User
+    from app_apiTP1_JTR.init_permissions import init_permissions
+    from app_apiTP1_JTR.models import Role, UserProfile
+
+    if not Role.objects.filter(name=role_name).exists():
+        init_permissions()
+    user, _ = User.objects.get_or_create(username=f'bench_{role_name.lower()}')
+    profile, _ = UserProfile.objects.get_or_create(user=user, defaults={
+        'role': Role.objects.get(name=role_name),
+        'api_key': secrets.token_urlsafe(32),
+    })
+    return profile.api_key
+
+
+def http_request(base_url, method, path, headers, body=None, timeout=30):
+    """Une requête HTTP sur une connexion neuve ; retourne (statut, octets reçus, secondes)"""
+    parsed = urlsplit(base_url)
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=timeout)
+    try:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        size = len(response.read())
+        return response.status, size, time.perf_counter() - start
+    finally:
+        connection.close()
+
+
+def run_load(base_url, pick_request, concurrency, duration):
+    """
+    Faire tourner `concurrency` clients pendant `duration` secondes
+
+    Args:
+        pick_request: Fonction (rng) -> (label, method, path, headers, body) choisissant la prochaine requête
+
+    Returns:
+        dict: label -> {'latencies': [...], 'statuses': {code: n}, 'errors': n}
+    """
+    results = {}
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(seed):
+        rng = random.Random(seed)
+        local = {}
+        while time.monotonic() < deadline:
+            label, method, path, headers, body = pick_request(rng)
+            entry = local.setdefault(label, {'latencies': [], 'statuses': {}, 'errors': 0})
+            try:
+                status, _, elapsed = http_request(base_url, method, path, headers, body)
+                entry['latencies'].append(elapsed)
+                entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+            except OSError:
+                entry['errors'] += 1
+        with lock:
+            for label, entry in local.items():
+                merged = results.setdefault(label, {'latencies': [], 'statuses': {}, 'errors': 0})
+                merged['latencies'] += entry['latencies']
+                merged['errors'] += entry['errors']
+                for status, count in entry['statuses'].items():
+                    merged['statuses'][status] = merged['statuses'].get(status, 0) + count
+
+    threads = [threading.Thread(target=client, args=(seed,)) for seed in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def summarize_latencies(latencies, duration):
+    """req/s et percentiles (ms) d'une série de latences"""
+    if not latencies:
+        return {'requests': 0, 'rps': 0.0, 'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    ordered = sorted(latencies)
+
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 2)
+
+    return {
+        'requests': len(ordered),
+        'rps': round(len(ordered) / duration, 1),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+    }
+
+
+# --- Mélange de requêtes des tests de charge ---
+
+PREFIX = '/app_apiTP1_JTR'
+
+# Poids par défaut : trafic essentiellement en lecture, avec quelques écritures
+DEFAULT_MIX = 'list=40,list_filtered=15,maxprice=10,price_stats=5,search=10,create=8,update=12'
+
+
+def build_load_requests(headers, max_id=None):
+    """label -> fonction (rng) -> (method, path, headers, body)"""
+    json_headers = {**headers, 'Content-Type': 'application/json'}
+    if max_id is None:
+        max_id = Product.objects.order_by('-id').values_list('id', flat=True).first() or 1
+
+    def product_body(rng):
+        word = rng.choice(WORDS)
+        return json.dumps({
+            'name': f'Load {word} {rng.randint(1, 10**9)}',
+            'price': f'{rng.randint(100, 500_000) / 100:.2f}',
+            'description': f'{word} load-test product',
+        })
+
+    return {
+        'list': lambda rng: ('GET', f'{PREFIX}/get_allproducts/?page_size=50', headers, None),
+        # Bornes variables : chaque requête manque le cache de réponses
+        'list_filtered': lambda rng: (
+            'GET', f'{PREFIX}/get_allproducts/?page_size=50&price_min={rng.randint(1, 4000)}', headers, None
+        ),
+        'maxprice': lambda rng: ('GET', f'{PREFIX}/get_maxprice/', headers, None),
+        'price_stats': lambda rng: ('GET', f'{PREFIX}/get_price_stats/', headers, None),
+        'search': lambda rng: ('GET', f'{PREFIX}/search_products/?q={rng.choice(WORDS)}&page_size=20', headers, None),
+        'create': lambda rng: ('POST', f'{PREFIX}/post_product/', json_headers, product_body(rng)),
+        'update': lambda rng: (
+            'PUT', f'{PREFIX}/update_product/{rng.randint(1, max_id)}/', json_headers,
+            json.dumps({'price': f'{rng.randint(100, 500_000) / 100:.2f}'}),
+        ),
+    }
+
+
+def parse_mix(value, available):
+    """'list=40,create=5' -> [(label, poids)]"""
+    mix = []
+    for part in value.split(','):
+        label, _, weight = part.partition('=')
+        label = label.strip()
+        if label not in available:
+            raise CommandError(f"Requête inconnue dans --mix : {label} (disponibles : {', '.join(available)})")
+        try:
+            mix.append((label, float(weight or 1)))
+        except ValueError:
+            raise CommandError(f'Poids invalide pour {label} : {weight}')
+    return mix
+
+
+def weighted_picker(requests, mix):
+    """Fonction pick_request pour run_load, tirant les requêtes selon les poids de `mix`"""
+    weights = parse_mix(mix, requests)
+    labels = [label for label, _ in weights]
+    values = [weight for _, weight in weights]
+
+    def pick_request(rng):
+        label = rng.choices(labels, values)[0]
+        return (label, *requests[label](rng))
+
+    return pick_request
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from app_apiTP1_JTR.management.bench_utils import (
+    ensure_bench_api_key, run_load, seed_products, start_server, stop_server, summarize_latencies,
+)
+
+SYNC_PATHS = ['/app_apiTP1_JTR/get_allproducts/?page_size=50', '/app_apiTP1_JTR/get_maxprice/']
+ASYNC_PATHS = ['/app_apiTP1_JTR/async/get_allproducts/?page_size=50', '/app_apiTP1_JTR/async/get_maxprice/']
+
+
+class Command(BaseCommand):
+    help = ("Comparer le débit de lecture sous WSGI (vues synchrones) et sous ASGI/uvicorn "
+            "(vues synchrones puis asynchrones) avec des clients concurrents")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=10.0, help='Secondes par scénario')
+        parser.add_argument('--scenario', action='append', choices=['wsgi', 'asgi-sync', 'asgi-async'],
+                            help='Scénario à mesurer (répétable, tous par défaut)')
+
+    def handle(self, *args, **options):
+        seed_products(options['rows'], stdout=self.stdout)
+        headers = {'X-API-Key': ensure_bench_api_key()}
+        scenarios = {
+            'wsgi': ('wsgi', SYNC_PATHS),
+            'asgi-sync': ('asgi', SYNC_PATHS),
+            'asgi-async': ('asgi', ASYNC_PATHS),
+        }
+
+        for name in options['scenario'] or list(scenarios):
+            kind, paths = scenarios[name]
+            process, base_url = start_server(kind)
+            try:
+                # Les requêtes varient le curseur : sans cela le cache de réponses servirait tout
+                def pick_request(rng):
+                    path = rng.choice(paths)
+                    if 'get_allproducts' in path:
+                        path += f'&price_min={rng.randint(1, 4000)}'
+                    return name, 'GET', path, headers, None
+
+                results = run_load(base_url, pick_request, options['concurrency'], options['duration'])
+            finally:
+                stop_server(process)
+
+            entry = results.get(name, {'latencies': [], 'statuses': {}, 'errors': 0})
+            summary = summarize_latencies(entry['latencies'], options['duration'])
+            self.stdout.write(
+                f"{name:<11} {summary['rps']:>8} req/s  p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+                f"p99 {summary['p99_ms']} ms  statuts {entry['statuses']}  erreurs {entry['errors']}"
+            )
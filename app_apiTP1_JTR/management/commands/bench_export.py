@@ -0,0 +1,62 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app_apiTP1_JTR.management.bench_utils import current_rss_mb, seed_products
+from app_apiTP1_JTR.models import Product
+from app_apiTP1_JTR.streaming_utils import StreamingExportHelper
+
+EXPORT_FIELDS = ('id', 'name', 'price', 'description', 'created_at', 'updated_at')
+
+
+class Command(BaseCommand):
+    help = "Mesurer la mémoire de l'export streaming du catalogue (RSS échantillonné pendant l'export)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Nombre de produits à avoir en base avant la mesure')
+        parser.add_argument('--format', default='ndjson', choices=['ndjson', 'json'])
+        parser.add_argument('--sample-every', type=int, default=100_000,
+                            help="Échantillonner le RSS toutes les N lignes")
+        parser.add_argument('--compare-list', action='store_true',
+                            help="Mesurer aussi l'ancien chemin list() + JsonResponse")
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        seed_products(rows, stdout=self.stdout)
+
+        self.stdout.write(f"RSS initial: {current_rss_mb():.1f} Mo")
+        response = StreamingExportHelper.create_streaming_response(
+            Product.objects.order_by('id'), EXPORT_FIELDS, export_format=options['format']
+        )
+
+        start = time.perf_counter()
+        exported = 0
+        total_bytes = 0
+        samples = []
+        for chunk in response.streaming_content:
+            total_bytes += len(chunk)
+            # Un morceau par ligne exportée (plus l'ouverture et la fermeture en JSON)
+            exported += 1
+            if exported % options['sample_every'] == 0:
+                samples.append(current_rss_mb())
+                self.stdout.write(f"  {exported:>10} lignes  RSS {samples[-1]:.1f} Mo")
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Streaming: {total_bytes / 1024 / 1024:.1f} Mo en {elapsed:.2f}s, "
+            f"RSS min/max pendant l'export: {min(samples, default=0):.1f}/{max(samples, default=0):.1f} Mo"
+        ))
+
+        if options['compare_list']:
+            before = current_rss_mb()
+            start = time.perf_counter()
+            products = list(Product.objects.values(*EXPORT_FIELDS))
+            payload = json.dumps({'products': products}, cls=DjangoJSONEncoder)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"list() + JsonResponse: {len(payload) / 1024 / 1024:.1f} Mo en {elapsed:.2f}s, "
+                f"RSS {before:.1f} -> {current_rss_mb():.1f} Mo"
+            )
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_apiTP1_JTR.bulk_utils import ProductBulkIngest
+from app_apiTP1_JTR.models import Product
+
+
+class Command(BaseCommand):
+    help = "Comparer le débit (lignes/s) de l'import massif et de l'insertion ligne par ligne de post_product"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--skip-legacy', action='store_true',
+                            help="Ne pas mesurer l'ancien chemin (lent sur beaucoup de lignes)")
+
+    def handle(self, *args, **options):
+        rows = [
+            {'name': f'Ingest bench {i}', 'price': f'{i % 100_000 / 100 + 1:.2f}',
+             'description': 'Synthetic product for the ingest benchmark'}
+            for i in range(options['rows'])
+        ]
+        first_id = (Product.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+
+        try:
+            if not options['skip_legacy']:
+                start = time.perf_counter()
+                # Même travail que post_product : un create (et un commit) par produit
+                for row in rows:
+                    Product.objects.create(name=row['name'], price=row['price'], description=row['description'])
+                self.report('post_product (create par ligne)', len(rows), time.perf_counter() - start)
+                Product.objects.filter(id__gte=first_id).delete()
+
+            start = time.perf_counter()
+            summary = ProductBulkIngest.ingest(rows, batch_size=options['batch_size'])
+            self.report('bulk_products (bulk_create)', summary['created'], time.perf_counter() - start)
+        finally:
+            Product.objects.filter(id__gte=first_id).delete()
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:<35} {count:>8} lignes en {elapsed:7.2f}s  ->  {count / elapsed:>10,.0f} lignes/s")
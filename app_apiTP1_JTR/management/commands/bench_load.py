@@ -0,0 +1,122 @@
+import json
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app_apiTP1_JTR.management.bench_utils import (
+    DEFAULT_MIX, build_load_requests, ensure_bench_api_key, run_load, seed_products, start_server, stop_server,
+    summarize_latencies, weighted_picker,
+)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ("Test de charge : sert api_TP1_JTR/wsgi.py en local, envoie un mélange pondéré de lectures et "
+            "d'écritures depuis des clients concurrents, puis enregistre req/s et p50/p95/p99 en JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000, help='Taille minimale du catalogue')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=30.0, help='Secondes de charge')
+        parser.add_argument('--warmup', type=float, default=2.0, help='Secondes de chauffe non mesurées')
+        parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Poids par requête (défaut : {DEFAULT_MIX})')
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--output', help='Fichier JSON de résultats (défaut : cache/benchmarks/load-<date>.json, hors dépôt)')
+        parser.add_argument('--baseline', help='Résultats précédents à comparer')
+        parser.add_argument('--tolerance', type=float, default=0.15,
+                            help='Dégradation relative tolérée avant de signaler une régression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        seed_products(options['rows'], stdout=self.stdout)
+        headers = {'X-API-Key': ensure_bench_api_key()}
+        pick_request = weighted_picker(build_load_requests(headers), options['mix'])
+
+        process, base_url = start_server(options['server'])
+        try:
+            if options['warmup'] > 0:
+                run_load(base_url, pick_request, options['concurrency'], options['warmup'])
+            started = time.perf_counter()
+            results = run_load(base_url, pick_request, options['concurrency'], options['duration'])
+            elapsed = time.perf_counter() - started
+        finally:
+            stop_server(process)
+
+        report = self.build_report(results, elapsed, options)
+        self.print_report(report)
+
+        output = Path(options['output'] or Path(settings.BASE_DIR) / 'cache' / 'benchmarks'
+                      / f"load-{datetime.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+        self.stdout.write(f'Résultats enregistrés dans {output}')
+
+        if options['baseline']:
+            regressions = self.compare(report, json.loads(Path(options['baseline']).read_text()),
+                                       options['tolerance'])
+            for message in regressions:
+                self.stdout.write(self.style.WARNING(f'Régression : {message}'))
+            if not regressions:
+                self.stdout.write(self.style.SUCCESS('Aucune régression par rapport à la référence'))
+            elif options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} régression(s) détectée(s)')
+
+    def build_report(self, results, elapsed, options):
+        endpoints = {}
+        all_latencies = []
+        for label, entry in sorted(results.items()):
+            endpoints[label] = {
+                **summarize_latencies(entry['latencies'], elapsed),
+                'statuses': {str(status): count for status, count in sorted(entry['statuses'].items())},
+                'errors': entry['errors'],
+            }
+            all_latencies += entry['latencies']
+        return {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+            },
+            'parameters': {key: options[key] for key in ('rows', 'concurrency', 'duration', 'mix', 'server')},
+            'total': {**summarize_latencies(all_latencies, elapsed),
+                      'errors': sum(entry['errors'] for entry in endpoints.values())},
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(f"{'requête':<14}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}  statuts")
+        for label, entry in [*report['endpoints'].items(), ('TOTAL', report['total'])]:
+            self.stdout.write(
+                f"{label:<14}{entry['rps']:>9}{entry['p50_ms']!s:>9}{entry['p95_ms']!s:>9}{entry['p99_ms']!s:>9}"
+                f"  {entry.get('statuses', '')} erreurs={entry['errors']}"
+            )
+
+    @staticmethod
+    def compare(report, baseline, tolerance):
+        """Signaler les requêtes dont le débit baisse ou dont le p95/p99 augmente au-delà de la tolérance"""
+        regressions = []
+        for label, current in [*report['endpoints'].items(), ('TOTAL', report['total'])]:
+            previous = baseline['total'] if label == 'TOTAL' else baseline.get('endpoints', {}).get(label)
+            if not previous or not previous.get('requests'):
+                continue
+            if current['rps'] < previous['rps'] * (1 - tolerance):
+                regressions.append(f"{label} : {current['rps']} req/s (référence {previous['rps']})")
+            for key in ('p95_ms', 'p99_ms'):
+                if current[key] is not None and previous[key] and current[key] > previous[key] * (1 + tolerance):
+                    regressions.append(f'{label} : {key} {current[key]} (référence {previous[key]})')
+        return regressions
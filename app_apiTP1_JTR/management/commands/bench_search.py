@@ -0,0 +1,51 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from app_apiTP1_JTR.management.bench_utils import seed_products
+from app_apiTP1_JTR.models import Product
+from app_apiTP1_JTR.search_utils import ProductSearch
+
+DEFAULT_QUERIES = ['wireless', 'gaming laptop', 'headph', 'solar drone', 'leather backpack']
+
+
+class Command(BaseCommand):
+    help = "Comparer la recherche FTS5 à un scan icontains sur name/description"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Nombre de produits à avoir en base avant la mesure')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--query', action='append', dest='queries',
+                            help='Requête à mesurer (répétable)')
+
+    def handle(self, *args, **options):
+        seed_products(options['rows'], stdout=self.stdout)
+        page_size = options['page_size']
+
+        for query in options['queries'] or DEFAULT_QUERIES:
+            fts = self.measure(options['repeat'], lambda: ProductSearch.search(query, page_size=page_size))
+
+            def icontains():
+                queryset = Product.objects.all()
+                for term in query.split():
+                    queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+                return list(queryset.order_by('id')[:page_size])
+
+            scan = self.measure(options['repeat'], icontains)
+            self.stdout.write(
+                f"{query!r:<22} FTS5 {fts * 1000:8.2f} ms   icontains {scan * 1000:8.2f} ms   "
+                f"x{scan / fts if fts else float('inf'):.1f}"
+            )
+
+    def measure(self, repeat, func):
+        """Médiane de `repeat` exécutions, en secondes"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -0,0 +1,58 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from app_apiTP1_JTR.management.bench_utils import seed_products
+from app_apiTP1_JTR.models import Product
+from app_apiTP1_JTR.serializers import PRODUCT_FIELDS, dumps, orjson, product_serializer
+
+
+class Command(BaseCommand):
+    help = "Comparer l'ancienne sérialisation (values() + DjangoJSONEncoder) au RowSerializer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100_000,
+                            help='Nombre de produits sérialisés par itération')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        seed_products(rows, stdout=self.stdout)
+        queryset = Product.objects.order_by('id')[:rows]
+        self.stdout.write(f"Encodeur JSON : {'orjson' if orjson is not None else 'json (stdlib)'}")
+
+        def legacy():
+            products = list(queryset.values(*PRODUCT_FIELDS))
+            return json.dumps({'products': products}, cls=DjangoJSONEncoder).encode()
+
+        serializer = product_serializer()
+
+        def compiled():
+            return dumps({'products': serializer.rows(serializer.values_list(queryset))})
+
+        # Séparer le coût de la requête de celui de l'encodage
+        cached_dicts = list(queryset.values(*PRODUCT_FIELDS))
+        cached_tuples = list(serializer.values_list(queryset))
+
+        results = [
+            ('values() + DjangoJSONEncoder (requête incluse)', self.measure(options['repeat'], legacy)),
+            ('RowSerializer + dumps (requête incluse)', self.measure(options['repeat'], compiled)),
+            ('DjangoJSONEncoder (encodage seul)', self.measure(
+                options['repeat'], lambda: json.dumps({'products': cached_dicts}, cls=DjangoJSONEncoder))),
+            ('RowSerializer + dumps (encodage seul)', self.measure(
+                options['repeat'], lambda: dumps({'products': serializer.rows(cached_tuples)}))),
+        ]
+        for label, seconds in results:
+            self.stdout.write(f"{label:<48} {seconds * 1000:9.1f} ms  ({rows / seconds:>12,.0f} lignes/s)")
+
+    def measure(self, repeat, func):
+        """Médiane de `repeat` exécutions, en secondes"""
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app_apiTP1_JTR.management.bench_utils import (
+    build_load_requests, ensure_bench_api_key, run_load, seed_products, start_server, stop_server,
+    summarize_latencies, weighted_picker,
+)
+
+# Lectures concurrentes avec une part d'écritures : le cas où le journal par défaut bloque
+DEFAULT_MIX = 'list=35,list_filtered=20,maxprice=10,search=10,create=10,update=15'
+
+PROFILES = {
+    # Comportement SQLite par défaut : journal DELETE, une connexion par requête, BEGIN DEFERRED
+    'baseline': {'journal_mode': 'DELETE', 'env': {'SQLITE_TUNING': 'off'}},
+    # settings.SQLITE_PRAGMAS (WAL...), connexions persistantes, BEGIN IMMEDIATE
+    'tuned': {'journal_mode': 'WAL', 'env': {'SQLITE_TUNING': 'on'}},
+}
+
+
+class Command(BaseCommand):
+    help = ("Comparer le débit lecture/écriture concurrent avec la configuration SQLite par défaut "
+            "et avec le profil optimisé (WAL, synchronous=NORMAL, mmap, busy_timeout, CONN_MAX_AGE)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50_000)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=15.0, help='Secondes par profil')
+        parser.add_argument('--mix', default=DEFAULT_MIX)
+        parser.add_argument('--profile', action='append', choices=list(PROFILES),
+                            help='Profil à mesurer (répétable, tous par défaut)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Ce benchmark ne concerne que SQLite')
+
+        seed_products(options['rows'], stdout=self.stdout)
+        pick_request = weighted_picker(build_load_requests({'X-API-Key': ensure_bench_api_key()}), options['mix'])
+
+        for name in options['profile'] or list(PROFILES):
+            profile = PROFILES[name]
+            # Le mode de journal est enregistré dans le fichier : le fixer avant de lancer le serveur
+            with connection.cursor() as cursor:
+                cursor.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+            connection.close()
+
+            process, base_url = start_server('wsgi', env=profile['env'])
+            try:
+                results = run_load(base_url, pick_request, options['concurrency'], options['duration'])
+            finally:
+                stop_server(process)
+
+            self.stdout.write(f"== {name} ==")
+            reads, writes = [], []
+            for label, entry in sorted(results.items()):
+                summary = summarize_latencies(entry['latencies'], options['duration'])
+                failures = sum(count for status, count in entry['statuses'].items() if status >= 500)
+                (writes if label in ('create', 'update') else reads).extend(entry['latencies'])
+                self.stdout.write(
+                    f"  {label:<14}{summary['rps']:>8} req/s  p50 {summary['p50_ms']} ms  "
+                    f"p99 {summary['p99_ms']} ms  5xx {failures}  erreurs {entry['errors']}"
+                )
+            for label, latencies in (('lectures', reads), ('écritures', writes)):
+                summary = summarize_latencies(latencies, options['duration'])
+                self.stdout.write(f"  {label:<14}{summary['rps']:>8} req/s  p95 {summary['p95_ms']} ms")
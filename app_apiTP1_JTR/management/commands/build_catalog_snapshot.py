@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app_apiTP1_JTR.catalog_snapshot import CatalogSnapshot
+
+
+class Command(BaseCommand):
+    help = "Construire le snapshot précompressé du catalogue (catalog_snapshot/)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Reconstruire même si le snapshot est à jour')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        manifest = CatalogSnapshot.build(force=options['force'])
+        self.stdout.write(
+            f"Snapshot {manifest['generation']} : {manifest['product_count']} produits "
+            f"en {time.perf_counter() - start:.2f}s"
+        )
+        for encoding, entry in manifest['files'].items():
+            self.stdout.write(f"  {encoding:<8} {entry['size']:>12} octets  {entry['name']}")
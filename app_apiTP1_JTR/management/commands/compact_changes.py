@@ -0,0 +1,19 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app_apiTP1_JTR.change_log import ProductChangeLog
+
+
+class Command(BaseCommand):
+    help = ("Compacter le journal des modifications : supprimer les entrées plus anciennes que la rétention. "
+            "Les clients en retard au-delà devront repartir d'un snapshot (changes/snapshot/).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=float,
+                            default=getattr(settings, 'CHANGE_LOG_RETENTION_DAYS', 7))
+
+    def handle(self, *args, **options):
+        deleted = ProductChangeLog.compact(timedelta(days=options['retention_days']))
+        self.stdout.write(f'{deleted} entrée(s) supprimée(s), horizon : seq {ProductChangeLog.horizon()}')
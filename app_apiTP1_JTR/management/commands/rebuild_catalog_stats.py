@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app_apiTP1_JTR.aggregates import CatalogAggregates
+
+
+class Command(BaseCommand):
+    help = "Recalculer les agrégats du catalogue (après un import SQL direct ou une incohérence)"
+
+    def handle(self, *args, **options):
+        aggregate = CatalogAggregates.rebuild()
+        stats = CatalogAggregates.as_dict(aggregate)
+        self.stdout.write(self.style.SUCCESS(
+            f"Agrégats recalculés : {stats['count']} produits, "
+            f"min {stats['min_price']}, max {stats['max_price']}, moyenne {stats['avg_price']}"
+        ))
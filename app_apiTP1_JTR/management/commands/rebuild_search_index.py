@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from app_apiTP1_JTR.search_utils import ProductSearch
+
+
+class Command(BaseCommand):
+    help = "Reconstruire l'index plein texte FTS5 des produits"
+
+    def handle(self, *args, **options):
+        ProductSearch.rebuild_index()
+        self.stdout.write(self.style.SUCCESS("Index de recherche reconstruit"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from app_apiTP1_JTR.import_jobs import ImportJobRunner
+from app_apiTP1_JTR.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = "Exécuter les imports CSV en attente (ex: après un redémarrage des workers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_ids', nargs='*', type=int, help='Jobs à exécuter (défaut : tous ceux en attente)')
+
+    def handle(self, *args, **options):
+        job_ids = options['job_ids'] or list(
+            ImportJob.objects.filter(status='queued').order_by('id').values_list('id', flat=True)
+        )
+        for job_id in job_ids:
+            status = ImportJobRunner.run(job_id)
+            if status is None:
+                self.stdout.write(f"Import #{job_id} : déjà pris en charge ou pas en attente")
+                continue
+            job = ImportJob.objects.get(pk=job_id)
+            self.stdout.write(
+                f"Import #{job_id} {status} : {job.rows_processed} lignes "
+                f"({job.rows_created} créées, {job.rows_updated} modifiées, {job.rows_rejected} rejetées)"
+            )
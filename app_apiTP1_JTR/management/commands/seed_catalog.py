@@ -0,0 +1,193 @@
+import hashlib
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from app_apiTP1_JTR.aggregates import CatalogAggregates
+from app_apiTP1_JTR.init_permissions import init_permissions
+from app_apiTP1_JTR.management.bench_utils import count_synthetic_products, insert_synthetic_products
+from app_apiTP1_JTR.models import Product, Role, UserProfile
+from app_apiTP1_JTR.search_utils import ProductSearch
+
+# Produits de démonstration (anciennement populate_products.py)
+SAMPLE_PRODUCTS = [
+    {"name": "iPhone 15 Pro", "price": "1199.99", "description": "Latest Apple smartphone with titanium design"},
+    {"name": "Samsung Galaxy S24", "price": "999.99", "description": "Android flagship with AI features"},
+    {"name": "MacBook Pro M3", "price": "1999.99", "description": "Professional laptop with M3 chip"},
+    {"name": "Sony WH-1000XM5", "price": "399.99", "description": "Premium noise-canceling headphones"},
+    {"name": "iPad Pro 12.9", "price": "1099.99", "description": "Professional tablet with M2 chip"},
+    {"name": "Nintendo Switch OLED", "price": "349.99", "description": "Gaming console with OLED screen"},
+    {"name": "AirPods Pro 2", "price": "249.99", "description": "Wireless earbuds with spatial audio"},
+    {"name": "Tesla Model Y", "price": "52999.99", "description": "Electric SUV with autopilot"},
+    {"name": "PlayStation 5", "price": "499.99", "description": "Next-gen gaming console"},
+    {"name": "Dell XPS 13", "price": "1299.99", "description": "Premium ultrabook laptop"},
+    {"name": "Google Pixel 8", "price": "699.99", "description": "Google smartphone with AI photography"},
+    {"name": "Microsoft Surface Pro 9", "price": "999.99", "description": "2-in-1 tablet and laptop"},
+    {"name": "Dyson V15 Detect", "price": "749.99", "description": "Cordless vacuum with laser dust detection"},
+    {"name": "Apple Watch Ultra 2", "price": "799.99", "description": "Premium smartwatch for athletes"},
+    {"name": "Bose QuietComfort 45", "price": "329.99", "description": "Wireless noise-canceling headphones"},
+]
+
+SEED_ROLES = ('User', 'Manager', 'Admin')
+
+
+class Command(BaseCommand):
+    help = ("Générer un catalogue synthétique déterministe (jusqu'à plusieurs millions de produits), "
+            "les rôles par défaut et des utilisateurs API")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000,
+                            help='Nombre total de produits synthétiques visé (les index déjà présents sont conservés)')
+        parser.add_argument('--users', type=int, default=10, help='Nombre total d\'utilisateurs API synthétiques visé')
+        parser.add_argument('--batch-size', type=int, default=50_000, help='Lignes par transaction')
+        parser.add_argument('--key-seed', default='seed-catalog',
+                            help='Graine des clés API (mêmes clés à chaque exécution)')
+        parser.add_argument('--keys-file', help='Écrire username, rôle et clé API des utilisateurs en JSON')
+        parser.add_argument('--samples', action='store_true',
+                            help='Ajouter aussi les 15 produits de démonstration')
+        parser.add_argument('--fast', action='store_true',
+                            help="SQLite : relâcher synchronous/journal_mode et différer index et triggers "
+                                 "pendant le chargement (ne pas interrompre brutalement le processus)")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size doit être positif')
+
+        if not Role.objects.filter(name__in=SEED_ROLES).count() == len(SEED_ROLES):
+            init_permissions()
+
+        if options['samples']:
+            self.seed_samples()
+
+        self.seed_products(options['products'], options['batch_size'], options['fast'])
+        # bulk_create et l'INSERT préparé n'émettent pas post_save : agrégats recalculés à chaque
+        # exécution, y compris sans insertion (rattrape un chargement précédent interrompu)
+        CatalogAggregates.rebuild()
+        users = self.seed_users(options['users'], options['key_seed'])
+
+        if options['keys_file']:
+            Path(options['keys_file']).write_text(json.dumps(users, indent=2))
+            self.stdout.write(f"Clés API écrites dans {options['keys_file']}")
+
+    def seed_samples(self):
+        existing = set(Product.objects.filter(
+            name__in=[sample['name'] for sample in SAMPLE_PRODUCTS]
+        ).values_list('name', flat=True))
+        created = Product.objects.bulk_create(
+            [Product(**sample) for sample in SAMPLE_PRODUCTS if sample['name'] not in existing]
+        )
+        self.stdout.write(f'{len(created)} produits de démonstration créés')
+        return len(created)
+
+    def seed_products(self, target, batch_size, fast):
+        # Les produits synthétiques sont numérotés depuis 0 : reprendre après ceux déjà présents
+        start = count_synthetic_products()
+        if start >= target:
+            self.stdout.write(f'{start} produits synthétiques déjà présents, rien à insérer')
+            return 0
+
+        missing = target - start
+        self.stdout.write(f'Insertion de {missing:,} produits ({batch_size:,} par transaction)...')
+        started = time.perf_counter()
+
+        def progress(inserted):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'  {inserted:>12,} lignes  {inserted / elapsed:>10,.0f} lignes/s', ending='\r')
+            self.stdout.flush()
+
+        with self.relaxed_sqlite(fast) as deferred:
+            insert_synthetic_products(start, target, batch_size=batch_size, on_batch=progress)
+            loaded = time.perf_counter() - started
+            self.stdout.write('')
+            self.stdout.write(f'  chargement : {loaded:.1f}s ({missing / loaded:,.0f} lignes/s)')
+        if deferred:
+            self.stdout.write(f'  index et triggers recréés en {time.perf_counter() - started - loaded:.1f}s')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{missing:,} produits en {elapsed:.1f}s ({missing / elapsed:,.0f} lignes/s au total)'
+        ))
+        return missing
+
+    @contextmanager
+    def relaxed_sqlite(self, enabled):
+        """
+        Pendant le chargement : pas de fsync, journal en mémoire, et index secondaires et triggers
+        (index FTS5) supprimés puis recréés en une passe à la fin, ce qui coûte bien moins cher que
+        de les maintenir ligne par ligne. Produit la liste des objets différés.
+        """
+        if not enabled or connection.vendor != 'sqlite':
+            if enabled:
+                self.stdout.write(self.style.WARNING('--fast ignoré : la base n\'est pas SQLite'))
+            yield []
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            journal_mode = cursor.fetchone()[0]
+            cursor.execute('PRAGMA synchronous')
+            synchronous = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT type, name, sql FROM sqlite_master "
+                "WHERE tbl_name = %s AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+                [Product._meta.db_table],
+            )
+            deferred = cursor.fetchall()
+
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.execute('PRAGMA journal_mode = MEMORY')
+            cursor.execute('PRAGMA cache_size = -262144')
+            cursor.execute('PRAGMA temp_store = MEMORY')
+            with transaction.atomic():
+                for object_type, name, _ in deferred:
+                    cursor.execute(f'DROP {object_type.upper()} {connection.ops.quote_name(name)}')
+        try:
+            yield deferred
+        finally:
+            with connection.cursor() as cursor:
+                with transaction.atomic():
+                    for _, _, sql in deferred:
+                        cursor.execute(sql)
+                if any(object_type == 'trigger' for object_type, _, _ in deferred):
+                    # Les lignes chargées sans trigger ne sont pas encore dans l'index plein texte
+                    ProductSearch.rebuild_index()
+                cursor.execute(f'PRAGMA journal_mode = {journal_mode}')
+                cursor.execute(f'PRAGMA synchronous = {int(synchronous)}')
+
+    def seed_users(self, target, key_seed):
+        """Utilisateurs seed_user_NNNNNN, rôles en rotation, clés API dérivées de la graine"""
+        roles = {role.name: role for role in Role.objects.filter(name__in=SEED_ROLES)}
+        usernames = [f'seed_user_{index:06d}' for index in range(target)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+
+        def api_key(username):
+            return hashlib.sha256(f'{key_seed}:{username}'.encode()).hexdigest()
+
+        with transaction.atomic():
+            # Un seul mot de passe inutilisable : make_password est coûteux et la connexion se fait par clé
+            unusable_password = make_password(None)
+            new_users = User.objects.bulk_create([
+                User(username=username, password=unusable_password)
+                for username in usernames if username not in existing
+            ])
+            # bulk_create ne renvoie pas les id sur toutes les bases : les relire
+            user_ids = dict(User.objects.filter(
+                username__in=[user.username for user in new_users]
+            ).values_list('username', 'id'))
+            UserProfile.objects.bulk_create([
+                UserProfile(user_id=user_ids[username], api_key=api_key(username),
+                            role=roles[SEED_ROLES[index % len(SEED_ROLES)]])
+                for index, username in enumerate(usernames) if username in user_ids
+            ])
+        self.stdout.write(f'{len(new_users)} utilisateurs API créés ({len(existing)} déjà présents)')
+
+        return [
+            {'username': username, 'role': SEED_ROLES[index % len(SEED_ROLES)], 'api_key': api_key(username)}
+            for index, username in enumerate(usernames)
+        ]
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app_apiTP1_JTR.db_routing import ReplicaSnapshot, read_replicas
+
+
+class Command(BaseCommand):
+    help = "Rafraîchir les réplicas de lecture SQLite (DB_REPLICAS) depuis la base principale"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='Recommencer toutes les N secondes (sinon une seule copie)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Les snapshots ne concernent que SQLite : utiliser la réplication du SGBD')
+        if not read_replicas():
+            raise CommandError('Aucun réplica configuré (variable DB_REPLICAS)')
+
+        while True:
+            start = time.perf_counter()
+            paths = ReplicaSnapshot.refresh_all()
+            self.stdout.write(f"{len(paths)} réplica(s) rafraîchi(s) en {time.perf_counter() - start:.2f}s")
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
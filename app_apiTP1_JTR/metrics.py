@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_HELP = {
+    'api_requests_total': ('counter', 'Requêtes traitées par vue, méthode et statut'),
+    'api_request_duration_seconds': ('histogram', 'Latence des requêtes par vue'),
+    'api_db_queries_total': ('counter', 'Requêtes SQL exécutées par vue'),
+    'api_db_query_duration_seconds_total': ('counter', 'Temps passé en SQL par vue'),
+    'api_response_size_bytes_total': ('counter', 'Octets de réponse (hors streaming) par vue'),
+}
+
+
+class MetricsRegistry:
+    """
+    Compteurs et histogrammes du processus courant. Les mises à jour ne
+    tiennent un verrou que le temps de quelques opérations sur des dict.
+    Chaque processus recopie périodiquement son état dans METRICS_DIR
+    (un fichier JSON par pid, écrit par renommage atomique) ; /metrics
+    additionne ces fichiers, ce qui agrège tous les workers.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # (nom, labels) -> valeur
+        self._histograms = {}  # (nom, labels) -> [compte par bucket..., +Inf, somme]
+        self._last_flush = 0.0
+
+    def observe_request(self, view, method, status, duration, db_queries, db_time, response_size):
+        histogram_key = ('api_request_duration_seconds', (('view', view),))
+        with self._lock:
+            self._inc(('api_requests_total', (('view', view), ('method', method), ('status', str(status)))), 1)
+            self._inc(('api_db_queries_total', (('view', view),)), db_queries)
+            self._inc(('api_db_query_duration_seconds_total', (('view', view),)), db_time)
+            if response_size is not None:
+                self._inc(('api_response_size_bytes_total', (('view', view),)), response_size)
+
+            histogram = self._histograms.get(histogram_key)
+            if histogram is None:
+                histogram = self._histograms[histogram_key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[index] += 1
+                    break
+            else:
+                histogram[len(self.buckets)] += 1
+            histogram[-1] += duration
+
+        self.maybe_flush()
+
+    def _inc(self, key, amount):
+        self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()],
+            }
+
+    # --- Partage entre processus ---
+
+    @staticmethod
+    def metrics_dir():
+        directory = getattr(settings, 'METRICS_DIR', None)
+        return Path(directory) if directory else None
+
+    def maybe_flush(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        now = time.monotonic()
+        if now - self._last_flush >= interval:
+            self._last_flush = now
+            self.flush()
+
+    def flush(self):
+        """Écrire l'état du processus dans METRICS_DIR/<pid>.json"""
+        directory = self.metrics_dir()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f'{os.getpid()}.json'
+        temporary = directory / f'.{os.getpid()}.json.tmp'
+        temporary.write_text(json.dumps(self.snapshot()))
+        os.replace(temporary, target)
+
+    def collect(self):
+        """État agrégé : fichiers des autres processus + état en mémoire de celui-ci"""
+        snapshots = [self.snapshot()]
+        directory = self.metrics_dir()
+        if directory is not None and directory.is_dir():
+            own_file = f'{os.getpid()}.json'
+            for path in directory.glob('*.json'):
+                if path.name == own_file:
+                    continue
+                if path.stem.isdigit() and not pid_alive(int(path.stem)):
+                    # Worker arrêté (redémarrage, recyclage) : ses compteurs ne s'accumulent pas indéfiniment
+                    path.unlink(missing_ok=True)
+                    continue
+                try:
+                    snapshots.append(json.loads(path.read_text()))
+                except (OSError, ValueError):
+                    continue  # Fichier en cours de remplacement ou illisible
+
+        counters = {}
+        histograms = {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(label) for label in labels))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(tuple(label) for label in labels))
+                merged = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    merged[index] += value
+        return counters, histograms
+
+    def render(self):
+        """Exposition au format texte Prometheus (version 0.0.4)"""
+        counters, histograms = self.collect()
+        lines = []
+        for name, (metric_type, help_text) in METRIC_HELP.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type == 'histogram':
+                for (metric, labels), values in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + ('+Inf',), values[:-1]):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                    lines.append(f'{name}_sum{format_labels(labels)} {values[-1]}')
+                    lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+            else:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def pid_alive(pid):
+    """Le processus existe-t-il encore sur cette machine (METRICS_DIR est local) ?"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Existe, mais appartient à un autre utilisateur
+    return True
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+metrics_registry = MetricsRegistry(buckets=getattr(settings, 'METRICS_BUCKETS', DEFAULT_BUCKETS))
+
+
+# QueryTimer de la requête HTTP en cours. Sous ASGI, l'ORM s'exécute dans le thread de
+# sync_to_async, avec ses propres connexions : la ContextVar y suit la requête, pas un
+# execute_wrapper posé sur les connexions du thread de la boucle
+_current_timer = ContextVar('query_timer', default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    """execute_wrapper permanent de chaque connexion : mesure pour le QueryTimer du contexte courant"""
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install_query_timer(connection):
+    """Poser time_query sur une connexion (signal connection_created, tous alias et threads)"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class QueryTimer:
+    """Compteur des requêtes SQL et de leur durée pendant une requête HTTP"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+    @contextmanager
+    def activate(self):
+        """
+        Compter les requêtes de tous les alias (base principale et réplicas de lecture)
+        exécutées dans ce contexte, y compris depuis sync_to_async
+        """
+        # Connexions déjà ouvertes avant le branchement du signal
+        for alias in connections:
+            install_query_timer(connections[alias])
+        token = _current_timer.set(self)
+        try:
+            yield self
+        finally:
+            _current_timer.reset(token)
+
+
+class MetricsMiddleware:
+    """Mesurer chaque requête : latence, statut, requêtes SQL et taille de réponse, par nom d'URL"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Sous ASGI, rester asynchrone pour ne pas repasser les vues async par un thread
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with timer.activate():
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with timer.activate():
+            response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    @staticmethod
+    def record(request, response, duration, timer):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        metrics_registry.observe_request(
+            view, request.method, response.status_code, duration, timer.count, timer.duration, size
+        )
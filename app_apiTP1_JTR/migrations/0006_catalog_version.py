@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apiTP1_JTR', '0005_product_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogaggregate',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
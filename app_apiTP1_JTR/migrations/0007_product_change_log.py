@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:36
+
+import app_apiTP1_JTR.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apiTP1_JTR', '0006_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('product_id', models.BigIntegerField()),
+                ('op', models.CharField(choices=[('create', 'create'), ('update', 'update'), ('delete', 'delete')], max_length=6)),
+                ('fields', models.JSONField(default=dict, encoder=app_apiTP1_JTR.models.ChangeLogEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
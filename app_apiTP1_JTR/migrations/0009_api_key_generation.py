@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:02
+
+from django.db import migrations, models
+
+GENERATION_TABLE = 'app_apiTP1_JTR_apikeygeneration'
+# Tables dont une écriture peut changer le résultat de l'authentification d'une clé en cache
+WATCHED = [
+    ('app_apiTP1_JTR_userprofile', 'user_id, role_id, api_key, is_api_active'),
+    ('auth_user', 'username, is_active'),
+    ('app_apiTP1_JTR_role', 'name'),
+]
+BUMP_SQL = (
+    f"INSERT INTO {GENERATION_TABLE}(id, generation) VALUES (1, 1) "
+    "ON CONFLICT(id) DO UPDATE SET generation = generation + 1;"
+)
+
+
+def trigger_names(table):
+    return f'{table}_apikey_au', f'{table}_apikey_ad'
+
+
+def create_triggers(apps, schema_editor):
+    # Les triggers couvrent aussi update() / bulk_update(), qui n'émettent pas de signaux ;
+    # sur un autre moteur, seuls les signaux de signals.py incrémentent le compteur
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns in WATCHED:
+        update_trigger, delete_trigger = trigger_names(table)
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {update_trigger} AFTER UPDATE OF {columns} ON {table} "
+            f"BEGIN {BUMP_SQL} END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {delete_trigger} AFTER DELETE ON {table} BEGIN {BUMP_SQL} END"
+        )
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, _ in WATCHED:
+        for name in trigger_names(table):
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apiTP1_JTR', '0008_import_jobs'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiKeyGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('generation', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
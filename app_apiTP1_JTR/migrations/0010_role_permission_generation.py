@@ -0,0 +1,41 @@
+from django.db import migrations
+
+GENERATION_TABLE = 'app_apiTP1_JTR_apikeygeneration'
+BUMP_SQL = (
+    f"INSERT INTO {GENERATION_TABLE}(id, generation) VALUES (1, 1) "
+    "ON CONFLICT(id) DO UPDATE SET generation = generation + 1;"
+)
+# Écritures pouvant changer les permissions d'un rôle : le compteur de la migration 0009
+# invalide aussi les caches RolePermissionCache de tous les processus
+TRIGGERS = [
+    ('app_apiTP1_JTR_role_permissions_perm_ai', 'AFTER INSERT ON app_apiTP1_JTR_role_permissions'),
+    ('app_apiTP1_JTR_role_permissions_perm_ad', 'AFTER DELETE ON app_apiTP1_JTR_role_permissions'),
+    ('app_apiTP1_JTR_permission_perm_au', 'AFTER UPDATE OF code ON app_apiTP1_JTR_permission'),
+    ('app_apiTP1_JTR_permission_perm_ad', 'AFTER DELETE ON app_apiTP1_JTR_permission'),
+]
+
+
+def create_triggers(apps, schema_editor):
+    # Hors SQLite, les signaux de signals.py incrémentent le compteur
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, event in TRIGGERS:
+        schema_editor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {BUMP_SQL} END")
+
+
+def drop_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for name, _ in TRIGGERS:
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_apiTP1_JTR', '0009_api_key_generation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
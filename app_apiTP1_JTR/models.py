@@ -1,5 +1,10 @@
-from django.db import models 
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from .auth_cache import role_permission_cache
 
 class Product(models.Model): 
     name = models.CharField(max_length=100) 
@@ -8,6 +13,23 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True) 
     updated_at = models.DateTimeField(auto_now=True)
     def __str__(self): return self.name
+
+    # Les signaux post_save/post_delete (agrégats, journal des modifications)
+    # s'exécutent dans la même transaction que l'écriture
+    def save(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(savepoint=False):
+            return super().delete(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['created_at', 'id'], name='product_created_at_idx'),
+            models.Index(fields=['updated_at', 'id'], name='product_updated_at_idx'),
+        ]
     
 class Permission(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -38,8 +60,107 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.role.name if self.role else 'No Role'}"
     
-    def has_permission(self, permission_code):
-        if not self.role:
+    def has_permission(self, *permission_codes):
+        if not self.role_id:
             return False
-        return self.role.permissions.filter(code=permission_code).exists()
-    
+        return role_permission_cache.get(self.role_id).issuperset(permission_codes)
+
+    async def ahas_permission(self, *permission_codes):
+        if not self.role_id:
+            return False
+        return (await role_permission_cache.aget(self.role_id)).issuperset(permission_codes)
+
+
+class ApiKeyGeneration(models.Model):
+    """
+    Compteur (ligne unique, pk=1) incrémenté à chaque modification d'un profil, d'un
+    utilisateur ou d'un rôle, y compris par QuerySet.update() (triggers SQLite de la
+    migration 0009) : les caches de clés API de tous les processus le comparent au leur
+    """
+    generation = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"API key generation {self.generation}"
+
+
+
+class CatalogAggregate(models.Model):
+    """Agrégats du catalogue tenus à jour à chaque écriture (ligne unique, pk=1)"""
+    version = models.PositiveBigIntegerField(default=0)  # Incrémenté à chaque écriture sur Product
+    product_count = models.PositiveBigIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=24, decimal_places=2, default=0)
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    max_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    min_product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    max_product = models.ForeignKey(Product, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.product_count} products, max {self.max_price}"
+
+    @property
+    def avg_price(self):
+        if not self.product_count:
+            return None
+        return (Decimal(self.price_sum) / self.product_count).quantize(Decimal('0.01'))
+
+
+class ChangeLogEncoder(DjangoJSONEncoder):
+    """Comme DjangoJSONEncoder, sans tronquer les dates à la milliseconde"""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class ProductChange(models.Model):
+    """Journal append-only des écritures sur Product, lu par les réplications incrémentales"""
+    OPERATIONS = [('create', 'create'), ('update', 'update'), ('delete', 'delete')]
+
+    seq = models.BigAutoField(primary_key=True)
+    # Pas de clé étrangère : l'entrée doit survivre à la suppression du produit
+    product_id = models.BigIntegerField()
+    op = models.CharField(max_length=6, choices=OPERATIONS)
+    # Nouvelles valeurs des champs modifiés (la ligne complète pour un create, vide pour un delete)
+    fields = models.JSONField(default=dict, encoder=ChangeLogEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.seq} {self.op} product {self.product_id}"
+
+
+class ImportJob(models.Model):
+    """Import CSV en arrière-plan (import_jobs/) : avancement enregistré à chaque lot validé"""
+    STATUSES = [
+        ('queued', 'queued'),
+        ('running', 'running'),
+        ('succeeded', 'succeeded'),
+        ('failed', 'failed'),
+        ('cancelled', 'cancelled'),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    source_name = models.CharField(max_length=255, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    total_bytes = models.PositiveBigIntegerField(default=0)
+    # Point de reprise : octets du CSV (et du fichier d'erreurs) couverts par les lots validés
+    byte_offset = models.PositiveBigIntegerField(default=0)
+    error_bytes = models.PositiveBigIntegerField(default=0)
+    rows_processed = models.PositiveBigIntegerField(default=0)
+    rows_created = models.PositiveBigIntegerField(default=0)
+    rows_updated = models.PositiveBigIntegerField(default=0)
+    rows_rejected = models.PositiveBigIntegerField(default=0)
+    cancel_requested = models.BooleanField(default=False)
+    # Incrémenté à chaque prise en charge : un worker évincé ne peut plus valider de lot
+    attempt = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_started_at = models.DateTimeField(null=True, blank=True)
+    run_start_rows = models.PositiveBigIntegerField(default=0)
+    run_start_offset = models.PositiveBigIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import #{self.pk} {self.source_name} ({self.status})"
@@ -1,6 +1,16 @@
+import base64
+import binascii
+import datetime
+import json
+from decimal import Decimal
+
+from django.conf import settings
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Q
 from django.http import JsonResponse
 
+from .serializers import get_row_serializer
+
 class PaginationHelper:
     @staticmethod
     def paginate_queryset(queryset, page_number, page_size=3):
@@ -55,4 +65,189 @@ class PaginationHelper:
             'data': data['items'],
             'pagination': data['pagination']
         }
-        return JsonResponse(response_data)
\ No newline at end of file
+        return JsonResponse(response_data)
+
+
+class CursorPaginationHelper:
+    """
+    Pagination par curseur (keyset) : chaque page est obtenue par un
+    WHERE sur la dernière clé vue plutôt que par un OFFSET, donc la page N
+    coûte autant que la page 1 tant que l'ordre est couvert par un index.
+    """
+
+    @staticmethod
+    def encode_cursor(ordering, row):
+        """
+        Construire un curseur opaque à partir de la dernière ligne d'une page
+
+        Args:
+            ordering: Tuple des champs de tri (ex: ('id',) ou ('-created_at', 'id'))
+            row: Dictionnaire contenant au moins les champs de tri
+
+        Returns:
+            str: Jeton base64 url-safe
+        """
+        payload = {
+            'o': list(ordering),
+            'v': [CursorPaginationHelper._cursor_value(row[field.lstrip('-')]) for field in ordering],
+        }
+        raw = json.dumps(payload, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def _cursor_value(value):
+        # isoformat() garde les microsecondes (DjangoJSONEncoder les tronque, ce qui fausserait le keyset)
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    @staticmethod
+    def decode_cursor(cursor, ordering):
+        """
+        Décoder un curseur et vérifier qu'il correspond au tri demandé
+
+        Raises:
+            ValueError: Si le curseur est illisible ou créé pour un autre tri
+        """
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            values = payload['v']
+            cursor_ordering = payload['o']
+            # Le curseur vient du client : une liste de scalaires JSON, rien d'autre
+            if not isinstance(values, list) or not all(
+                isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in values
+            ):
+                raise ValueError
+        except (ValueError, TypeError, KeyError, binascii.Error):
+            raise ValueError('Invalid cursor')
+
+        if cursor_ordering != list(ordering) or len(values) != len(ordering):
+            raise ValueError('Cursor does not match the requested ordering')
+        return values
+
+    @staticmethod
+    def keyset_filter(ordering, values):
+        """
+        Construire le filtre "après la clé (v1, v2, ...)" pour un tri composite :
+        (a > v1) OR (a = v1 AND b > v2) OR ...
+
+        La borne redondante a >= v1 en tête permet au moteur de faire une
+        recherche par plage dans l'index au lieu de le parcourir depuis le début.
+        """
+        condition = Q()
+        equal_so_far = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal_so_far & Q(**{f'{name}__{lookup}': value})
+            equal_so_far &= Q(**{name: value})
+        if len(ordering) > 1:
+            first = ordering[0]
+            lookup = 'lte' if first.startswith('-') else 'gte'
+            condition = Q(**{f'{first.lstrip("-")}__{lookup}': values[0]}) & condition
+        return condition
+
+    @staticmethod
+    def paginate_queryset(queryset, cursor=None, page_size=None, ordering=('id',), include_total=False,
+                          serializer=None, fields=None):
+        """
+        Paginer un queryset (idéalement un .values()) par curseur
+
+        Args:
+            queryset: Le queryset Django à paginer
+            cursor: Curseur renvoyé par la page précédente (None pour la première page)
+            page_size: Nombre d'éléments par page (défaut: settings.API_PAGE_SIZE)
+            ordering: Champs de tri, le dernier doit être unique (ex: 'id')
+            include_total: Ajouter le COUNT(*) total (coûteux sur une grosse table)
+            serializer: RowSerializer optionnel ; les lignes sont alors lues en
+                values_list() et encodées (doit contenir les champs de tri)
+            fields: Champs à renvoyer (à la place de serializer) ; les champs de tri absents
+                sont lus pour construire le curseur puis retirés des lignes
+
+        Returns:
+            dict: Données paginées avec métadonnées
+
+        Raises:
+            ValueError: Si le curseur ou la taille de page est invalide
+        """
+        page_size = CursorPaginationHelper.clean_page_size(page_size)
+        ordering = tuple(ordering)
+        serializer, hidden = CursorPaginationHelper._projection(queryset, ordering, serializer, fields)
+        total_items = queryset.count() if include_total else None
+        page_queryset = CursorPaginationHelper._page_queryset(queryset, cursor, page_size, ordering, serializer)
+        return CursorPaginationHelper._build_page(
+            list(page_queryset), page_size, ordering, serializer, include_total, total_items, hidden
+        )
+
+    @staticmethod
+    async def apaginate_queryset(queryset, cursor=None, page_size=None, ordering=('id',), include_total=False,
+                                 serializer=None, fields=None):
+        """Variante asynchrone de paginate_queryset (ORM asynchrone, mêmes arguments)"""
+        page_size = CursorPaginationHelper.clean_page_size(page_size)
+        ordering = tuple(ordering)
+        serializer, hidden = CursorPaginationHelper._projection(queryset, ordering, serializer, fields)
+        total_items = await queryset.acount() if include_total else None
+        page_queryset = CursorPaginationHelper._page_queryset(queryset, cursor, page_size, ordering, serializer)
+        return CursorPaginationHelper._build_page(
+            [row async for row in page_queryset], page_size, ordering, serializer, include_total, total_items,
+            hidden
+        )
+
+    @staticmethod
+    def _projection(queryset, ordering, serializer, fields):
+        """(serializer, champs lus uniquement pour le curseur) pour une liste de champs demandée"""
+        if fields is None:
+            return serializer, ()
+        hidden = tuple(name.lstrip('-') for name in ordering if name.lstrip('-') not in fields)
+        return get_row_serializer(queryset.model, (*fields, *hidden)), hidden
+
+    @staticmethod
+    def _page_queryset(queryset, cursor, page_size, ordering, serializer):
+        page_queryset = queryset.order_by(*ordering)
+        if cursor:
+            values = CursorPaginationHelper.decode_cursor(cursor, ordering)
+            page_queryset = page_queryset.filter(CursorPaginationHelper.keyset_filter(ordering, values))
+
+        if serializer is not None:
+            page_queryset = serializer.values_list(page_queryset)
+
+        # Une ligne de plus que demandé pour savoir s'il existe une page suivante
+        return page_queryset[:page_size + 1]
+
+    @staticmethod
+    def _build_page(items, page_size, ordering, serializer, include_total, total_items, hidden=()):
+        if serializer is not None:
+            items = serializer.rows(items)
+        has_next = len(items) > page_size
+        items = items[:page_size]
+
+        pagination = {
+            'items_per_page': page_size,
+            'has_next': has_next,
+            'next_cursor': CursorPaginationHelper.encode_cursor(ordering, items[-1]) if has_next else None,
+        }
+        if include_total:
+            pagination['total_items'] = total_items
+        for item in items:
+            for name in hidden:
+                del item[name]
+
+        return {'items': items, 'pagination': pagination}
+
+    @staticmethod
+    def clean_page_size(page_size):
+        """Valider la taille de page demandée et la borner à settings.API_MAX_PAGE_SIZE"""
+        default_size = getattr(settings, 'API_PAGE_SIZE', 100)
+        max_size = getattr(settings, 'API_MAX_PAGE_SIZE', 1000)
+        if page_size in (None, ''):
+            return default_size
+        try:
+            page_size = int(page_size)
+        except (TypeError, ValueError):
+            raise ValueError('page_size must be an integer')
+        if page_size < 1:
+            raise ValueError('page_size must be positive')
+        return min(page_size, max_size)
@@ -0,0 +1,354 @@
+import math
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import connection
+from django.utils.dateparse import parse_datetime
+
+from .change_log import ChangeLogCompacted, ProductChangeLog
+from .models import CatalogAggregate, Product
+
+try:
+    import numpy as np
+except ImportError:  # numpy est optionnel : repli sur un calcul en Python pur (plus lent)
+    np = None
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+DEFAULT_PERCENTILES = (25, 50, 75, 90, 95, 99)
+# Au-delà, relire toute la table coûte moins cher que rejouer le journal
+MAX_REPLAYED_CHANGES = 100_000
+
+
+def to_micros(value):
+    """datetime (aware) -> microsecondes depuis l'epoch, en arithmétique entière"""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def to_cents(value):
+    return int(Decimal(str(value)).scaleb(2))
+
+
+class PriceColumns:
+    """
+    Colonnes (id, prix en centimes, created_at en µs) de tout le catalogue,
+    triées par id, dans des array('q') immuables une fois publiés : une mise à
+    jour produit une copie, si bien qu'un calcul en cours n'est jamais affecté.
+    Avec numpy, les tableaux sont vus sans copie via np.frombuffer.
+    """
+
+    def __init__(self, version, seq, ids, cents, created):
+        self.version = version
+        self.seq = seq
+        self.ids = ids
+        self.cents = cents
+        self.created = created
+        self._sorted_cents = None
+        if np is not None:
+            self.np_cents = np.frombuffer(cents, dtype=np.int64) if cents else np.empty(0, dtype=np.int64)
+            self.np_created = np.frombuffer(created, dtype=np.int64) if created else np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def sorted_cents(self):
+        """Prix triés, calculés une fois par version : percentiles et histogramme par dichotomie"""
+        if self._sorted_cents is None:
+            self._sorted_cents = np.sort(self.np_cents) if np is not None else sorted(self.cents)
+        return self._sorted_cents
+
+
+class PriceAnalytics:
+    """
+    Statistiques de prix (moyenne, écart-type, médiane, percentiles,
+    histogramme) calculées en mémoire sur des colonnes chargées une fois par
+    processus. Le catalogue ayant changé (version de CatalogAggregate), les
+    colonnes sont mises à jour en rejouant le journal des modifications
+    depuis la dernière seq appliquée, et rechargées entièrement seulement si
+    le journal a été compacté ou si le nombre de produits ne concorde plus.
+    """
+
+    _columns = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def engine():
+        return 'numpy' if np is not None else 'python'
+
+    # --- Chargement et mise à jour ---
+
+    @staticmethod
+    def columns():
+        """Colonnes à jour de la version courante du catalogue"""
+        version, product_count = PriceAnalytics._catalog_state()
+        columns = PriceAnalytics._columns
+        if columns is not None and columns.version == version:
+            return columns
+
+        with PriceAnalytics._lock:
+            columns = PriceAnalytics._columns
+            if columns is not None and columns.version == version:
+                return columns
+            if columns is not None:
+                columns = PriceAnalytics._replay(columns, version)
+            # Écritures hors journal (ex: seed_catalog --fast) : le compte ne concorde plus
+            if columns is None or len(columns) != product_count:
+                columns = PriceAnalytics.load(version)
+            PriceAnalytics._columns = columns
+            return columns
+
+    @staticmethod
+    def _catalog_state():
+        row = CatalogAggregate.objects.filter(pk=1).values_list('version', 'product_count').first()
+        if row is None:
+            return 0, Product.objects.count()
+        return row
+
+    @staticmethod
+    def load(version):
+        """
+        Lire toute la table en une passe. La seq du journal est relevée avant :
+        une écriture concurrente sera rejouée ensuite, ce qui est sans effet.
+        """
+        seq = ProductChangeLog.current_seq()
+        ids, cents, created = array('q'), array('q'), array('q')
+        for product_id, price_cents, created_micros in PriceAnalytics._iter_rows():
+            ids.append(product_id)
+            cents.append(price_cents)
+            created.append(created_micros)
+        return PriceColumns(version, seq, ids, cents, created)
+
+    @staticmethod
+    def _iter_rows():
+        if connection.vendor == 'sqlite':
+            # Conversion faite par SQLite : ni Decimal ni datetime à construire par ligne
+            # (created_at est stocké en UTC sous la forme 'AAAA-MM-JJ HH:MM:SS[.ffffff]')
+            created_at = Product._meta.get_field('created_at').column
+            price = Product._meta.get_field('price').column
+            sql = (
+                f"SELECT id, CAST(ROUND({price} * 100) AS INTEGER), "
+                f"CAST(strftime('%s', {created_at}) AS INTEGER) * 1000000 "
+                f"+ CAST(substr({created_at} || '.000000', 21, 6) AS INTEGER) "
+                f"FROM {Product._meta.db_table} ORDER BY id"
+            )
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                while rows := cursor.fetchmany(10000):
+                    yield from rows
+            return
+
+        rows = Product.objects.order_by('id').values_list('id', 'price', 'created_at')
+        for product_id, price, created_at in rows.iterator(chunk_size=10000):
+            yield product_id, to_cents(price), to_micros(created_at)
+
+    @staticmethod
+    def _replay(columns, version):
+        """
+        Appliquer le journal depuis columns.seq sur une copie des colonnes
+
+        Returns:
+            PriceColumns: Les colonnes mises à jour, ou None s'il faut tout recharger
+        """
+        latest = {}  # product_id -> (centimes, µs) ou None si supprimé
+        seq = columns.seq
+        try:
+            while True:
+                page = ProductChangeLog.read(seq, limit=5000)
+                for change in page['changes']:
+                    fields = change['fields']
+                    if change['op'] == 'delete':
+                        latest[change['product_id']] = None
+                    elif change['op'] == 'create':
+                        latest[change['product_id']] = (
+                            to_cents(fields['price']), to_micros(parse_datetime(fields['created_at']))
+                        )
+                    elif 'price' in fields:
+                        # Produit créé plus haut dans le journal : garder sa date de création
+                        previous = latest.get(change['product_id'])
+                        latest[change['product_id']] = (to_cents(fields['price']), previous and previous[1])
+                seq = page['next_since']
+                if not page['has_more']:
+                    break
+                if len(latest) > MAX_REPLAYED_CHANGES:
+                    return None
+        except ChangeLogCompacted:
+            return None
+        if not latest:
+            return PriceColumns(version, seq, columns.ids, columns.cents, columns.created)
+
+        ids, cents, created = array('q', columns.ids), array('q', columns.cents), array('q', columns.created)
+        for product_id in sorted(latest):
+            values = latest[product_id]
+            index = bisect_left(ids, product_id)
+            found = index < len(ids) and ids[index] == product_id
+            if values is None:
+                if found:
+                    del ids[index], cents[index], created[index]
+            elif found:
+                cents[index] = values[0]
+                if values[1] is not None:
+                    created[index] = values[1]
+            elif values[1] is not None:
+                ids.insert(index, product_id)
+                cents.insert(index, values[0])
+                created.insert(index, values[1])
+            else:
+                return None  # Modification d'un produit inconnu : colonnes incohérentes
+        return PriceColumns(version, seq, ids, cents, created)
+
+    # --- Calcul ---
+
+    @staticmethod
+    def compute(columns, created_from=None, created_to=None, percentiles=DEFAULT_PERCENTILES, bins=20):
+        """
+        Statistiques des prix des produits créés dans [created_from, created_to]
+
+        Returns:
+            dict: count, min, max, mean, median, stddev (population), percentiles, histogram
+        """
+        lower = to_micros(created_from) if created_from is not None else None
+        upper = to_micros(created_to) if created_to is not None else None
+        if np is not None:
+            result = PriceAnalytics._compute_numpy(columns, lower, upper, percentiles, bins)
+        else:
+            result = PriceAnalytics._compute_python(columns, lower, upper, percentiles, bins)
+        result['engine'] = PriceAnalytics.engine()
+        result['catalog_version'] = columns.version
+        return result
+
+    @staticmethod
+    def _compute_numpy(columns, lower, upper, percentiles, bins):
+        if lower is None and upper is None:
+            prices = columns.sorted_cents()
+        else:
+            mask = np.ones(columns.np_created.shape, dtype=bool)
+            if lower is not None:
+                mask &= columns.np_created >= lower
+            if upper is not None:
+                mask &= columns.np_created <= upper
+            prices = np.sort(columns.np_cents[mask])
+        count = int(prices.size)
+        if not count:
+            return PriceAnalytics._empty(percentiles)
+
+        # Interpolation linéaire (comme numpy.percentile) sur le tableau déjà trié
+        positions = (count - 1) * np.array([50, *percentiles], dtype=np.float64) / 100
+        low = np.floor(positions).astype(np.int64)
+        high = np.minimum(low + 1, count - 1)
+        values = prices[low] + (prices[high] - prices[low]) * (positions - low)
+
+        first, last = int(prices[0]), int(prices[-1])
+        if first == last:
+            first, last = first - 0.5, last + 0.5  # même plage que numpy.histogram
+        edges = np.linspace(first, last, bins + 1)
+        # Classes [a, b[ (la dernière fermée) comptées par dichotomie, comme numpy.histogram
+        positions = np.concatenate(([0], np.searchsorted(prices, edges[1:-1]), [count]))
+        return PriceAnalytics._result(
+            count=count,
+            minimum=int(prices[0]),
+            maximum=int(prices[-1]),
+            mean=float(prices.mean()),
+            stddev=float(prices.std()),
+            median=float(values[0]),
+            percentiles=dict(zip(percentiles, values[1:].tolist())),
+            counts=np.diff(positions).tolist(),
+            edges=edges.tolist(),
+        )
+
+    @staticmethod
+    def _compute_python(columns, lower, upper, percentiles, bins):
+        if lower is None and upper is None:
+            prices = columns.sorted_cents()
+        else:
+            lower = -math.inf if lower is None else lower
+            upper = math.inf if upper is None else upper
+            prices = sorted(price for price, created in zip(columns.cents, columns.created)
+                            if lower <= created <= upper)
+        count = len(prices)
+        if not count:
+            return PriceAnalytics._empty(percentiles)
+
+        total = sum(prices)
+        # Variance exacte en entiers : n·Σx² − (Σx)², divisé par n²
+        variance = (count * sum(price * price for price in prices) - total * total) / (count * count)
+
+        def percentile(q):
+            # Interpolation linéaire, comme numpy.percentile
+            position = (count - 1) * q / 100
+            low = math.floor(position)
+            high = min(low + 1, count - 1)
+            return prices[low] + (prices[high] - prices[low]) * (position - low)
+
+        first, last = prices[0], prices[-1]
+        if first == last:
+            first, last = first - 0.5, last + 0.5  # même plage que numpy.histogram
+        width = (last - first) / bins
+        edges = [first + width * index for index in range(bins)] + [last]
+        # Liste triée : chaque classe se compte par dichotomie sur ses bornes
+        positions = [0] + [bisect_left(prices, edge) for edge in edges[1:-1]] + [count]
+        counts = [high - low for low, high in zip(positions, positions[1:])]
+
+        return PriceAnalytics._result(
+            count=count,
+            minimum=prices[0],
+            maximum=prices[-1],
+            mean=total / count,
+            stddev=math.sqrt(max(variance, 0)),
+            median=percentile(50),
+            percentiles={q: percentile(q) for q in percentiles},
+            counts=counts,
+            edges=edges,
+        )
+
+    @staticmethod
+    def _result(count, minimum, maximum, mean, stddev, median, percentiles, counts, edges):
+        # Valeurs calculées en centimes, rendues en chaînes comme les prix de l'API
+        def price(cents):
+            return f'{cents / 100:.2f}'
+
+        return {
+            'count': count,
+            'min': price(minimum),
+            'max': price(maximum),
+            'mean': price(mean),
+            'median': price(median),
+            'stddev': price(stddev),
+            'percentiles': {f'p{q:g}': price(value) for q, value in percentiles.items()},
+            'histogram': {
+                'edges': [price(edge) for edge in edges],
+                'counts': counts,
+            },
+        }
+
+    @staticmethod
+    def _empty(percentiles):
+        return {
+            'count': 0,
+            'min': None,
+            'max': None,
+            'mean': None,
+            'median': None,
+            'stddev': None,
+            'percentiles': {f'p{q:g}': None for q in percentiles},
+            'histogram': {'edges': [], 'counts': []},
+        }
+
+    @staticmethod
+    def parse_percentiles(value):
+        """
+        Lire ?percentiles=5,50,95
+
+        Raises:
+            ValueError: Valeur hors de [0, 100], illisible, ou plus de 20 valeurs
+        """
+        if not value:
+            return DEFAULT_PERCENTILES
+        try:
+            percentiles = tuple(float(part) for part in value.split(',') if part.strip())
+        except ValueError:
+            raise ValueError('percentiles must be a comma-separated list of numbers')
+        if not percentiles or len(percentiles) > 20 or not all(0 <= q <= 100 for q in percentiles):
+            raise ValueError('percentiles must list 1 to 20 values between 0 and 100')
+        return percentiles
@@ -0,0 +1,191 @@
+import math
+import threading
+import time
+from collections import namedtuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+RateLimitResult = namedtuple('RateLimitResult', ['allowed', 'limit', 'remaining', 'reset', 'retry_after'])
+
+
+class RateLimiter:
+    """
+    Limite par profil API en fenêtre glissante approchée : compteur de la fenêtre
+    courante + compteur de la précédente pondéré par la part encore couverte.
+    Une requête refusée est retirée du compteur : elle ne consomme pas de quota.
+    Les compteurs vivent dans le cache (API_RATE_LIMIT_CACHE_ALIAS) pour être
+    partagés entre workers : par défaut le cache fichier 'shared' (une machine), sinon
+    Redis ou Memcached ; checks.py refuse un cache propre à chaque processus.
+    """
+
+    @staticmethod
+    def get_cache():
+        return caches[getattr(settings, 'API_RATE_LIMIT_CACHE_ALIAS', 'shared')]
+
+    @staticmethod
+    def get_rule(user_profile):
+        """(requêtes, fenêtre en secondes) du rôle du profil, ou None si illimité"""
+        rules = getattr(settings, 'API_RATE_LIMITS', {})
+        role_name = user_profile.role.name if user_profile.role_id else None
+        return rules.get(role_name, rules.get('default'))
+
+    @staticmethod
+    def _keys(user_profile, window, now):
+        current = int(now // window)
+        prefix = f'rate_limit:{user_profile.pk}:{window}'
+        return f'{prefix}:{current}', f'{prefix}:{current - 1}'
+
+    @staticmethod
+    def _result(rule, count, previous, now):
+        limit, window = rule
+        elapsed = (now % window) / window
+        estimated = previous * (1 - elapsed) + count
+        reset = math.ceil(window - now % window)
+        allowed = estimated <= limit
+        return RateLimitResult(
+            allowed=allowed,
+            limit=limit,
+            remaining=max(0, math.floor(limit - estimated)),
+            reset=reset,
+            retry_after=None if allowed else max(1, reset),
+        )
+
+    @staticmethod
+    def _refund(cache, key, cost):
+        try:
+            cache.decr(key, cost)
+        except ValueError:
+            pass  # Entrée expirée ou évincée entre-temps
+
+    @staticmethod
+    async def _arefund(cache, key, cost):
+        try:
+            await cache.adecr(key, cost)
+        except ValueError:
+            pass
+
+    @staticmethod
+    def check(user_profile, cost=1):
+        """
+        Compter `cost` requêtes du profil (une par opération d'un lot /batch) ;
+        None si son rôle n'est pas limité
+        """
+        rule = RateLimiter.get_rule(user_profile)
+        if rule is None:
+            return None
+        cache = RateLimiter.get_cache()
+        now = time.time()
+        current_key, previous_key = RateLimiter._keys(user_profile, rule[1], now)
+        cache.add(current_key, 0, timeout=rule[1] * 2)
+        try:
+            count = cache.incr(current_key, cost)
+        except ValueError:
+            # Entrée évincée entre add et incr
+            cache.set(current_key, cost, timeout=rule[1] * 2)
+            count = cost
+        result = RateLimiter._result(rule, count, cache.get(previous_key, 0), now)
+        if not result.allowed:
+            RateLimiter._refund(cache, current_key, cost)
+        return result
+
+    @staticmethod
+    async def acheck(user_profile, cost=1):
+        rule = RateLimiter.get_rule(user_profile)
+        if rule is None:
+            return None
+        cache = RateLimiter.get_cache()
+        now = time.time()
+        current_key, previous_key = RateLimiter._keys(user_profile, rule[1], now)
+        await cache.aadd(current_key, 0, timeout=rule[1] * 2)
+        try:
+            count = await cache.aincr(current_key, cost)
+        except ValueError:
+            await cache.aset(current_key, cost, timeout=rule[1] * 2)
+            count = cost
+        result = RateLimiter._result(rule, count, await cache.aget(previous_key, 0), now)
+        if not result.allowed:
+            await RateLimiter._arefund(cache, current_key, cost)
+        return result
+
+    @staticmethod
+    def refund(user_profile, cost=1):
+        """Rendre `cost` requêtes comptées par check() puis refusées plus loin (lot /batch)"""
+        rule = RateLimiter.get_rule(user_profile)
+        if rule is not None:
+            current_key, _ = RateLimiter._keys(user_profile, rule[1], time.time())
+            RateLimiter._refund(RateLimiter.get_cache(), current_key, cost)
+
+    @staticmethod
+    def too_many_requests(result):
+        response = JsonResponse({'error': 'Rate limit exceeded', 'retry_after': result.retry_after}, status=429)
+        response['Retry-After'] = str(result.retry_after)
+        return RateLimiter.add_headers(response, result)
+
+    @staticmethod
+    def add_headers(response, result):
+        if result is not None:
+            response['X-RateLimit-Limit'] = str(result.limit)
+            response['X-RateLimit-Remaining'] = str(result.remaining)
+            response['X-RateLimit-Reset'] = str(result.reset)
+        return response
+
+
+class LoadSheddingMiddleware:
+    """
+    Refuser tout de suite (503 + Retry-After), avant authentification et accès à la base,
+    les requêtes au-delà de API_MAX_CONCURRENT_REQUESTS en cours dans ce processus.
+    Pour une réponse en streaming, la requête compte jusqu'au retour de la vue.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.max_concurrent = getattr(settings, 'API_MAX_CONCURRENT_REQUESTS', None)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not self.acquire():
+            return self.overloaded()
+        try:
+            return self.get_response(request)
+        finally:
+            self.release()
+
+    async def __acall__(self, request):
+        if not self.acquire():
+            return self.overloaded()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.release()
+
+    def acquire(self):
+        if not self.max_concurrent:
+            return True
+        with self._lock:
+            if self.in_flight >= self.max_concurrent:
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        if self.max_concurrent:
+            with self._lock:
+                self.in_flight -= 1
+
+    @staticmethod
+    def overloaded():
+        response = JsonResponse({'error': 'Server overloaded, retry later'}, status=503)
+        response['Retry-After'] = '1'
+        return response
@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+from .conditional_utils import get_catalog_version, in_atomic_batch
+
+
+class ResponseCacheStats:
+    """Compteurs du cache de réponses pour ce processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+        self.waits = 0
+        self.bytes_written = 0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        entries, resident_bytes = self.resident_size(get_response_cache())
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'rebuilds': self.rebuilds,
+                'stampede_waits': self.waits,
+                # Cumul depuis le démarrage du processus (ne baisse pas à l'éviction)
+                'bytes_written': self.bytes_written,
+                'avg_entry_bytes': round(self.bytes_written / self.rebuilds) if self.rebuilds else None,
+                # Contenu actuel du cache (tous processus confondus pour le backend fichiers)
+                'resident_entries': entries,
+                'resident_bytes': resident_bytes,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            }
+
+    @staticmethod
+    def resident_size(cache):
+        """
+        (entrées, octets) actuellement stockés par le cache de réponses, mesurés
+        dans le backend : les évictions (MAX_ENTRIES) et expirations y sont
+        donc prises en compte. (None, None) pour un backend non inspectable.
+        """
+        if isinstance(cache, LocMemCache):
+            # Valeurs stockées sérialisées (pickle) : leur longueur est la taille en mémoire du contenu
+            now = time.time()
+            with cache._lock:
+                sizes = [
+                    len(value) for key, value in cache._cache.items()
+                    if not key.endswith(':lock') and (cache._expire_info.get(key) or now + 1) > now
+                ]
+            return len(sizes), sum(sizes)
+        if isinstance(cache, FileBasedCache):
+            sizes = []
+            for path in cache._list_cache_files():
+                try:
+                    sizes.append(os.path.getsize(path))
+                except FileNotFoundError:  # supprimé entre-temps par un autre worker
+                    pass
+            return len(sizes), sum(sizes)
+        return None, None
+
+
+response_cache_stats = ResponseCacheStats()
+
+
+def get_response_cache():
+    return caches[getattr(settings, 'API_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def response_cache_key(request, view_name):
+    """
+    Clé : vue + version du catalogue + URL complète + utilisateur (la réponse
+    contient accessed_by). Une écriture incrémente la version, donc les
+    anciennes entrées ne sont plus jamais lues et expirent d'elles-mêmes.
+    """
+    version, _ = get_catalog_version(request)
+    username = getattr(request.user, 'username', '')
+    digest = hashlib.sha1(f'{request.get_full_path()}|{username}'.encode()).hexdigest()
+    return f'api_response:{view_name}:{version}:{digest}'
+
+
+def cache_catalog_response(view):
+    """
+    Mettre en cache les réponses 200 d'une vue de lecture du catalogue.
+    Anti-stampede : sur un défaut de cache, une seule requête (détentrice
+    d'un verrou posé par cache.add) reconstruit la réponse ; les autres
+    attendent son résultat jusqu'à API_RESPONSE_CACHE_LOCK_TIMEOUT secondes.
+    Les opérations d'un lot atomique ne lisent ni n'écrivent le cache.
+    """
+    if iscoroutinefunction(view):
+        return _async_cache_catalog_response(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or in_atomic_batch(request):
+            return view(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = response_cache_key(request, view.__name__)
+        cached = cache.get(key)
+        if cached is not None:
+            response_cache_stats.incr('hits')
+            return build_response(cached)
+        response_cache_stats.incr('misses')
+
+        lock_key = f'{key}:lock'
+        lock_timeout = getattr(settings, 'API_RESPONSE_CACHE_LOCK_TIMEOUT', 10)
+        has_lock = cache.add(lock_key, 1, timeout=lock_timeout)
+        if not has_lock:
+            response_cache_stats.incr('waits')
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.01)
+                cached = cache.get(key)
+                if cached is not None:
+                    return build_response(cached)
+            # Le détenteur du verrou a échoué ou est trop lent : on calcule nous-mêmes
+
+        try:
+            response = view(request, *args, **kwargs)
+            store_response(cache, key, response)
+            return response
+        finally:
+            if has_lock:
+                cache.delete(lock_key)
+    return wrapper
+
+
+def _async_cache_catalog_response(view):
+    """
+    Même logique pour une vue asynchrone. Les backends configurés (mémoire
+    locale, fichiers locaux) ne bloquent pas sur le réseau : ils sont appelés
+    directement, seule l'attente anti-stampede rend la main à la boucle.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or in_atomic_batch(request):
+            return await view(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = response_cache_key(request, view.__name__)
+        cached = cache.get(key)
+        if cached is not None:
+            response_cache_stats.incr('hits')
+            return build_response(cached)
+        response_cache_stats.incr('misses')
+
+        lock_key = f'{key}:lock'
+        lock_timeout = getattr(settings, 'API_RESPONSE_CACHE_LOCK_TIMEOUT', 10)
+        has_lock = cache.add(lock_key, 1, timeout=lock_timeout)
+        if not has_lock:
+            response_cache_stats.incr('waits')
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+                cached = cache.get(key)
+                if cached is not None:
+                    return build_response(cached)
+
+        try:
+            response = await view(request, *args, **kwargs)
+            store_response(cache, key, response)
+            return response
+        finally:
+            if has_lock:
+                cache.delete(lock_key)
+    return wrapper
+
+
+def store_response(cache, key, response):
+    if response.status_code == 200 and not response.streaming:
+        entry = (response.content, response['Content-Type'])
+        cache.set(key, entry, timeout=getattr(settings, 'API_RESPONSE_CACHE_TTL', 300))
+        response_cache_stats.incr('rebuilds')
+        response_cache_stats.incr('bytes_written', len(response.content))
+
+
+def build_response(entry):
+    content, content_type = entry
+    return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,117 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Product
+from .pagination_utils import CursorPaginationHelper
+from .serializers import PRODUCT_FIELDS, product_serializer
+
+FTS_TABLE = 'app_apiTP1_JTR_product_fts'
+SEARCH_ORDERING = ('rank', 'id')
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+class ProductSearch:
+    """
+    Recherche plein texte sur Product.name / Product.description via la
+    table FTS5 créée par la migration 0004 (tenue à jour par triggers).
+    Les résultats sont triés par pertinence (bm25) puis par id et paginés
+    par curseur sur (rank, id). Hors SQLite, repli sur icontains.
+    """
+
+    @staticmethod
+    def build_match_query(query, prefix=True):
+        """
+        Transformer la saisie utilisateur en requête MATCH FTS5 sûre : chaque
+        mot est cité (pas d'opérateurs injectés) et, en mode préfixe, suffixé par *
+
+        Raises:
+            ValueError: Si la requête ne contient aucun mot
+        """
+        terms = TERM_PATTERN.findall(query or '')
+        if not terms:
+            raise ValueError('Search query must contain at least one word')
+        suffix = '*' if prefix else ''
+        return ' '.join(f'"{term}"{suffix}' for term in terms)
+
+    @staticmethod
+    def search(query, cursor=None, page_size=None, prefix=True, fields=PRODUCT_FIELDS):
+        """
+        Rechercher des produits (seuls les champs fields sont lus et renvoyés, plus rank)
+
+        Returns:
+            dict: {'items': [...], 'pagination': {...}} comme CursorPaginationHelper
+
+        Raises:
+            ValueError: Si la requête, le curseur ou la taille de page est invalide
+        """
+        page_size = CursorPaginationHelper.clean_page_size(page_size)
+        match_query = ProductSearch.build_match_query(query, prefix=prefix)
+
+        if connection.vendor != 'sqlite':
+            return ProductSearch._search_icontains(query, cursor, page_size, fields)
+
+        sql = f"""
+            SELECT rowid, bm25({FTS_TABLE}) AS rank
+            FROM {FTS_TABLE}
+            WHERE {FTS_TABLE} MATCH %s
+        """
+        params = [match_query]
+        if cursor:
+            last_rank, last_id = CursorPaginationHelper.decode_cursor(cursor, SEARCH_ORDERING)
+            sql = f"SELECT rowid, rank FROM ({sql}) WHERE rank > %s OR (rank = %s AND rowid > %s)"
+            params += [last_rank, last_rank, last_id]
+        sql += " ORDER BY rank, rowid LIMIT %s"
+        params.append(page_size + 1)
+
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            matches = db_cursor.fetchall()
+
+        has_next = len(matches) > page_size
+        matches = matches[:page_size]
+        # id toujours lu pour rattacher les lignes aux résultats FTS, retiré ensuite s'il n'est pas demandé
+        serializer = product_serializer(('id', *(name for name in fields if name != 'id')))
+        rows = {
+            row['id']: row for row in serializer.rows(
+                serializer.values_list(Product.objects.filter(id__in=[product_id for product_id, _ in matches]))
+            )
+        }
+
+        items = []
+        for product_id, rank in matches:
+            row = rows.get(product_id)
+            if row is not None:
+                if 'id' not in fields:
+                    del row['id']
+                row['rank'] = rank
+                items.append(row)
+
+        last = {'rank': matches[-1][1], 'id': matches[-1][0]} if matches else None
+        return {
+            'items': items,
+            'pagination': {
+                'items_per_page': page_size,
+                'has_next': has_next,
+                'next_cursor': CursorPaginationHelper.encode_cursor(SEARCH_ORDERING, last) if has_next else None,
+            }
+        }
+
+    @staticmethod
+    def _search_icontains(query, cursor, page_size, fields):
+        terms = TERM_PATTERN.findall(query)
+        queryset = Product.objects.all()
+        for term in terms:
+            queryset = queryset.filter(Q(name__icontains=term) | Q(description__icontains=term))
+        return CursorPaginationHelper.paginate_queryset(queryset, cursor=cursor, page_size=page_size,
+                                                        fields=fields)
+
+    @staticmethod
+    def rebuild_index():
+        """Reconstruire entièrement l'index FTS5 depuis la table Product"""
+        if connection.vendor != 'sqlite':
+            return
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
@@ -0,0 +1,118 @@
+import json
+from decimal import Decimal
+from functools import lru_cache
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.http import HttpResponse
+
+from .models import Product
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel : repli sur le module json standard
+    orjson = None
+
+PRODUCT_FIELDS = ('id', 'name', 'price', 'description', 'created_at', 'updated_at')
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _isoformat(value):
+    return value.isoformat()
+
+
+def dumps(data):
+    """Encoder en JSON (bytes) avec orjson s'il est installé, sinon avec la bibliothèque standard"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default)
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+def api_response(data, status=200):
+    """Équivalent de JsonResponse passant par dumps()"""
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+class RowSerializer:
+    """
+    Encodeur de lignes préparé pour un modèle et une liste de champs :
+    transforme un tuple de values_list() en dict prêt pour dumps(), avec
+    les Decimal en chaîne et les dates en ISO 8601 (laissées telles quelles
+    si orjson les encode lui-même), sans instancier de modèle.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = tuple(fields)
+        self.row = self._compile()
+
+    def _compile(self):
+        # Convertisseurs des seuls champs qui en ont besoin, résolus une fois pour toutes
+        converters = []
+        for name in self.fields:
+            field = self.model._meta.get_field(name)
+            if isinstance(field, models.DecimalField):
+                converters.append((name, str))
+            elif isinstance(field, (models.DateTimeField, models.DateField)) and orjson is None:
+                # orjson encode nativement les dates au même format que isoformat()
+                converters.append((name, _isoformat))
+        names = self.fields
+
+        if not converters:
+            return lambda values: dict(zip(names, values))
+
+        def row(values):
+            data = dict(zip(names, values))
+            for name, convert in converters:
+                value = data[name]
+                if value is not None:
+                    data[name] = convert(value)
+            return data
+        return row
+
+    def values_list(self, queryset):
+        return queryset.values_list(*self.fields)
+
+    def rows(self, tuples):
+        row = self.row
+        return [row(values) for values in tuples]
+
+    def instance(self, obj):
+        """Encoder une instance déjà chargée (ex: après create/save)"""
+        return self.row(tuple(getattr(obj, name) for name in self.fields))
+
+
+@lru_cache(maxsize=64)
+def get_row_serializer(model, fields):
+    """RowSerializer mis en cache par (modèle, champs) : les convertisseurs ne sont résolus qu'une fois"""
+    return RowSerializer(model, tuple(fields))
+
+
+def product_serializer(fields=PRODUCT_FIELDS):
+    return get_row_serializer(Product, tuple(fields))
+
+
+def parse_fields(value, allowed=PRODUCT_FIELDS, default=None):
+    """
+    Lire un paramètre ?fields=id,name,price (champs creux)
+
+    Returns:
+        tuple: Champs demandés, dans l'ordre de allowed (default, ou allowed entier, si value est vide)
+
+    Raises:
+        ValueError: Si un champ ne fait pas partie de allowed
+    """
+    if not value:
+        return tuple(default or allowed)
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}")
+    if not requested:
+        return tuple(default or allowed)
+    return tuple(name for name in allowed if name in requested)
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .auth_cache import ApiKeyCache, api_key_cache
+from .aggregates import CatalogAggregates
+from .change_log import ProductChangeLog
+from .metrics import install_query_timer
+from .models import Permission, Product, Role, UserProfile
+
+
+@receiver(connection_created)
+def install_metrics_query_timer(sender, connection, **kwargs):
+    """Compter les requêtes SQL de chaque connexion, quel que soit son thread (metrics.py)"""
+    install_query_timer(connection)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Appliquer settings.SQLITE_PRAGMAS à chaque nouvelle connexion SQLite"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if connection.alias in getattr(settings, 'DATABASE_READ_REPLICAS', ()):
+        # Réplica en lecture seule : changer le mode de journal serait une écriture
+        pragmas = {name: value for name, value in pragmas.items() if name != 'journal_mode'}
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def _bump_api_key_generation(using):
+    # Sur SQLite, les triggers des migrations 0009 et 0010 incrémentent déjà le compteur
+    if connections[using].vendor != 'sqlite':
+        ApiKeyCache.bump_generation()
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_api_key(sender, instance, using, **kwargs):
+    """Clé régénérée, is_api_active modifié ou profil supprimé : oublier l'entrée"""
+    api_key_cache.invalidate_profile(instance.pk)
+    _bump_api_key_generation(using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_api_key(sender, instance, using, **kwargs):
+    api_key_cache.invalidate_user(instance.pk)
+    _bump_api_key_generation(using)
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_role_api_keys(sender, instance, using, **kwargs):
+    """Les profils en cache embarquent leur rôle : un rôle modifié doit être rechargé"""
+    api_key_cache.invalidate_role(instance.pk)
+    _bump_api_key_generation(using)
+
+
+# RolePermissionCache se recharge quand la génération partagée change : l'incrémenter dans
+# la transaction de l'écriture suffit à prévenir tous les processus, une fois validée
+
+
+@receiver(m2m_changed, sender=Role.permissions.through)
+def invalidate_role_permissions(sender, action, using, **kwargs):
+    if action.startswith('post_'):
+        _bump_api_key_generation(using)
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_permission_codes(sender, instance, using, **kwargs):
+    """Un code renommé ou supprimé peut toucher tous les rôles"""
+    _bump_api_key_generation(using)
+
+
+@receiver(post_init, sender=Product)
+def remember_product_price(sender, instance, **kwargs):
+    # Prix tel que chargé, pour savoir en post_save s'il a changé (None si différé)
+    instance._aggregate_price = instance.__dict__.get('price')
+
+
+@receiver(post_save, sender=Product)
+def update_catalog_aggregates(sender, instance, created, **kwargs):
+    if created:
+        CatalogAggregates.apply(added=[(instance.pk, instance.price)])
+    elif instance._aggregate_price is None:
+        CatalogAggregates.rebuild()
+    elif instance._aggregate_price != instance.price:
+        CatalogAggregates.apply(added=[(instance.pk, instance.price)],
+                                removed=[(instance.pk, instance._aggregate_price)])
+    else:
+        CatalogAggregates.apply()
+    instance._aggregate_price = instance.price
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_catalog_aggregates(sender, instance, **kwargs):
+    if instance.__dict__.get('price') is None:
+        CatalogAggregates.rebuild()
+    else:
+        CatalogAggregates.apply(removed=[(instance.pk, instance.price)])
+
+
+@receiver(post_init, sender=Product)
+def remember_logged_values(sender, instance, **kwargs):
+    ProductChangeLog.remember_values(instance)
+
+
+@receiver(post_save, sender=Product)
+def log_product_save(sender, instance, created, **kwargs):
+    ProductChangeLog.record_save(instance, created)
+
+
+@receiver(post_delete, sender=Product)
+def log_product_delete(sender, instance, **kwargs):
+    ProductChangeLog.record_delete(instance)
@@ -0,0 +1,116 @@
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+
+from .serializers import dumps, get_row_serializer
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class StreamingExportHelper:
+    """
+    Export d'un queryset ligne par ligne : le curseur serveur est lu par
+    paquets (QuerySet.iterator) et chaque ligne est encodée à la volée, donc
+    la mémoire du worker reste constante quelle que soit la taille de la table.
+    """
+
+    @staticmethod
+    def iter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+        """Itérer sur les lignes encodables (voir serializers.RowSerializer) sans tout charger"""
+        row = get_row_serializer(queryset.model, tuple(fields)).row
+        for values in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+            yield row(values)
+
+    @staticmethod
+    async def aiter_rows(queryset, fields, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Variante asynchrone de iter_rows : un paquet de chunk_size lignes par
+        aller-retour vers le thread de la connexion. (QuerySet.aiterator() n'est
+        pas utilisable ici : avec values_list() il exécute la requête dans la boucle.)
+        """
+        row = get_row_serializer(queryset.model, tuple(fields)).row
+        iterator = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+        next_chunk = sync_to_async(lambda: list(islice(iterator, chunk_size)))
+        while True:
+            chunk = await next_chunk()
+            if not chunk:
+                break
+            for values in chunk:
+                yield row(values)
+
+    @staticmethod
+    async def aiter_ndjson(rows):
+        async for row in rows:
+            yield dumps(row) + b'\n'
+
+    @staticmethod
+    async def aiter_json_array(rows, key='products'):
+        yield b'{' + dumps(key) + b':['
+        separator = b''
+        async for row in rows:
+            yield separator + dumps(row)
+            separator = b','
+        yield b']}'
+
+    @staticmethod
+    def iter_ndjson(rows):
+        """Encoder chaque ligne en une ligne JSON terminée par un saut de ligne"""
+        for row in rows:
+            yield dumps(row) + b'\n'
+
+    @staticmethod
+    def iter_json_array(rows, key='products'):
+        """Encoder les lignes comme un objet {"<key>": [...]} valide, morceau par morceau"""
+        yield b'{' + dumps(key) + b':['
+        separator = b''
+        for row in rows:
+            yield separator + dumps(row)
+            separator = b','
+        yield b']}'
+
+    @staticmethod
+    def create_streaming_response(queryset, fields, export_format='ndjson', filename=None):
+        """
+        Créer une StreamingHttpResponse pour un export
+
+        Args:
+            queryset: Le queryset Django à exporter
+            fields: Champs à exporter, dans l'ordre
+            export_format: 'ndjson' ou 'json'
+            filename: Nom de fichier proposé au client (optionnel)
+
+        Raises:
+            ValueError: Si le format n'est pas supporté
+        """
+        rows = StreamingExportHelper.iter_rows(queryset, fields)
+        return StreamingExportHelper._build_response(rows, export_format, filename)
+
+    @staticmethod
+    def create_async_streaming_response(queryset, fields, export_format='ndjson', filename=None):
+        """
+        Variante pour les vues asynchrones : le contenu est un itérateur
+        asynchrone, consommé par le serveur ASGI sans bloquer la boucle
+
+        Raises:
+            ValueError: Si le format n'est pas supporté
+        """
+        rows = StreamingExportHelper.aiter_rows(queryset, fields)
+        return StreamingExportHelper._build_response(rows, export_format, filename)
+
+    @staticmethod
+    def _build_response(rows, export_format, filename):
+        is_async = hasattr(rows, '__aiter__')
+        if export_format == 'ndjson':
+            encode = StreamingExportHelper.aiter_ndjson if is_async else StreamingExportHelper.iter_ndjson
+            content_type = 'application/x-ndjson'
+        elif export_format == 'json':
+            encode = StreamingExportHelper.aiter_json_array if is_async else StreamingExportHelper.iter_json_array
+            content_type = 'application/json'
+        else:
+            raise ValueError(f'Unsupported export format: {export_format}')
+
+        response = StreamingHttpResponse(encode(rows), content_type=content_type)
+        if filename:
+            response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+        return response
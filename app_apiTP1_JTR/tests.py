@@ -1,3 +1,1129 @@
-from django.test import TestCase
+import base64
+import copy
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import serializers
+from .auth_cache import ApiKeyCache, RolePermissionCache, api_key_cache, role_permission_cache
+from .bulk_utils import ProductBulkIngest
+from .catalog_snapshot import CatalogSnapshot, snapshot_scheduler
+from .change_log import ProductChangeLog
+from .checks import check_rate_limit_cache
+from .db_routing import (
+    PrimaryReplicaRouter, ReplicaSnapshot, ReplicaStickiness, ReplicaStickinessMiddleware, use_primary,
+)
+from .filter_utils import FILTER_COLUMNS, PRODUCT_ORDERINGS, ProductFilterHelper
+from .import_jobs import FINISHED_STATUSES, ImportJobRunner
+from .init_permissions import init_permissions
+from .management.bench_utils import synthetic_values
+from .metrics import QueryTimer, metrics_registry
+from .models import ImportJob, Permission, Product, Role, UserProfile
+from .pagination_utils import CursorPaginationHelper
+from .price_analytics import PriceAnalytics
+from .rate_limit import LoadSheddingMiddleware, RateLimiter
+from .response_cache import ResponseCacheStats, get_response_cache
+from .serializers import PRODUCT_FIELDS, RowSerializer, dumps, product_serializer
+
+
+_shared_cache_settings = None
+
+
+def setUpModule():
+    # Le cache 'shared' est sur disque : un répertoire jetable pour ne pas hériter d'une exécution précédente
+    global _shared_cache_settings
+    shared = {**settings.CACHES['shared'], 'LOCATION': tempfile.mkdtemp(prefix='shared-cache-')}
+    _shared_cache_settings = override_settings(CACHES={**settings.CACHES, 'shared': shared})
+    _shared_cache_settings.enable()
+
+
+def tearDownModule():
+    location = settings.CACHES['shared']['LOCATION']
+    _shared_cache_settings.disable()
+    shutil.rmtree(location, ignore_errors=True)
+
+
+@contextmanager
+def sqlite_alias(test, alias, path, read_only=False):
+    """Alias de base supplémentaire sur un fichier SQLite (ex: réplica), autorisé le temps d'un test"""
+    settings_dict = copy.deepcopy(connections.settings['default'])
+    settings_dict.update(NAME=f'file:{path}?mode=ro' if read_only else path,
+                         OPTIONS={'uri': True} if read_only else {})
+    connections.settings[alias] = settings_dict
+    try:
+        with mock.patch.object(type(test), 'databases', test.databases | {alias}):
+            yield connections[alias]
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+
+
+class ApiTestCase(TestCase):
+    """Base : permissions par défaut et un utilisateur Admin authentifié par clé API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        init_permissions()
+        cls.admin = User.objects.create_user(username='admin')
+        UserProfile.objects.create(user=cls.admin, role=Role.objects.get(name='Admin'), api_key='admin-key')
+
+    def setUp(self):
+        # La version du catalogue repart de zéro dans chaque test : vider le cache de réponses
+        get_response_cache().clear()
+
+    def api_get(self, path, **params):
+        return self.client.get(f'/app_apiTP1_JTR/{path}', params, HTTP_X_API_KEY='admin-key')
+
+
+class CursorPaginationTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Product.objects.bulk_create([Product(name=f'Page {i}', price=i + 1) for i in range(7)])
+
+    def test_pages_follow_cursor_without_gaps_or_duplicates(self):
+        pages, cursor = [], None
+        while True:
+            params = {'page_size': 3, 'include_total': 'true'}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.api_get('get_allproducts/', **params).json()
+            pages.append([product['name'] for product in body['products']])
+            self.assertEqual(body['pagination']['total_items'], 7)
+            cursor = body['pagination']['next_cursor']
+            if not body['pagination']['has_next']:
+                self.assertIsNone(cursor)
+                break
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), [f'Page {i}' for i in range(7)])
+
+    def test_deleting_earlier_rows_does_not_shift_next_page(self):
+        first = self.api_get('get_allproducts/', page_size=3).json()
+        # Avec un OFFSET, une suppression en tête ferait sauter une ligne à la page suivante
+        Product.objects.filter(name='Page 0').delete()
+        second = self.api_get('get_allproducts/', page_size=3, cursor=first['pagination']['next_cursor']).json()
+        self.assertEqual([product['name'] for product in second['products']], ['Page 3', 'Page 4', 'Page 5'])
+
+    def test_invalid_cursor_and_page_size_are_rejected(self):
+        self.assertEqual(self.api_get('get_allproducts/', cursor='not-a-cursor').status_code, 400)
+        # Bien formés en base64/JSON, mais pas de la forme d'un curseur
+        for payload in ('{"v":5,"o":["id"]}', '{"v":[[1]],"o":["id"]}', '[1]', '{"v":[null],"o":["id"]}'):
+            cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+            self.assertEqual(self.api_get('get_allproducts/', cursor=cursor).status_code, 400, payload)
+        self.assertEqual(self.api_get('get_allproducts/', page_size='0').status_code, 400)
+
+
+class ApiKeyRevocationTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        user = User.objects.create_user(username='client')
+        cls.profile = UserProfile.objects.create(user=user, role=Role.objects.get(name='User'), api_key='client-key')
+
+    def setUp(self):
+        super().setUp()
+        api_key_cache.clear()
+
+    def client_get(self):
+        return self.client.get('/app_apiTP1_JTR/get_maxprice/', HTTP_X_API_KEY='client-key')
+
+    def test_queryset_update_revokes_cached_key(self):
+        self.client_get()
+        self.assertEqual(self.client_get().status_code, 404)  # authentifié (catalogue vide), servi par le cache
+        self.assertEqual(api_key_cache.stats()['hits'], 1)
+        # update() n'émet aucun signal : seul le compteur partagé invalide le cache
+        UserProfile.objects.filter(pk=self.profile.pk).update(is_api_active=False)
+        self.assertEqual(self.client_get().status_code, 401)
+
+    def test_save_in_another_process_revokes_cached_key(self):
+        other_process = ApiKeyCache()
+        generation = ApiKeyCache.current_generation()
+        self.assertIsNone(other_process.get('client-key', generation))
+        other_process.set('client-key', self.profile, generation)
+        self.assertIs(other_process.get('client-key', generation), self.profile)
+
+        # Les signaux ne vident que le cache du processus qui écrit
+        self.profile.is_api_active = False
+        self.profile.save()
+        self.assertIsNone(other_process.get('client-key', ApiKeyCache.current_generation()))
+
+
+class RolePermissionCacheTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        user = User.objects.create_user(username='editor')
+        cls.profile = UserProfile.objects.create(user=user, role=Role.objects.get(name='User'), api_key='editor-key')
+        cls.product = Product.objects.create(name='Chair', price='40.00')
+
+    def setUp(self):
+        super().setUp()
+        role_permission_cache.clear()
+
+    def put_price(self):
+        return self.client.put(f'/app_apiTP1_JTR/update_product/{self.product.pk}/', {'price': '45.00'},
+                               content_type='application/json', HTTP_X_API_KEY='editor-key')
+
+    def test_m2m_changes_rebuild_role_permissions(self):
+        role = Role.objects.get(name='User')
+        update = Permission.objects.get(code='update_products')
+        self.assertFalse(self.profile.has_permission('update_products'))  # cache chargé
+
+        role.permissions.add(update)
+        self.assertTrue(self.profile.has_permission('view_products', 'update_products'))
+        update.role_set.remove(role)  # côté inverse de la relation
+        self.assertFalse(self.profile.has_permission('update_products'))
+        role.permissions.clear()
+        self.assertFalse(self.profile.has_permission('view_products'))
+
+    def test_role_reassignment_applies_to_next_request(self):
+        self.assertEqual(self.put_price().status_code, 403)
+        self.profile.role = Role.objects.get(name='Manager')
+        self.profile.save()
+        self.assertEqual(self.put_price().status_code, 200)
+
+
+class RolePermissionGenerationTests(TransactionTestCase):
+    """Invalidation entre processus : les écritures doivent être réellement validées"""
+
+    def setUp(self):
+        init_permissions()
+        self.role = Role.objects.get(name='User')
+        self.update = Permission.objects.get(code='update_products')
+        self.other_process = RolePermissionCache()
+
+    def test_committed_change_reloads_other_process(self):
+        self.assertNotIn('update_products', self.other_process.get(self.role.pk))
+        self.role.permissions.add(self.update)
+        self.assertIn('update_products', self.other_process.get(self.role.pk))
+        self.update.code = 'edit_products'
+        self.update.save()
+        self.assertIn('edit_products', self.other_process.get(self.role.pk))
+
+    def test_rolled_back_change_is_not_cached(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.role.permissions.add(self.update)
+            self.assertIn('update_products', self.other_process.get(self.role.pk))
+            raise RuntimeError
+        # Une écriture validée sans rapport avec les permissions fait aussi avancer la génération
+        Role.objects.create(name='Auditor')
+        self.assertNotIn('update_products', self.other_process.get(self.role.pk))
+
+
+class StreamingExportTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Product.objects.bulk_create([Product(name=f'Export {i}', price=i + 1, description='a\nb') for i in range(3)])
+
+    def test_ndjson_has_one_object_per_line(self):
+        response = self.api_get('export_products/', fields='name,description')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.ndjson"')
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.endswith(b'\n'))
+        # Les sauts de ligne des valeurs sont échappés : une ligne = un produit
+        lines = body.decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [{'name': f'Export {i}', 'description': 'a\nb'} for i in range(3)])
+
+    def test_json_format_is_a_single_document(self):
+        response = self.api_get('export_products/', format='json', fields='price')
+        document = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(document, {'products': [{'price': '1.00'}, {'price': '2.00'}, {'price': '3.00'}]})
+        self.assertEqual(self.api_get('export_products/', format='xml').status_code, 400)
+
+
+class BulkIngestEndpointTests(ApiTestCase):
+
+    def bulk_post(self, body, content_type='application/json'):
+        return self.client.post('/app_apiTP1_JTR/bulk_products/', body, content_type=content_type,
+                                HTTP_X_API_KEY='admin-key')
+
+    def test_body_above_django_upload_limit_is_ingested(self):
+        rows = [{'name': f'Bulk {i}', 'price': '9.99', 'description': 'x' * 1000} for i in range(3000)]
+        body = json.dumps(rows).encode()
+        self.assertGreater(len(body), settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+        response = self.bulk_post(body)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 3000)
+        self.assertEqual(Product.objects.count(), 3000)
+
+    @override_settings(BULK_INGEST_MAX_BYTES=1000)
+    def test_body_above_ingest_limit_is_rejected(self):
+        response = self.bulk_post(json.dumps([{'name': 'Big', 'price': '1.00', 'description': 'x' * 1000}]))
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Product.objects.exists())
+
+    @override_settings(BULK_INGEST_MAX_ROWS=2)
+    def test_row_limit_and_ndjson_errors(self):
+        lines = '{"name": "A", "price": "1.00"}\n{oops\n{"name": "B", "price": "-1"}\n'
+        response = self.bulk_post(lines, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Maximum 2 products', response.json()['error'])
+
+        response = self.bulk_post(lines.replace('{oops\n', ''), content_type='application/x-ndjson').json()
+        self.assertEqual((response['created'], [error['row'] for error in response['errors']]), (1, [2]))
+
+
+class BulkUpdateEndpointTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cheap = Product.objects.create(name='Cheap', price='10.00')
+        cls.dear = Product.objects.create(name='Dear', price='90000000.00')
+
+    def patch(self, data):
+        return self.client.patch('/app_apiTP1_JTR/bulk_update_products/', data, content_type='application/json',
+                                 HTTP_X_API_KEY='admin-key')
+
+    def prices(self):
+        return list(Product.objects.order_by('id').values_list('price', flat=True))
+
+    def test_entries_are_validated_per_row(self):
+        response = self.patch({'products': [
+            {'id': self.cheap.pk, 'price': '12.50'},
+            {'id': self.dear.pk, 'price': '-1'},
+            {'id': 999999, 'name': 'Ghost'},
+        ]}).json()
+        self.assertEqual((response['updated'], response['missing_ids']), (1, [999999]))
+        self.assertEqual([error['row'] for error in response['errors']], [2])
+        self.assertEqual([str(price) for price in self.prices()], ['12.50', '90000000.00'])
+
+    def test_price_change_applies_to_filtered_products(self):
+        response = self.patch({'price_change': {'filter': {'price_lt': '100'}, 'percent': 5}})
+        self.assertEqual(response.json()['price_change_updated'], 1)
+        self.assertEqual([str(price) for price in self.prices()], ['10.50', '90000000.00'])
+        self.assertEqual(self.api_get('get_price_stats/').json()['stats']['min_price'], '10.50')
+
+    def test_price_change_out_of_bounds_is_rejected(self):
+        for price_change in (
+            {'filter': {'ids': [self.cheap.pk]}, 'delta': -50},
+            {'filter': {'ids': [self.cheap.pk]}, 'percent': -100},
+            {'filter': {'price_gt': '1'}, 'percent': 20},  # dépasse max_digits pour le plus cher
+            {'filter': {'price_gt': '1'}, 'delta': 'NaN'},
+        ):
+            response = self.patch({'price_change': price_change})
+            self.assertEqual(response.status_code, 400, price_change)
+        self.assertEqual([str(price) for price in self.prices()], ['10.00', '90000000.00'])
+
+    def test_invalid_price_change_rolls_back_product_updates(self):
+        response = self.patch({
+            'products': [{'id': self.cheap.pk, 'price': '12.50'}],
+            'price_change': {'filter': {'ids': [self.cheap.pk]}, 'percent': 'abc'},
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([str(price) for price in self.prices()], ['10.00', '90000000.00'])
+
+
+class CatalogAggregateTests(ApiTestCase):
+
+    def stats(self):
+        return self.api_get('get_price_stats/').json()['stats']
+
+    def assert_stats(self, count, min_price, max_price, avg_price):
+        stats = self.stats()
+        self.assertEqual((stats['count'], stats['min_price'], stats['max_price'], stats['avg_price']),
+                         (count, min_price, max_price, avg_price))
+
+    def test_aggregates_follow_create_update_delete(self):
+        self.assert_stats(0, None, None, None)
+        low = Product.objects.create(name='Low', price='10.00')
+        high = Product.objects.create(name='High', price='30.00')
+        Product.objects.create(name='Mid', price='20.00')
+        self.assert_stats(3, '10.00', '30.00', '20.00')
+        version = self.stats()['version']
+
+        # Le minimum remonte : l'extrême est relu par l'index
+        low.price = '25.00'
+        low.save()
+        self.assert_stats(3, '20.00', '30.00', '25.00')
+        high.delete()
+        self.assert_stats(2, '20.00', '25.00', '22.50')
+        self.assertEqual(self.stats()['version'], version + 2)
+
+        response = self.api_get('get_maxprice/').json()
+        self.assertEqual((response['product']['name'], response['product']['price']), ('Low', '25.00'))
+
+
+class SeedCatalogTests(ApiTestCase):
+
+    def seed(self, products, **options):
+        call_command('seed_catalog', products=products, users=0, stdout=io.StringIO(), **options)
+
+    def test_samples_do_not_shift_synthetic_numbering(self):
+        self.seed(3, samples=True)
+        self.seed(5)
+        names = set(Product.objects.values_list('name', flat=True))
+        self.assertEqual(len(names), 20)
+        self.assertTrue({synthetic_values(index)[0] for index in range(5)} <= names)
+
+    def test_aggregates_rebuilt_after_bulk_inserts(self):
+        self.seed(4)
+        stats = self.api_get('get_price_stats/').json()['stats']
+        self.assertEqual(stats['count'], 4)
+
+        # Rien de synthétique à insérer : les produits de démonstration comptent quand même
+        get_response_cache().clear()
+        self.seed(4, samples=True)
+        stats = self.api_get('get_price_stats/').json()['stats']
+        self.assertEqual((stats['count'], stats['max_price']), (19, '52999.99'))
+
+
+class ProductSearchTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor != 'sqlite':
+            self.skipTest('The FTS5 index only exists on SQLite')
+        self.lamp = Product.objects.create(name='Desk lamp', price='30.00', description='Brass finish')
+        Product.objects.create(name='Floor lamp', price='60.00', description='Tall')
+
+    def search(self, q, **params):
+        return [product['name'] for product in self.api_get('search_products/', q=q, **params).json()['products']]
+
+    def test_prefix_queries(self):
+        self.assertEqual(sorted(self.search('lam')), ['Desk lamp', 'Floor lamp'])
+        self.assertEqual(self.search('lam', prefix='false'), [])
+        self.assertEqual(self.search('bras'), ['Desk lamp'])
+        self.assertEqual(self.api_get('search_products/', q='"*"').status_code, 400)
+
+    def test_index_follows_update_and_delete(self):
+        self.lamp.name = 'Desk light'
+        self.lamp.save()
+        self.assertEqual(self.search('lamp'), ['Floor lamp'])
+        self.assertEqual(self.search('light'), ['Desk light'])
+
+        # update() et delete() ensemblistes passent aussi par les triggers
+        Product.objects.filter(pk=self.lamp.pk).update(description='Chrome finish')
+        self.assertEqual(self.search('brass'), [])
+        self.assertEqual(self.search('chrome'), ['Desk light'])
+        Product.objects.filter(name='Floor lamp').delete()
+        self.assertEqual(self.search('lamp'), [])
+
+
+class ProductListingFilterTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Product.objects.bulk_create([Product(name=f'Product {i}', price=i * 10 + 5) for i in range(10)])
+        old = timezone.now() - timedelta(days=30)
+        Product.objects.filter(price__lt=50).update(created_at=old, updated_at=old)
+
+    def test_price_band(self):
+        response = self.api_get('get_allproducts/', price_min='20', price_max='60')
+        prices = [product['price'] for product in response.json()['products']]
+        self.assertEqual(prices, ['25.00', '35.00', '45.00', '55.00'])
+
+    def test_updated_since(self):
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.api_get('get_allproducts/', updated_since=since)
+        self.assertEqual(len(response.json()['products']), 5)
+
+    def test_created_between(self):
+        start = (timezone.now() - timedelta(days=40)).date().isoformat()
+        end = (timezone.now() - timedelta(days=20)).date().isoformat()
+        response = self.api_get('get_allproducts/', created_between=f'{start},{end}')
+        self.assertEqual(len(response.json()['products']), 5)
+
+    def test_descending_price_pages_follow_cursor(self):
+        first = self.api_get('get_allproducts/', ordering='-price', page_size=4).json()
+        second = self.api_get('get_allproducts/', ordering='-price', page_size=4,
+                              cursor=first['pagination']['next_cursor']).json()
+        prices = [product['price'] for product in first['products'] + second['products']]
+        self.assertEqual(prices, ['95.00', '85.00', '75.00', '65.00', '55.00', '45.00', '35.00', '25.00'])
+
+    def test_cursor_from_other_ordering_is_rejected(self):
+        first = self.api_get('get_allproducts/', ordering='price', page_size=2).json()
+        response = self.api_get('get_allproducts/', ordering='-price', cursor=first['pagination']['next_cursor'])
+        self.assertEqual(response.status_code, 400)
+
+    def test_unknown_ordering_is_rejected(self):
+        response = self.api_get('get_allproducts/', ordering='description')
+        self.assertEqual(response.status_code, 400)
+
+    def test_sparse_fields_follow_cursor(self):
+        first = self.api_get('get_allproducts/', ordering='-price', page_size=3, fields='name').json()
+        second = self.api_get('get_allproducts/', ordering='-price', page_size=3, fields='name',
+                              cursor=first['pagination']['next_cursor']).json()
+        self.assertEqual(first['products'][0], {'name': 'Product 9'})
+        self.assertEqual(second['products'][0], {'name': 'Product 6'})
+
+    def test_unknown_field_is_rejected(self):
+        response = self.api_get('get_allproducts/', fields='id,password')
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(ApiTestCase):
+
+    def test_etag_gives_304_until_next_write(self):
+        Product.objects.create(name='Stool', price='15.00')
+        etag = self.api_get('get_maxprice/')['ETag']
+        response = self.client.get('/app_apiTP1_JTR/get_maxprice/', HTTP_X_API_KEY='admin-key',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.content), (304, b''))
+        self.assertNotEqual(self.api_get('get_allproducts/')['ETag'], etag)  # une ETag par URL
+
+        Product.objects.create(name='Bench', price='25.00')
+        response = self.client.get('/app_apiTP1_JTR/get_maxprice/', HTTP_X_API_KEY='admin-key',
+                                   HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['product']['name'], 'Bench')
+
+    def test_if_modified_since_alone_never_hides_a_write(self):
+        Product.objects.create(name='Stool', price='15.00')
+        response = self.api_get('get_allproducts/')
+        self.assertNotIn('Last-Modified', response)
+        Product.objects.create(name='Bench', price='25.00')  # même seconde
+        response = self.client.get('/app_apiTP1_JTR/get_allproducts/', HTTP_X_API_KEY='admin-key',
+                                   HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['products']), 2)
+
+
+class RowSerializerTests(ApiTestCase):
+
+    def test_row_shape_is_the_same_with_and_without_orjson(self):
+        product = Product.objects.create(name='Vase', price='19.90', description=None)
+        expected = {
+            'id': product.pk, 'name': 'Vase', 'price': '19.90', 'description': None,
+            'created_at': product.created_at.isoformat(), 'updated_at': product.updated_at.isoformat(),
+        }
+        row = Product.objects.values_list(*PRODUCT_FIELDS).get()
+        self.assertEqual(json.loads(dumps(product_serializer().row(row))), expected)
+        with mock.patch.object(serializers, 'orjson', None):
+            fallback = RowSerializer(Product, PRODUCT_FIELDS)
+            self.assertEqual(list(fallback.instance(product)), list(PRODUCT_FIELDS))
+            self.assertEqual(json.loads(dumps(fallback.instance(product))), expected)
+
+        body = self.api_get('get_maxprice/', fields='price,name').json()
+        self.assertEqual(body['product'], {'name': 'Vase', 'price': '19.90'})
+
+
+class AsyncEndpointTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Product.objects.bulk_create([Product(name=f'Async {i}', price=i + 1) for i in range(3)])
+        user = User.objects.create_user(username='guest')
+        UserProfile.objects.create(user=user, role=Role.objects.create(name='Guest'), api_key='guest-key')
+
+    async def aget(self, path, api_key='admin-key', **params):
+        headers = {'X-API-Key': api_key} if api_key else {}
+        return await self.async_client.get(f'/app_apiTP1_JTR/async/{path}', params, headers=headers)
+
+    async def test_listing_and_max_price(self):
+        first = (await self.aget('get_allproducts/', page_size=2)).json()
+        second = (await self.aget('get_allproducts/', page_size=2, cursor=first['pagination']['next_cursor'])).json()
+        names = [product['name'] for product in first['products'] + second['products']]
+        self.assertEqual(names, ['Async 0', 'Async 1', 'Async 2'])
+
+        response = await self.aget('get_maxprice/', fields='name')
+        self.assertEqual(response.json()['product'], {'name': 'Async 2'})
+        not_modified = await self.async_client.get(
+            '/app_apiTP1_JTR/async/get_maxprice/', {'fields': 'name'},
+            headers={'X-API-Key': 'admin-key', 'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    async def test_export_streams_ndjson(self):
+        response = await self.aget('export_products/', fields='price')
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(body, b'{"price":"1.00"}\n{"price":"2.00"}\n{"price":"3.00"}\n')
+
+    async def test_queries_are_counted_under_asgi(self):
+        # Les requêtes SQL s'exécutent dans le thread de sync_to_async, pas dans celui de la boucle
+        for path in ('/app_apiTP1_JTR/async/get_maxprice/', '/app_apiTP1_JTR/get_maxprice/'):
+            with mock.patch.object(metrics_registry, 'observe_request') as observe:
+                await self.async_client.get(path, headers={'X-API-Key': 'admin-key'})
+            view, method, status, duration, db_queries, db_time, size = observe.call_args.args
+            self.assertEqual(status, 200, path)
+            self.assertGreater(db_queries, 0, path)
+
+    async def test_authentication_and_permission_errors(self):
+        for path in ('get_allproducts/', 'get_maxprice/', 'export_products/'):
+            self.assertEqual((await self.aget(path, api_key=None)).status_code, 401, path)
+            self.assertEqual((await self.aget(path, api_key='wrong-key')).status_code, 401, path)
+            self.assertEqual((await self.aget(path, api_key='guest-key')).status_code, 403, path)
+
+
+class ResponseCacheTests(ApiTestCase):
+
+    def test_resident_size_drops_on_eviction(self):
+        Product.objects.create(name='Stool', price='15.00')
+        self.api_get('get_allproducts/')
+        self.api_get('get_allproducts/')
+        stats = self.client.get('/app_apiTP1_JTR/admin/cache_stats/', HTTP_X_API_KEY='admin-key').json()
+        self.assertEqual(stats['response_cache']['resident_entries'], 1)
+        self.assertGreater(stats['response_cache']['resident_bytes'], 0)
+
+        small = LocMemCache('resident-size-test', {'OPTIONS': {'MAX_ENTRIES': 2, 'CULL_FREQUENCY': 2}})
+        self.addCleanup(small.clear)
+        for index in range(5):
+            small.set(f'entry-{index}', b'x' * 1000)
+        entries, resident_bytes = ResponseCacheStats.resident_size(small)
+        self.assertLessEqual(entries, 2)
+        self.assertLess(resident_bytes, 3000)
+        small.clear()
+        self.assertEqual(ResponseCacheStats.resident_size(small), (0, 0))
+
+
+class ProductListingQueryPlanTests(TestCase):
+    """Chaque combinaison filtre/tri autorisée doit être servie par un index, sans tri ni scan complet"""
+
+    FILTERS = {
+        'price_band': {'price_min': '10', 'price_max': '100'},
+        'updated_since': {'updated_since': '2025-01-01T00:00:00'},
+        'created_between': {'created_between': '2025-01-01,2025-12-31'},
+    }
+    CURSOR_ROW = {'id': 1, 'price': '10.00', 'created_at': '2025-06-01T00:00:00Z', 'updated_at': '2025-06-01T00:00:00Z'}
+
+    def supported_combinations(self):
+        for ordering_key in PRODUCT_ORDERINGS:
+            yield 'none', {}, ordering_key
+        for filter_name, params in self.FILTERS.items():
+            column = FILTER_COLUMNS[next(iter(params))]
+            for ordering_key in (column, f'-{column}'):
+                yield filter_name, params, ordering_key
+
+    def assert_index_plan(self, queryset, label, require_search, allow_pk_scan=False):
+        plan = queryset.explain()
+        self.assertNotIn('TEMP B-TREE', plan, f'{label}: sort without index\n{plan}')
+        if require_search:
+            self.assertIn('SEARCH', plan, f'{label}: no index range search\n{plan}')
+        # Un SCAN nu n'est acceptable que pour lire la table dans l'ordre de sa clé primaire, sans filtre
+        if not allow_pk_scan:
+            for line in plan.splitlines():
+                self.assertFalse('SCAN' in line and 'USING' not in line, f'{label}: full scan\n{plan}')
+
+    def test_supported_combinations_use_an_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite')
+
+        for filter_name, params, ordering_key in self.supported_combinations():
+            ordering = ProductFilterHelper.get_ordering({**params, 'ordering': ordering_key})
+            queryset = ProductFilterHelper.filter_queryset(Product.objects.all(), params).order_by(*ordering)
+            label = f'{filter_name} / {ordering_key}'
+            self.assert_index_plan(queryset[:100], label, require_search=bool(params),
+                                   allow_pk_scan=not params and ordering in (('id',), ('-id',)))
+
+            values = CursorPaginationHelper.decode_cursor(
+                CursorPaginationHelper.encode_cursor(ordering, self.CURSOR_ROW), ordering
+            )
+            page = queryset.filter(CursorPaginationHelper.keyset_filter(ordering, values))
+            self.assert_index_plan(page[:100], f'{label} / cursor', require_search=True)
+
+    def test_ordering_on_unfiltered_column_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ProductFilterHelper.get_ordering({'price_min': '10', 'ordering': 'updated_at'})
+
+    def test_default_ordering_follows_filter(self):
+        self.assertEqual(ProductFilterHelper.get_ordering({'updated_since': '2025-01-01'}), ('updated_at', 'id'))
+
+
+class MetricsEndpointTests(ApiTestCase):
+
+    def test_requires_api_key(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+
+    def test_exposes_view_latency_and_status(self):
+        self.api_get('get_allproducts/')
+        body = self.client.get('/metrics', HTTP_X_API_KEY='admin-key').content.decode()
+        self.assertIn('api_request_duration_seconds_bucket{view="get_allproducts",le="+Inf"}', body)
+        self.assertIn('api_requests_total{view="get_allproducts",method="GET",status="200"}', body)
+        self.assertIn('api_db_queries_total{view="get_allproducts"}', body)
+
+    def test_queries_on_every_alias_are_timed(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('The extra alias is an SQLite file')
+        with tempfile.TemporaryDirectory() as directory, \
+                sqlite_alias(self, 'metrics_replica', os.path.join(directory, 'replica.sqlite3')) as replica:
+            replica.ensure_connection()  # PRAGMA de connexion hors mesure
+            timer = QueryTimer()
+            with timer.activate():
+                with replica.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                Product.objects.exists()
+        self.assertEqual(timer.count, 2)
+
+    def test_files_of_exited_workers_are_pruned(self):
+        exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+        exited.wait()
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            snapshot = json.dumps({'counters': [['api_requests_total', [['view', 'old']], 1]], 'histograms': []})
+            for pid in (exited.pid, os.getppid()):
+                Path(directory, f'{pid}.json').write_text(snapshot)
+            counters, _ = metrics_registry.collect()
+            self.assertEqual(counters[('api_requests_total', (('view', 'old'),))], 1)
+            self.assertEqual(sorted(os.listdir(directory)), [f'{os.getppid()}.json'])
+
+
+@override_settings(DATABASE_READ_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaRoutingTests(TestCase):
+
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        caches['shared'].clear()
+
+    def route_read_during(self, method, api_key='key-a'):
+        """Alias choisi pour une lecture pendant une requête traversant le middleware"""
+        routed = []
+
+        def view(request):
+            routed.append(self.router.db_for_read(Product))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method.lower())('/', HTTP_X_API_KEY=api_key)
+        ReplicaStickinessMiddleware(view)(request)
+        return routed[0]
+
+    def test_reads_use_replicas_and_writes_use_primary(self):
+        with use_primary():
+            self.assertEqual(self.router.db_for_read(Product), 'default')
+        self.assertIn(self.route_read_during('GET'), ('replica_1', 'replica_2'))
+        self.assertEqual(self.router.db_for_write(Product), 'default')
+        self.assertFalse(self.router.allow_migrate('replica_1', 'app_apiTP1_JTR'))
+
+    def test_client_reads_its_writes_from_primary(self):
+        self.assertEqual(self.route_read_during('PUT'), 'default')
+        self.assertEqual(self.route_read_during('GET'), 'default')
+        self.assertNotEqual(self.route_read_during('GET', api_key='key-b'), 'default')
+
+    def test_one_replica_serves_all_reads_of_a_request(self):
+        chosen = set()
+
+        def view(request):
+            routed = {self.router.db_for_read(Product) for _ in range(10)}
+            self.assertEqual(len(routed), 1)
+            chosen.update(routed)
+            return HttpResponse()
+
+        for _ in range(20):
+            ReplicaStickinessMiddleware(view)(RequestFactory().get('/', HTTP_X_API_KEY='key-a'))
+        self.assertEqual(chosen, {'replica_1', 'replica_2'})
+
+    def test_sticky_window_is_shared_between_processes(self):
+        # Chaque worker construit sa propre instance du cache : la fenêtre ouverte par l'un doit être vue par l'autre
+        request = RequestFactory().get('/', HTTP_X_API_KEY='key-a')
+        writer, reader = caches.create_connection('shared'), caches.create_connection('shared')
+        with mock.patch.object(ReplicaStickiness, 'get_cache', return_value=writer):
+            ReplicaStickiness.mark(request)
+        with mock.patch.object(ReplicaStickiness, 'get_cache', return_value=reader):
+            self.assertTrue(ReplicaStickiness.is_sticky(request))
+
+
+@override_settings(CATALOG_SNAPSHOT_DEBOUNCE=None)
+class ReplicaSnapshotTests(TransactionTestCase):
+    """La sauvegarde SQLite attend la fin des transactions en cours : pas de TestCase ici"""
+
+    def test_snapshot_is_a_read_only_sqlite_copy(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Snapshots are SQLite files')
+        Product.objects.create(name='Snapshot', price='10.00')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'replica.sqlite3')
+            ReplicaSnapshot.copy(path)
+            replica = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+            try:
+                names = replica.execute(f'SELECT name FROM {Product._meta.db_table}').fetchall()
+                self.assertEqual(names, [('Snapshot',)])
+                self.assertEqual(replica.execute('PRAGMA journal_mode').fetchone(), ('delete',))
+            finally:
+                replica.close()
+
+
+@override_settings(CATALOG_SNAPSHOT_DEBOUNCE=None, IMPORT_JOB_BATCH_PAUSE=0)
+class BackgroundThreadRoutingTests(TransactionTestCase):
+    """Threads d'arrière-plan face à un vrai réplica SQLite, copié avant les écritures du test"""
+
+    def setUp(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Replica snapshots are SQLite files')
+        self.directory = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        ReplicaSnapshot.copy(self.directory / 'replica.sqlite3')
+        self.enterContext(sqlite_alias(self, 'replica_1', self.directory / 'replica.sqlite3', read_only=True))
+        self.enterContext(override_settings(DATABASE_READ_REPLICAS=['replica_1'],
+                                            IMPORT_JOB_DIR=str(self.directory / 'imports'),
+                                            CATALOG_SNAPSHOT_DIR=str(self.directory / 'snapshots')))
+
+    def wait_for(self, predicate, timeout=10):
+        deadline = time.monotonic() + timeout
+        while not (result := predicate()) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return result
+
+    def test_import_job_submitted_after_commit_runs_against_primary(self):
+        # create_job confie le job au pool de threads dès la validation
+        job = ImportJobRunner.create_job([b'name,price\nReplicated,1.00\n'], source_name='late.csv')
+        self.assertFalse(ImportJob.objects.using('replica_1').filter(pk=job.pk).exists())
+        with use_primary():
+            status = self.wait_for(lambda: ImportJob.objects.filter(pk=job.pk, status__in=FINISHED_STATUSES)
+                                   .values_list('status', flat=True).first())
+            self.assertEqual(status, 'succeeded')
+            self.assertTrue(Product.objects.filter(name='Replicated').exists())
+
+    def test_scheduled_snapshot_reads_catalog_from_primary(self):
+        with override_settings(CATALOG_SNAPSHOT_DEBOUNCE=0):
+            Product.objects.create(name='Fresh', price='3.00')
+            manifest = self.wait_for(CatalogSnapshot.manifest)
+        with use_primary():
+            self.assertEqual(manifest['version'], CatalogSnapshot.current_version())
+        self.assertEqual(manifest['product_count'], 1)
+
+
+@override_settings(API_RATE_LIMITS={'Admin': (3, 60)})
+class RateLimitTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        caches['shared'].clear()
+
+    def test_requests_over_the_role_limit_get_429(self):
+        responses = [self.api_get('get_allproducts/') for _ in range(4)]
+        self.assertEqual([response.status_code for response in responses], [200, 200, 200, 429])
+        self.assertEqual(responses[0]['X-RateLimit-Limit'], '3')
+        self.assertEqual(responses[2]['X-RateLimit-Remaining'], '0')
+        self.assertGreaterEqual(int(responses[3]['Retry-After']), 1)
+
+    def test_rejected_requests_are_not_counted(self):
+        # Horloge figée : toutes les requêtes tombent dans la même fenêtre
+        with mock.patch('app_apiTP1_JTR.rate_limit.time.time', return_value=6_000_030.0):
+            statuses = [self.api_get('get_allproducts/').status_code for _ in range(6)]
+            current_key, _ = RateLimiter._keys(UserProfile.objects.get(api_key='admin-key'), 60, time.time())
+            self.assertEqual(caches['shared'].get(current_key), 3)
+        self.assertEqual(statuses, [200, 200, 200, 429, 429, 429])
+
+    @override_settings(API_RATE_LIMITS={'default': (1, 60)})
+    def test_roles_without_rule_fall_back_to_default(self):
+        self.assertEqual(self.api_get('get_allproducts/').status_code, 200)
+        self.assertEqual(self.api_get('get_allproducts/').status_code, 429)
+
+    def test_counters_are_atomic_across_workers(self):
+        # Une instance du cache par thread, comme une par worker : aucun incrément ne doit se perdre
+        caches['shared'].add('rate_limit:atomic', 0)
+
+        def increment():
+            worker_cache = caches.create_connection('shared')
+            for _ in range(50):
+                worker_cache.incr('rate_limit:atomic')
+
+        threads = [threading.Thread(target=increment) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(caches['shared'].get('rate_limit:atomic'), 400)
+
+    def test_process_local_cache_fails_the_system_check(self):
+        with override_settings(API_RATE_LIMIT_CACHE_ALIAS='default'):
+            self.assertEqual([error.id for error in check_rate_limit_cache(None)], ['app_apiTP1_JTR.E001'])
+            with override_settings(API_RATE_LIMITS={}):
+                self.assertEqual(check_rate_limit_cache(None), [])
+        self.assertEqual(check_rate_limit_cache(None), [])
+
+    def test_saturated_process_sheds_load_before_the_view(self):
+        middleware = LoadSheddingMiddleware(lambda request: self.fail('view must not run'))
+        middleware.max_concurrent, middleware.in_flight = 2, 2
+        response = middleware(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class ChangeLogTests(ApiTestCase):
+
+    def test_writes_are_logged_in_order_and_paged(self):
+        product = Product.objects.create(name='Lamp', price='10.00')
+        product.price = '12.00'
+        product.save()
+        product_id = product.pk
+        product.delete()
+
+        first = self.api_get('changes/', limit=2).json()
+        self.assertEqual([change['op'] for change in first['changes']], ['create', 'update'])
+        self.assertEqual(first['changes'][1]['fields']['price'], '12.00')
+        self.assertNotIn('name', first['changes'][1]['fields'])
+        self.assertTrue(first['has_more'])
+
+        rest = self.api_get('changes/', since=first['next_since']).json()
+        self.assertEqual([(c['op'], c['product_id']) for c in rest['changes']], [('delete', product_id)])
+        self.assertFalse(rest['has_more'])
+
+    def test_compacted_sequence_requires_snapshot(self):
+        for index in range(3):
+            Product.objects.create(name=f'Old {index}', price='1.00')
+        ProductChangeLog.compact(timedelta(0))
+
+        response = self.api_get('changes/', since=0)
+        self.assertEqual(response.status_code, 410)
+        snapshot = self.api_get('changes/snapshot/')
+        seq = int(snapshot['X-Changes-Seq'])
+        self.assertEqual(len(b''.join(snapshot.streaming_content).splitlines()), 3)
+        self.assertEqual(self.api_get('changes/', since=seq).json()['changes'], [])
+
+
+class BatchEndpointTests(ApiTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.product = Product.objects.create(name='Kettle', price='20.00')
+        viewer = User.objects.create_user(username='viewer')
+        UserProfile.objects.create(user=viewer, role=Role.objects.get(name='User'), api_key='viewer-key')
+
+    def batch(self, operations, api_key='admin-key', **options):
+        return self.client.post('/app_apiTP1_JTR/batch/', {'operations': operations, **options},
+                                content_type='application/json', HTTP_X_API_KEY=api_key)
+
+    def test_each_operation_checks_its_own_permission(self):
+        response = self.batch([
+            {'id': 'max', 'path': '/app_apiTP1_JTR/get_maxprice/'},
+            {'id': 'put', 'method': 'PUT', 'path': f'/app_apiTP1_JTR/update_product/{self.product.pk}/',
+             'body': {'price': '25.00'}},
+        ], api_key='viewer-key').json()
+        self.assertEqual([(r['id'], r['status']) for r in response['results']], [('max', 200), ('put', 403)])
+        self.assertEqual(response['results'][0]['body']['product']['price'], '20.00')
+
+    def test_atomic_batch_rolls_back_on_failure(self):
+        response = self.batch([
+            {'method': 'PUT', 'path': f'/app_apiTP1_JTR/update_product/{self.product.pk}/', 'body': {'price': '30.00'}},
+            {'method': 'PUT', 'path': '/app_apiTP1_JTR/update_product/999999/', 'body': {'price': '1.00'}},
+            {'path': '/app_apiTP1_JTR/get_maxprice/'},
+        ], atomic=True).json()
+        self.assertFalse(response['committed'])
+        self.assertEqual([r['status'] for r in response['results']], [200, 404])
+        self.assertEqual(response['skipped'], 1)
+        self.product.refresh_from_db()
+        self.assertEqual(str(self.product.price), '20.00')
+
+    def test_reads_in_a_rolled_back_batch_are_not_cached(self):
+        # La version du catalogue lue dans le lot est annulée puis réattribuée à l'écriture suivante
+        self.batch([
+            {'method': 'PUT', 'path': f'/app_apiTP1_JTR/update_product/{self.product.pk}/', 'body': {'price': '99.00'}},
+            {'path': '/app_apiTP1_JTR/get_maxprice/'},
+            {'method': 'PUT', 'path': '/app_apiTP1_JTR/update_product/999999/', 'body': {'price': '1.00'}},
+        ], atomic=True)
+        self.client.put(f'/app_apiTP1_JTR/update_product/{self.product.pk}/', {'price': '25.00'},
+                        content_type='application/json', HTTP_X_API_KEY='admin-key')
+        self.assertEqual(self.api_get('get_maxprice/').json()['product']['price'], '25.00')
+
+    def test_body_is_readable_by_bulk_endpoints(self):
+        response = self.batch([{'method': 'POST', 'path': '/app_apiTP1_JTR/bulk_products/',
+                                'body': [{'name': 'Mug', 'price': '4.00'}]}]).json()
+        self.assertEqual(response['results'][0]['status'], 201)
+        self.assertTrue(Product.objects.filter(name='Mug').exists())
+
+    @override_settings(API_RATE_LIMITS={'Admin': (3, 60)})
+    def test_each_operation_counts_against_the_rate_limit(self):
+        caches['shared'].clear()
+        update = {'method': 'PUT', 'path': f'/app_apiTP1_JTR/update_product/{self.product.pk}/',
+                  'body': {'price': '30.00'}}
+        response = self.batch([update] * 4)
+        self.assertEqual(response.status_code, 429)
+        self.product.refresh_from_db()
+        self.assertEqual(str(self.product.price), '20.00')
+
+        # Le lot refusé n'a rien consommé : trois opérations passent encore
+        self.assertEqual(self.batch([{'path': '/app_apiTP1_JTR/get_maxprice/'}] * 3).status_code, 200)
+        self.assertEqual(self.api_get('get_maxprice/').status_code, 429)
+
+    def test_requires_api_key_once(self):
+        response = self.client.post('/app_apiTP1_JTR/batch/', {'operations': []}, content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+
+
+class CatalogSnapshotTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(CATALOG_SNAPSHOT_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        Product.objects.bulk_create([Product(name=f'Snapshot {i}', price=i + 1) for i in range(5)])
+
+    def test_first_request_schedules_the_build_instead_of_waiting(self):
+        with mock.patch.object(snapshot_scheduler, 'schedule') as schedule:
+            response = self.client.get('/app_apiTP1_JTR/catalog_snapshot/', HTTP_X_API_KEY='admin-key')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        schedule.assert_called_once_with(delay=0)
+        self.assertIsNone(CatalogSnapshot.manifest())
+
+    def test_gzip_file_is_served_with_its_own_etag(self):
+        CatalogSnapshot.build()
+        response = self.client.get('/app_apiTP1_JTR/catalog_snapshot/', HTTP_X_API_KEY='admin-key',
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        catalog = json.loads(gzip.decompress(b''.join(response.streaming_content)))
+        self.assertEqual([product['name'] for product in catalog['products']], [f'Snapshot {i}' for i in range(5)])
+
+        plain = self.client.get('/app_apiTP1_JTR/catalog_snapshot/', HTTP_X_API_KEY='admin-key')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertNotEqual(plain['ETag'], response['ETag'])
+        self.assertEqual(json.loads(b''.join(plain.streaming_content)), catalog)
+
+        not_modified = self.client.get('/app_apiTP1_JTR/catalog_snapshot/', HTTP_X_API_KEY='admin-key',
+                                       HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_rebuild_after_write_replaces_generation(self):
+        first = CatalogSnapshot.build()
+        Product.objects.create(name='Snapshot 5', price='6.00')
+        second = CatalogSnapshot.build()
+        self.assertEqual(second['product_count'], 6)
+        self.assertNotEqual(first['generation'], second['generation'])
+        self.assertEqual(CatalogSnapshot.negotiate('br;q=0, gzip;q=0.5', second['files']), 'gzip')
+        self.assertIsNone(CatalogSnapshot.negotiate('*;q=0', second['files']))
+
+    def test_older_build_never_replaces_a_newer_generation(self):
+        first = CatalogSnapshot.build()
+        directory = CatalogSnapshot.snapshot_dir()
+        # Génération plus récente écrite par un autre constructeur, manifeste pas encore publié
+        newer = directory / f'catalog-{first["version"] + 5}-0000000000000000.json'
+        newer.write_bytes(b'{}')
+        Product.objects.create(name='Snapshot 5', price='6.00')
+        second = CatalogSnapshot.build()
+        self.assertTrue(newer.exists())
+        self.assertFalse((directory / first['files']['identity']['name']).exists())
+
+        # Un constructeur en retard (version lue avant la dernière publication) ne publie pas
+        with mock.patch.object(CatalogSnapshot, 'current_version', return_value=second['version'] - 1):
+            self.assertEqual(CatalogSnapshot.build(force=True), second)
+        self.assertEqual(CatalogSnapshot.manifest(), second)
+        self.assertTrue((directory / second['files']['identity']['name']).exists())
+        self.assertEqual(list(directory.glob('.catalog-*')), [])
+
+
+class ImportJobTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(IMPORT_JOB_DIR=directory.name, IMPORT_JOB_BATCH_SIZE=2,
+                                              IMPORT_JOB_BATCH_PAUSE=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, text):
+        response = self.client.post('/app_apiTP1_JTR/import_jobs/?name=supplier.csv', text.encode(),
+                                    content_type='text/csv', HTTP_X_API_KEY='admin-key')
+        self.assertEqual(response.status_code, 202)
+        return response.json()['job']['id']
+
+    def test_import_upserts_and_reports_rejected_rows(self):
+        existing = Product.objects.create(name='Old name', price='5.00')
+        job_id = self.upload(
+            'id,name,price,description\n'
+            f'{existing.pk},New name,,\n'
+            ',Widget,"1,5",bad price\n'
+            ',Gadget,2.50,"multi\nline"\n'
+            '999999,Ghost,1.00,\n'
+        )
+        self.assertEqual(ImportJobRunner.run(job_id), 'succeeded')
+
+        status = self.api_get(f'import_jobs/{job_id}/').json()['job']
+        self.assertEqual((status['rows_processed'], status['rows_created'], status['rows_updated'],
+                          status['rows_rejected']), (4, 1, 1, 2))
+        self.assertEqual(status['percent'], 100.0)
+        existing.refresh_from_db()
+        self.assertEqual((existing.name, str(existing.price)), ('New name', '5.00'))
+        self.assertEqual(Product.objects.get(name='Gadget').description, 'multi\nline')
+
+        errors = b''.join(self.api_get(f'import_jobs/{job_id}/errors/').streaming_content).decode()
+        self.assertEqual([line.split(',')[0] for line in errors.splitlines()], ['row', '2', '4'])
+
+    def test_restart_resumes_after_last_committed_batch(self):
+        job_id = self.upload('name,price\n' + ''.join(f'Item {i},{i + 1}.00\n' for i in range(5)))
+        ingest = ProductBulkIngest.ingest
+        calls = []
+
+        def fail_second_batch(rows):
+            calls.append(rows)
+            if len(calls) == 2:
+                raise RuntimeError('worker crashed')
+            return ingest(rows)
+
+        with mock.patch.object(ProductBulkIngest, 'ingest', side_effect=fail_second_batch):
+            self.assertEqual(ImportJobRunner.run(job_id), 'failed')
+        self.assertEqual(ImportJob.objects.get(pk=job_id).rows_processed, 2)
+
+        self.assertEqual(self.client.post(f'/app_apiTP1_JTR/import_jobs/{job_id}/restart/',
+                                          HTTP_X_API_KEY='admin-key').status_code, 202)
+        self.assertEqual(ImportJobRunner.run(job_id), 'succeeded')
+        self.assertEqual(Product.objects.filter(name__startswith='Item ').count(), 5)
+
+    def test_cancel_queued_job(self):
+        job_id = self.upload('name,price\nItem,1.00\n')
+        response = self.client.post(f'/app_apiTP1_JTR/import_jobs/{job_id}/cancel/', HTTP_X_API_KEY='admin-key')
+        self.assertEqual(response.json()['job']['status'], 'cancelled')
+        self.assertIsNone(ImportJobRunner.run(job_id))
+        self.assertFalse(Product.objects.filter(name='Item').exists())
+
+
+class PriceAnalyticsTests(ApiTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Colonnes en cache par processus : les versions du catalogue se répètent d'un test à l'autre
+        PriceAnalytics._columns = None
+        for price in ('10.00', '20.00', '30.00', '40.00'):
+            Product.objects.create(name='Analytics', price=price)
+
+    def test_distribution_follows_writes(self):
+        analytics = self.api_get('price_analytics/', bins=3, percentiles='50,90').json()['analytics']
+        self.assertEqual((analytics['count'], analytics['mean'], analytics['median'], analytics['stddev']),
+                         (4, '25.00', '25.00', '11.18'))
+        self.assertEqual(analytics['percentiles'], {'p50': '25.00', 'p90': '37.00'})
+        self.assertEqual(analytics['histogram']['counts'], [1, 1, 2])
+
+        product = Product.objects.get(price='40.00')
+        product.price = '100.00'
+        product.save()
+        Product.objects.filter(price='10.00').first().delete()
+        analytics = self.api_get('price_analytics/').json()['analytics']
+        self.assertEqual((analytics['count'], analytics['max'], analytics['mean']), (3, '100.00', '50.00'))
+
+    def test_created_between_filter(self):
+        old = timezone.now() - timedelta(days=30)
+        Product.objects.create(name='Old', price='1000.00')
+        Product.objects.filter(name='Old').update(created_at=old)
+        PriceAnalytics._columns = None  # update() ne passe pas par le journal
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        analytics = self.api_get('price_analytics/', created_between=f'{since},').json()['analytics']
+        self.assertEqual((analytics['count'], analytics['max']), (4, '40.00'))
+        self.assertEqual(self.api_get('price_analytics/', bins='0').status_code, 400)
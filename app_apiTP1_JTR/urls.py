@@ -4,9 +4,28 @@ from . import views
 urlpatterns = [ path("test_json_view/", views.test_json_view, name="test_json_view"),
                path("post_user/", views.post_user, name="add_user"),
                path("get_allproducts/", views.get_allproducts, name="get_allproducts"),
+               path("export_products/", views.export_products, name="export_products"),
+               path("search_products/", views.search_products, name="search_products"),
+               path("batch/", views.batch, name="batch"),
+               path("changes/", views.get_changes, name="get_changes"),
+               path("changes/snapshot/", views.get_changes_snapshot, name="get_changes_snapshot"),
+               path("catalog_snapshot/", views.get_catalog_snapshot, name="get_catalog_snapshot"),
                path("get_maxprice/", views.get_maxprice, name="get_maxprice"),
+               path("get_price_stats/", views.get_price_stats, name="get_price_stats"),
+               path("price_analytics/", views.get_price_analytics, name="get_price_analytics"),
                path("post_product/", views.post_product, name="post_product"),
+               path("bulk_products/", views.bulk_post_products, name="bulk_post_products"),
+               path("bulk_update_products/", views.bulk_update_products, name="bulk_update_products"),
+               path("import_jobs/", views.create_import_job, name="create_import_job"),
+               path("import_jobs/<int:job_id>/", views.import_job_status, name="import_job_status"),
+               path("import_jobs/<int:job_id>/cancel/", views.cancel_import_job, name="cancel_import_job"),
+               path("import_jobs/<int:job_id>/restart/", views.restart_import_job, name="restart_import_job"),
+               path("import_jobs/<int:job_id>/errors/", views.import_job_errors, name="import_job_errors"),
                path("update_product/<int:product_id>/", views.update_product, name="update_product"),
+               path("async/get_allproducts/", views.get_allproducts_async, name="get_allproducts_async"),
+               path("async/get_maxprice/", views.get_maxprice_async, name="get_maxprice_async"),
+               path("async/export_products/", views.export_products_async, name="export_products_async"),
                 path("admin/create_user/", views.create_api_user, name="create_api_user"),
                 path("admin/create_role/", views.create_role, name="create_role"),
+                path("admin/cache_stats/", views.api_key_cache_stats, name="api_key_cache_stats"),
 ]
\ No newline at end of file
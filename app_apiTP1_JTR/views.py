@@ -1,13 +1,32 @@
 
 from django.shortcuts import render
+from django.urls import reverse
 import json 
-from django.http import JsonResponse 
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt 
-from django.db import models
-from .models import Product, Permission, Role, UserProfile
+from django.db import models, transaction
+from .models import ImportJob, Product, Permission, Role, UserProfile
 from .auth_decorators import require_api_key, require_permission
+from .aggregates import CatalogAggregates
+from .auth_cache import api_key_cache
+from .batch_utils import BatchExecutor
+from .bulk_utils import BodyTooLarge, ProductBulkIngest, ProductBulkUpdate
+from .catalog_snapshot import CatalogSnapshot
+from .change_log import ChangeLogCompacted, ProductChangeLog
+from .conditional_utils import catalog_condition
+from .filter_utils import ProductFilterHelper
+from .import_jobs import ImportJobRunner
+from .metrics import metrics_registry
+from .pagination_utils import CursorPaginationHelper
+from .rate_limit import RateLimiter
+from .price_analytics import PriceAnalytics
+from .response_cache import cache_catalog_response, response_cache_stats
+from .search_utils import ProductSearch
+from .serializers import PRODUCT_FIELDS, api_response, parse_fields, product_serializer
+from .streaming_utils import StreamingExportHelper
 import secrets
 from django.contrib.auth.models import User
+from django.conf import settings
 
 @csrf_exempt
 @require_api_key
@@ -106,6 +125,54 @@ def create_role(request):
     
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
+@csrf_exempt
+@require_api_key
+def batch(request):
+    """
+    Plusieurs appels d'API en un aller-retour :
+    {"operations": [{"id": "a", "method": "GET", "path": "/app_apiTP1_JTR/get_maxprice/"}, ...],
+     "atomic": false}
+    Chaque opération vérifie sa propre permission et compte pour une requête dans la limite
+    du rôle (429 pour tout le lot au-delà) ; avec "atomic": true, une opération en échec
+    annule toutes les écritures du lot.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        operations, atomic = BatchExecutor.parse_operations(json.loads(request.body))
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    # La requête parente a déjà été comptée par require_api_key : une unité par opération suivante
+    if len(operations) > 1:
+        rate_limit = RateLimiter.check(request.user_profile, cost=len(operations) - 1)
+        if rate_limit is not None and not rate_limit.allowed:
+            # Lot refusé en entier : l'unité de la requête parente n'est pas consommée non plus
+            RateLimiter.refund(request.user_profile)
+            return RateLimiter.too_many_requests(rate_limit)
+
+    return HttpResponse(BatchExecutor.execute(request, operations, atomic), content_type='application/json')
+
+@csrf_exempt
+@require_api_key
+@require_permission('admin_users')
+def api_key_cache_stats(request):
+    """Compteurs des caches de ce processus (clés API, réponses du catalogue)"""
+    return JsonResponse({
+        'api_key_cache': api_key_cache.stats(),
+        'response_cache': response_cache_stats.as_dict()
+    })
+
+@require_api_key
+@require_permission('admin_users')
+def metrics(request):
+    """Métriques de tous les workers au format texte Prometheus"""
+    metrics_registry.flush()
+    return HttpResponse(metrics_registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Vue publique (pas d'autorisation)
 def test_json_view(request): 
     data = { 
@@ -141,45 +208,233 @@ def post_user(request):
 @csrf_exempt
 @require_api_key
 @require_permission('view_products')
+@catalog_condition
+@cache_catalog_response
 def get_allproducts(request): 
-    products = list(Product.objects.values('id', 'name', 'price', 'description', 'created_at', 'updated_at'))
-    return JsonResponse({
-        'products': products,
+    """
+    Lister les produits par pages (?cursor=..., ?page_size=..., ?include_total=true)
+    avec filtres (?price_min, ?price_max, ?updated_since, ?created_between=<début>,<fin>),
+    tri (?ordering=price, -updated_at, ...) et champs creux (?fields=id,name,price)
+    """
+    queryset = Product.objects.all()
+    include_total = request.GET.get('include_total', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        queryset = ProductFilterHelper.filter_queryset(queryset, request.GET)
+        page = CursorPaginationHelper.paginate_queryset(
+            queryset,
+            cursor=request.GET.get('cursor'),
+            page_size=request.GET.get('page_size'),
+            ordering=ProductFilterHelper.get_ordering(request.GET),
+            include_total=include_total,
+            fields=parse_fields(request.GET.get('fields'))
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return api_response({
+        'products': page['items'],
+        'pagination': page['pagination'],
+        'accessed_by': request.user.username
+    })
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+def export_products(request):
+    """Exporter tout le catalogue en streaming (?format=ndjson par défaut, ou ?format=json ; ?fields=...)"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        return StreamingExportHelper.create_streaming_response(
+            Product.objects.order_by('id'),
+            parse_fields(request.GET.get('fields')),
+            export_format=request.GET.get('format', 'ndjson'),
+            filename='products'
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+def get_changes(request):
+    """Modifications du catalogue postérieures à ?since=<seq> (?limit=...), pour la réplication incrémentale"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        since = int(request.GET.get('since', 0))
+        limit = int(request.GET['limit']) if 'limit' in request.GET else None
+        if since < 0 or (limit is not None and limit <= 0):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'since must be a non-negative integer and limit a positive integer'},
+                            status=400)
+
+    try:
+        page = ProductChangeLog.read(since, limit)
+    except ChangeLogCompacted as e:
+        return JsonResponse({
+            'error': str(e),
+            'horizon': e.horizon,
+            'snapshot': request.build_absolute_uri(reverse('get_changes_snapshot')),
+        }, status=410)
+    return api_response(page)
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+def get_changes_snapshot(request):
+    """
+    Catalogue complet en NDJSON ; l'en-tête X-Changes-Seq donne la seq à partir de
+    laquelle lire changes?since= ensuite. La seq est relevée avant les produits :
+    une modification peut donc apparaître dans les deux, et la rejouer est sans effet.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    seq = ProductChangeLog.current_seq()
+    response = StreamingExportHelper.create_streaming_response(
+        Product.objects.order_by('id'), PRODUCT_FIELDS, export_format='ndjson', filename='products-snapshot'
+    )
+    response['X-Changes-Seq'] = str(seq)
+    return response
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+def get_catalog_snapshot(request):
+    """
+    Catalogue complet précompressé (gzip/brotli selon Accept-Encoding), servi
+    depuis le disque ; ETag par représentation, 304 sur If-None-Match,
+    503 + Retry-After tant que le premier snapshot n'est pas construit
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    response = CatalogSnapshot.serve(request)
+    if response is None:
+        return JsonResponse({'error': 'No acceptable content encoding'}, status=406)
+    return response
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+def search_products(request):
+    """Rechercher des produits par nom/description (?q=..., ?prefix=false, ?cursor=..., ?page_size=..., ?fields=...)"""
+    prefix = request.GET.get('prefix', 'true').lower() not in ('0', 'false', 'no')
+    try:
+        page = ProductSearch.search(
+            request.GET.get('q'),
+            cursor=request.GET.get('cursor'),
+            page_size=request.GET.get('page_size'),
+            prefix=prefix,
+            fields=parse_fields(request.GET.get('fields'))
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return api_response({
+        'products': page['items'],
+        'pagination': page['pagination'],
         'accessed_by': request.user.username
-    }, safe=False)
+    })
 
 @csrf_exempt
 @require_api_key
 @require_permission('view_products')
+@catalog_condition
+@cache_catalog_response
 def get_maxprice(request): 
     try:
-        most_expensive_product = Product.objects.order_by('-price').first()
+        serializer = product_serializer(parse_fields(request.GET.get('fields')))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        # Agrégats tenus à jour à l'écriture : une seule lecture de la ligne CatalogAggregate
+        most_expensive_product = CatalogAggregates.get().max_product
         
         if most_expensive_product is not None:
             response_data = {
                 'message': 'Most expensive product found',
-                'product': {
-                    'id': most_expensive_product.id,
-                    'name': most_expensive_product.name,
-                    'price': str(most_expensive_product.price),
-                    'description': most_expensive_product.description,
-                    'created_at': most_expensive_product.created_at.isoformat(),
-                    'updated_at': most_expensive_product.updated_at.isoformat()
-                },
+                'product': serializer.instance(most_expensive_product),
                 'accessed_by': request.user.username
             }
-            return JsonResponse(response_data)
+            return api_response(response_data)
         else:
             return JsonResponse({'error': 'No products found'}, status=404)
             
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+@catalog_condition
+@cache_catalog_response
+def get_price_stats(request):
+    """Statistiques de prix du catalogue (count/min/max/moyenne) sans parcourir la table"""
+    try:
+        return api_response({
+            'stats': CatalogAggregates.as_dict(CatalogAggregates.get()),
+            'accessed_by': request.user.username
+        })
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+@catalog_condition
+@cache_catalog_response
+def get_price_analytics(request):
+    """
+    Distribution des prix : moyenne, médiane, écart-type, percentiles (?percentiles=5,50,95)
+    et histogramme (?bins=20), éventuellement restreints à ?created_between=<début>,<fin>
+    """
+    try:
+        created_from = created_to = None
+        if request.GET.get('created_between'):
+            start, separator, end = request.GET['created_between'].partition(',')
+            if not separator:
+                raise ValueError('created_between must be "<start>,<end>"')
+            if start:
+                created_from = ProductFilterHelper.parse_timestamp('created_between', start)
+            if end:
+                created_to = ProductFilterHelper.parse_timestamp('created_between', end)
+        percentiles = PriceAnalytics.parse_percentiles(request.GET.get('percentiles'))
+        max_bins = getattr(settings, 'PRICE_ANALYTICS_MAX_BINS', 1000)
+        bins = request.GET.get('bins') or getattr(settings, 'PRICE_ANALYTICS_BINS', 20)
+        if not str(bins).isdigit() or not 1 <= int(bins) <= max_bins:
+            raise ValueError(f'bins must be an integer between 1 and {max_bins}')
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        analytics = PriceAnalytics.compute(
+            PriceAnalytics.columns(), created_from=created_from, created_to=created_to,
+            percentiles=percentiles, bins=int(bins)
+        )
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    return api_response({'analytics': analytics, 'accessed_by': request.user.username})
+
 @csrf_exempt
 @require_api_key
 @require_permission('create_products')
 def post_product(request): 
     if request.method == 'POST': 
+        try:
+            created_serializer = product_serializer(parse_fields(
+                request.GET.get('fields'), default=('id', 'name', 'price', 'description', 'created_at')
+            ))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
         try: 
             data = json.loads(request.body) 
             
@@ -207,13 +462,7 @@ def post_product(request):
                 
                 try:
                     product = Product.objects.create(name=name, price=price, description=description)
-                    created_products.append({
-                        'id': product.id, 
-                        'name': product.name, 
-                        'price': str(product.price), 
-                        'description': product.description, 
-                        'created_at': product.created_at.isoformat()
-                    })
+                    created_products.append(created_serializer.instance(product))
                 except Exception as e:
                     errors.append(f'Product {i+1}: {str(e)}')
             
@@ -227,7 +476,7 @@ def post_product(request):
                 response_data['errors'] = errors
             
             if created_products:
-                return JsonResponse(response_data, status=201)
+                return api_response(response_data, status=201)
             else:
                 return JsonResponse({'error': 'No products were created', 'errors': errors}, status=400)
 
@@ -238,11 +487,193 @@ def post_product(request):
 
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
+@csrf_exempt
+@require_api_key
+@require_permission('create_products')
+def bulk_post_products(request):
+    """Importer un grand nombre de produits (tableau JSON ou NDJSON) en une requête"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        body = ProductBulkIngest.read_body(request)
+    except BodyTooLarge as e:
+        return JsonResponse({'error': str(e)}, status=413)
+
+    try:
+        rows, parse_errors = ProductBulkIngest.parse_body(body, request.content_type)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    if not isinstance(rows, list):
+        return JsonResponse({'error': 'Invalid data format'}, status=400)
+
+    max_rows = getattr(settings, 'BULK_INGEST_MAX_ROWS', 50000)
+    if len(rows) > max_rows:
+        return JsonResponse({'error': f'Maximum {max_rows} products allowed per request'}, status=400)
+
+    try:
+        summary = ProductBulkIngest.ingest(rows)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    summary['errors'] = sorted(parse_errors + summary['errors'], key=lambda error: error['row'])
+    summary['created_by'] = request.user.username
+    status = 201 if summary['created'] else 400
+    return JsonResponse(summary, status=status)
+
+@csrf_exempt
+@require_api_key
+@require_permission('update_products')
+def bulk_update_products(request):
+    """
+    Modifier plusieurs produits en une requête PATCH :
+    - {"products": [{"id": 1, "price": "9.99"}, ...]} champ par champ
+    - {"price_change": {"filter": {"price_lt": "100"}, "percent": 5}} en un seul UPDATE
+    """
+    if request.method != 'PATCH':
+        return JsonResponse({'error': 'Method not allowed. Use PATCH method.'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    if isinstance(data, list):
+        data = {'products': data}
+    if not isinstance(data, dict) or not ({'products', 'price_change'} & set(data)):
+        return JsonResponse({'error': 'Expected "products" or "price_change"'}, status=400)
+
+    entries = data.get('products')
+    price_change = data.get('price_change')
+    max_rows = getattr(settings, 'BULK_INGEST_MAX_ROWS', 50000)
+    if 'products' in data and not isinstance(entries, list):
+        return JsonResponse({'error': 'Invalid data format'}, status=400)
+    if 'products' in data and len(entries) > max_rows:
+        return JsonResponse({'error': f'Maximum {max_rows} products allowed per request'}, status=400)
+    if 'price_change' in data and not isinstance(price_change, dict):
+        return JsonResponse({'error': 'Invalid data format'}, status=400)
+
+    response_data = {'updated_by': request.user.username}
+    try:
+        # Une seule transaction : une erreur sur price_change annule aussi les modifications de products
+        with transaction.atomic():
+            if 'products' in data:
+                response_data.update(ProductBulkUpdate.apply_entries(entries))
+            if 'price_change' in data:
+                response_data['price_change_updated'] = ProductBulkUpdate.apply_price_change(
+                    price_change.get('filter') or {},
+                    percent=price_change.get('percent'),
+                    delta=price_change.get('delta')
+                )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse(response_data, status=200)
+
+@csrf_exempt
+@require_api_key
+@require_permission('create_products')
+def create_import_job(request):
+    """
+    Déposer un CSV (corps brut text/csv, ou champ "file" en multipart) et lancer
+    son import en arrière-plan ; colonnes id, name, price, description
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    if request.content_type == 'multipart/form-data':
+        upload = request.FILES.get('file')
+        if upload is None:
+            return JsonResponse({'error': 'Missing file field'}, status=400)
+        chunks, source_name = upload.chunks(), upload.name
+    else:
+        # Lecture du corps par blocs : le fichier n'est jamais entièrement en mémoire
+        chunks = iter(lambda: request.read(64 * 1024), b'')
+        source_name = request.GET.get('name', '')
+
+    try:
+        job = ImportJobRunner.create_job(chunks, source_name=source_name, user=request.user)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    response = api_response({'job': ImportJobRunner.as_dict(job), 'created_by': request.user.username}, status=202)
+    response['Location'] = reverse('import_job_status', args=[job.pk])
+    return response
+
+def _get_import_job(job_id):
+    return ImportJob.objects.filter(pk=job_id).first()
+
+@csrf_exempt
+@require_api_key
+@require_permission('create_products')
+def import_job_status(request, job_id):
+    """Avancement d'un import : lignes traitées, débit (lignes/s) et temps restant estimé"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    job = _get_import_job(job_id)
+    if job is None:
+        return JsonResponse({'error': f'Import job {job_id} not found'}, status=404)
+    return api_response({'job': ImportJobRunner.as_dict(job)})
+
+@csrf_exempt
+@require_api_key
+@require_permission('create_products')
+def cancel_import_job(request, job_id):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    job = _get_import_job(job_id)
+    if job is None:
+        return JsonResponse({'error': f'Import job {job_id} not found'}, status=404)
+    if not ImportJobRunner.cancel(job):
+        return JsonResponse({'error': f'Import job {job_id} is already {job.status}'}, status=409)
+    job.refresh_from_db()
+    return api_response({'job': ImportJobRunner.as_dict(job)}, status=202)
+
+@csrf_exempt
+@require_api_key
+@require_permission('create_products')
+def restart_import_job(request, job_id):
+    """Reprendre un import échoué, annulé ou interrompu à partir du dernier lot validé"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    job = _get_import_job(job_id)
+    if job is None:
+        return JsonResponse({'error': f'Import job {job_id} not found'}, status=404)
+    if not ImportJobRunner.restart(job):
+        return JsonResponse({'error': f'Import job {job_id} cannot be restarted while {job.status}'}, status=409)
+    job.refresh_from_db()
+    return api_response({'job': ImportJobRunner.as_dict(job)}, status=202)
+
+@csrf_exempt
+@require_api_key
+@require_permission('create_products')
+def import_job_errors(request, job_id):
+    """Lignes rejetées (CSV : numéro d'enregistrement, erreur, colonnes d'origine)"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    job = _get_import_job(job_id)
+    if job is None:
+        return JsonResponse({'error': f'Import job {job_id} not found'}, status=404)
+    if not job.error_bytes:
+        return JsonResponse({'error': 'No error file yet'}, status=404)
+    response = StreamingHttpResponse(ImportJobRunner.iter_errors(job), content_type='text/csv')
+    response['Content-Length'] = str(job.error_bytes)
+    response['Content-Disposition'] = f'attachment; filename="import-{job.pk}-errors.csv"'
+    return response
+
 @csrf_exempt
 @require_api_key
 @require_permission('update_products')
 def update_product(request, product_id):
     if request.method == 'PUT': 
+        try:
+            serializer = product_serializer(parse_fields(request.GET.get('fields')))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
         try: 
             data = json.loads(request.body) 
             
@@ -265,18 +696,11 @@ def update_product(request, product_id):
             
             response_data = { 
                 'message': 'Product updated successfully', 
-                'product': { 
-                    'id': product.id, 
-                    'name': product.name, 
-                    'price': str(product.price), 
-                    'description': product.description,
-                    'created_at': product.created_at.isoformat(),
-                    'updated_at': product.updated_at.isoformat()
-                },
+                'product': serializer.instance(product),
                 'updated_by': request.user.username
             } 
             
-            return JsonResponse(response_data, status=200) 
+            return api_response(response_data, status=200) 
 
         except json.JSONDecodeError: 
             return JsonResponse({'error': 'Invalid JSON'}, status=400)
@@ -284,3 +708,81 @@ def update_product(request, product_id):
             return JsonResponse({'error': str(e)}, status=500)
     
     return JsonResponse({'error': 'Method not allowed. Use PUT method.'}, status=405)
+
+
+# Variantes asynchrones des lectures, pour un déploiement ASGI (api_TP1_JTR/asgi.py) :
+# authentification, permissions et requêtes passent par l'ORM asynchrone,
+# sans aller-retour sync_to_async par requête.
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+@catalog_condition
+@cache_catalog_response
+async def get_allproducts_async(request):
+    """Variante asynchrone de get_allproducts (mêmes paramètres)"""
+    include_total = request.GET.get('include_total', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        queryset = ProductFilterHelper.filter_queryset(Product.objects.all(), request.GET)
+        page = await CursorPaginationHelper.apaginate_queryset(
+            queryset,
+            cursor=request.GET.get('cursor'),
+            page_size=request.GET.get('page_size'),
+            ordering=ProductFilterHelper.get_ordering(request.GET),
+            include_total=include_total,
+            fields=parse_fields(request.GET.get('fields'))
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return api_response({
+        'products': page['items'],
+        'pagination': page['pagination'],
+        'accessed_by': request.user.username
+    })
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+@catalog_condition
+@cache_catalog_response
+async def get_maxprice_async(request):
+    """Variante asynchrone de get_maxprice"""
+    try:
+        serializer = product_serializer(parse_fields(request.GET.get('fields')))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        most_expensive_product = (await CatalogAggregates.aget()).max_product
+        
+        if most_expensive_product is not None:
+            return api_response({
+                'message': 'Most expensive product found',
+                'product': serializer.instance(most_expensive_product),
+                'accessed_by': request.user.username
+            })
+        else:
+            return JsonResponse({'error': 'No products found'}, status=404)
+            
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+@csrf_exempt
+@require_api_key
+@require_permission('view_products')
+async def export_products_async(request):
+    """Variante asynchrone de export_products : lignes lues par paquets via sync_to_async (voir aiter_rows)"""
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        return StreamingExportHelper.create_async_streaming_response(
+            Product.objects.order_by('id'),
+            parse_fields(request.GET.get('fields')),
+            export_format=request.GET.get('format', 'ndjson'),
+            filename='products'
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)